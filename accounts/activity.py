@@ -0,0 +1,161 @@
+"""
+Buffered UserActivityLog writer.
+
+log_activity() only builds the row and puts it on a bounded in-process
+queue; a daemon thread writes the queue with bulk_create, as soon as
+ACTIVITY_LOG_BATCH_SIZE rows are waiting or every ACTIVITY_LOG_FLUSH_SECONDS.
+When the database falls behind and the queue is full, new entries are
+dropped and counted instead of slowing the request down. A batch the
+database refuses is retried row by row, so one bad entry only loses
+itself. Entries still queued when the process exits are flushed by an
+atexit hook.
+"""
+import atexit
+import ipaddress
+import logging
+import os
+import queue
+import threading
+import time
+from django.conf import settings
+from django.db import InterfaceError, OperationalError, close_old_connections
+from rest_framework.throttling import BaseThrottle
+from accounts.models import UserActivityLog
+
+logger = logging.getLogger(__name__)
+
+
+class ActivityLogWriter:
+    """Background writer of one process."""
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.queue = queue.Queue(maxsize=settings.ACTIVITY_LOG_BUFFER_SIZE)
+        self.flush_lock = threading.Lock()
+        self.drop_lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.thread = threading.Thread(target=self.run, name='activity-log-writer', daemon=True)
+        self.thread.start()
+
+    def put(self, entry):
+        try:
+            self.queue.put_nowait(entry)
+        except queue.Full:
+            with self.drop_lock:
+                self.dropped += 1
+
+    def run(self):
+        while True:
+            self.flush(block=True)
+
+    def flush(self, block=False):
+        """Write the queued entries, waiting up to the flush interval for a full batch if `block`."""
+        batch_size = settings.ACTIVITY_LOG_BATCH_SIZE
+        deadline = time.monotonic() + settings.ACTIVITY_LOG_FLUSH_SECONDS
+        batch = []
+        while len(batch) < batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                if block and timeout > 0:
+                    batch.append(self.queue.get(timeout=timeout))
+                else:
+                    batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        if not batch:
+            return 0
+        with self.flush_lock:
+            try:
+                self.write(batch, batch_size)
+            finally:
+                close_old_connections()
+        return len(batch)
+
+    def write(self, batch, batch_size):
+        """Insert the batch; if that fails, insert its rows one by one so only bad rows are lost."""
+        try:
+            UserActivityLog.objects.bulk_create(batch, batch_size=batch_size)
+            self.written += len(batch)
+            return
+        except Exception:
+            logger.warning("Bulk insert of %s activity log entries failed, retrying one by one", len(batch), exc_info=True)
+        for position, entry in enumerate(batch):
+            try:
+                entry.save(force_insert=True)
+                self.written += 1
+            except (OperationalError, InterfaceError):
+                # The database itself is unavailable: the other rows would fail too
+                self.failed += len(batch) - position
+                logger.exception("Could not write %s activity log entries", len(batch) - position)
+                return
+            except Exception:
+                self.failed += 1
+                logger.exception("Could not write activity log entry %s for user %s", entry.activity_type, entry.user_id)
+
+    def stats(self):
+        return {
+            'queued': self.queue.qsize(),
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+        }
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """Writer of the current process (started again in forked workers)."""
+    global _writer
+    if _writer is None or _writer.pid != os.getpid():
+        with _writer_lock:
+            if _writer is None or _writer.pid != os.getpid():
+                _writer = ActivityLogWriter()
+    return _writer
+
+
+def log_activity(user, activity_type, description, request=None, **metadata):
+    """
+    Record a user action without waiting for the database.
+
+    Args:
+        user: User (or user ID) who acted
+        activity_type: Short code of the action (LOGIN, SEND_MONEY, ...)
+        description: Human readable description
+        request: Request to take the IP address and user agent from
+        **metadata: Extra JSON-serializable details
+    """
+    entry = UserActivityLog(
+        user_id=getattr(user, 'pk', user),
+        activity_type=activity_type,
+        description=description,
+        metadata=metadata,
+    )
+    if request is not None:
+        ip = BaseThrottle().get_ident(request)
+        try:
+            # One malformed address would fail the whole batch insert
+            entry.ip_address = str(ipaddress.ip_address(ip))
+        except ValueError:
+            pass
+        entry.user_agent = request.META.get('HTTP_USER_AGENT', '')
+    get_writer().put(entry)
+
+
+def flush():
+    """Write everything queued so far in this process."""
+    writer = _writer
+    if writer is None or writer.pid != os.getpid():
+        return 0
+    written = 0
+    while True:
+        count = writer.flush()
+        if not count:
+            return written
+        written += count
+
+
+atexit.register(flush)
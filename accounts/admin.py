@@ -1,5 +1,35 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.apps import apps
+from .models import KYCDocument
+from .review import KYCReviewService
+
+
+@admin.register(KYCDocument)
+class KYCDocumentAdmin(admin.ModelAdmin):
+    list_display = ("user", "document_type", "status", "risk_score", "claimed_by", "uploaded_at")
+    list_filter = ("status", "document_type")
+    list_select_related = ("user", "claimed_by")
+    search_fields = ("user__email",)
+    ordering = ("-risk_score", "uploaded_at")
+    raw_id_fields = ("user", "verified_by", "claimed_by", "stored", "duplicate_of")
+    readonly_fields = ("sha256", "file_size", "content_type", "risk_score", "uploaded_at", "updated_at")
+    # Counting the whole table on every page gets slow with the backlog
+    show_full_result_count = False
+    actions = ("approve_documents", "reject_documents")
+
+    @admin.action(description="Approuver les documents selectionnes")
+    def approve_documents(self, request, queryset):
+        decided = KYCReviewService.decide(request.user, list(queryset.values_list("pk", flat=True)), "APPROVED")
+        self.message_user(request, f"{decided} document(s) approuve(s)", messages.SUCCESS)
+
+    @admin.action(description="Rejeter les documents selectionnes")
+    def reject_documents(self, request, queryset):
+        decided = KYCReviewService.decide(
+            request.user, list(queryset.values_list("pk", flat=True)), "REJECTED",
+            rejection_reason="Document non conforme"
+        )
+        self.message_user(request, f"{decided} document(s) rejete(s)", messages.SUCCESS)
+
 
 for model in apps.get_app_config("accounts").get_models():
     try:
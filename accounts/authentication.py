@@ -0,0 +1,123 @@
+"""
+Stateless JWT authentication.
+
+Tokens carry the user's ID, active flag, KYC status/level and country as
+signed claims, so an authenticated request gets a User built from the token
+instead of loaded from the database. Every other field of that User is
+deferred and loaded on first access, so views that need more than the claims
+still work (one query per deferred field).
+
+Revocation goes through a per-user auth version embedded in each token:
+bumping it (done automatically when a claim or the password changes) rejects
+every token issued before, and the client falls back to refresh or login,
+which read the database again. The version is stored on the user row and
+cached for a while; a cache miss (eviction, flush, failover) reads the row
+again, so it never brings revoked tokens back.
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction as db_transaction
+from django.db.models import F
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+# Token claim -> User field
+CLAIM_FIELDS = {
+    'active': 'is_active',
+    'kyc_status': 'kyc_status',
+    'kyc_level': 'kyc_level',
+    'country': 'country_of_residence',
+}
+AUTH_VERSION_CLAIM = 'av'
+
+
+AUTH_VERSION_CACHE_TIMEOUT = 300
+
+
+def _version_key(user_id):
+    return f'accounts:auth:version:{user_id}'
+
+
+def get_auth_version(user_id):
+    """Current auth version of a user (None if the user does not exist)."""
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = get_user_model().objects.filter(pk=user_id).values_list('auth_version', flat=True).first()
+        if version is not None:
+            # add(): never overwrite a version published by a concurrent revocation
+            cache.add(key, version, AUTH_VERSION_CACHE_TIMEOUT)
+    return version
+
+
+def _publish_auth_versions(user_ids):
+    versions = get_user_model().objects.filter(pk__in=user_ids).values_list('pk', 'auth_version')
+    cache.set_many({_version_key(user_id): version for user_id, version in versions}, AUTH_VERSION_CACHE_TIMEOUT)
+
+
+def revoke_tokens_of_users(user_ids):
+    """
+    Invalidate every token issued so far to several users.
+
+    The versions are bumped on the user rows in the caller's DB transaction
+    and published to the cache once it commits.
+    """
+    user_ids = list(user_ids)
+    get_user_model().objects.filter(pk__in=user_ids).update(auth_version=F('auth_version') + 1)
+    db_transaction.on_commit(lambda: _publish_auth_versions(user_ids))
+
+
+def revoke_tokens(user_id):
+    """Invalidate every token issued so far to the user."""
+    revoke_tokens_of_users([user_id])
+
+
+def issue_tokens(user):
+    """
+    Refresh token for `user` with the auth claims (copied into its access token).
+
+    Returns:
+        RefreshToken
+    """
+    refresh = RefreshToken.for_user(user)
+    for claim, field in CLAIM_FIELDS.items():
+        refresh[claim] = getattr(user, field)
+    refresh[AUTH_VERSION_CLAIM] = user.auth_version
+    return refresh
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication building request.user from the token claims."""
+
+    def get_user(self, validated_token):
+        # Tokens issued before the claims existed are resolved the usual way
+        if AUTH_VERSION_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        if validated_token[AUTH_VERSION_CLAIM] != get_auth_version(user_id):
+            raise AuthenticationFailed(_('Token has been revoked'), code='token_revoked')
+        if not validated_token['active']:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        user_model = get_user_model()
+        claims = {api_settings.USER_ID_FIELD: user_id}
+        for claim, field in CLAIM_FIELDS.items():
+            claims[field] = validated_token[claim]
+        # from_db() takes the loaded fields in model order and defers the others
+        field_names = []
+        values = []
+        for field in user_model._meta.concrete_fields:
+            if field.attname in claims:
+                field_names.append(field.attname)
+                values.append(field.to_python(claims[field.attname]))
+        return user_model.from_db(DEFAULT_DB_ALIAS, field_names, values)
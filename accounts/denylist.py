@@ -0,0 +1,56 @@
+"""
+Refresh token denylist.
+
+Every refresh rotates the token, so the presented token's ID is written to
+RevokedRefreshToken. The primary key makes that single insert the check: a
+replayed or concurrently reused token fails it, without a lookup first.
+
+Rows are bucketed by expiry day and purged a bucket at a time once expired.
+"""
+from datetime import datetime, timezone as dt_timezone
+from django.db import IntegrityError, transaction as db_transaction
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from accounts.models import RevokedRefreshToken
+
+
+def revoke(token):
+    """
+    Denylist a validated refresh token.
+
+    Returns:
+        True if the token was added, False if it was already denylisted
+    """
+    jti = token['jti']
+    expires_at = datetime.fromtimestamp(token['exp'], tz=dt_timezone.utc)
+    try:
+        with db_transaction.atomic():
+            RevokedRefreshToken.objects.create(
+                jti=jti,
+                user_id=token[api_settings.USER_ID_CLAIM],
+                expires_at=expires_at,
+                expires_on=expires_at.date()
+            )
+    except IntegrityError:
+        return False
+    return True
+
+
+def purge_expired(batch_size=5000):
+    """
+    Drop the expiry buckets that are entirely in the past.
+
+    Returns:
+        Number of rows deleted
+    """
+    today = timezone.now().date()
+    deleted = 0
+    while True:
+        jtis = list(
+            RevokedRefreshToken.objects
+            .filter(expires_on__lt=today)
+            .values_list('jti', flat=True)[:batch_size]
+        )
+        if not jtis:
+            return deleted
+        deleted += RevokedRefreshToken.objects.filter(jti__in=jtis).delete()[0]
@@ -0,0 +1,115 @@
+"""
+Content-addressed KYC document storage.
+
+Uploads are keyed by the SHA-256 computed while they stream in. A file
+already stored is not written again: the new KYCDocument references the
+existing StoredDocument, which stays locked until the document is saved so
+the purge of unreferenced files cannot remove it in between. A user sending the
+same file again as the same document type gets their pending document back
+at once, or a new document carrying the review decision already taken on
+that file, instead of a new item in the review queue.
+"""
+from django.db import IntegrityError, transaction as db_transaction
+from django.utils import timezone
+from accounts.models import KYCDocument, StoredDocument
+from accounts.review import score_document
+from accounts.uploads import EXTENSIONS
+from transactions.outbox import record_event
+
+
+PROCESS_TASK = 'accounts.tasks.process_kyc_document'
+
+# Decision fields a duplicate inherits from the document it repeats
+DECISION_FIELDS = ('status', 'rejection_reason', 'verified_by_id', 'verified_at')
+
+
+def get_or_store(uploaded):
+    """
+    StoredDocument holding the content of `uploaded`, written to storage
+    only if no file with the same hash exists yet.
+
+    Must run in the transaction saving the referencing document: the row is
+    locked until then.
+
+    Returns:
+        (StoredDocument, created)
+    """
+    stored = StoredDocument.objects.select_for_update().filter(pk=uploaded.sha256).first()
+    if stored is not None:
+        return stored, False
+
+    stored = StoredDocument(
+        sha256=uploaded.sha256,
+        file_size=uploaded.size,
+        content_type=uploaded.content_type,
+    )
+    stored.file.save(f'upload.{EXTENSIONS[uploaded.content_type]}', uploaded, save=False)
+    try:
+        with db_transaction.atomic():
+            stored.save(force_insert=True)
+    except IntegrityError:
+        # Same file stored concurrently: keep theirs
+        stored.file.delete(save=False)
+        return StoredDocument.objects.select_for_update().get(pk=uploaded.sha256), False
+    return stored, True
+
+
+def save_kyc_document(user, uploaded, document_type, document_number=''):
+    """
+    Record an uploaded KYC document, deduplicated by content.
+
+    Args:
+        user: Uploading user
+        uploaded: File from accounts.uploads.read_upload (hashed and sniffed)
+        document_type: One of KYCDocument.DOCUMENT_TYPES
+        document_number: Number printed on the document, if given
+
+    Returns:
+        (KYCDocument, created); created is False when the same file is
+        already waiting for review as the same type and that document is
+        returned
+    """
+    # A decision only holds for the type it was taken on: the same scan sent
+    # as another type (e.g. a passport as proof of address) is reviewed again
+    previous = (
+        KYCDocument.objects
+        .filter(user=user, sha256=uploaded.sha256, document_type=document_type)
+        .order_by('-uploaded_at')
+        .first()
+    )
+    if previous is not None and previous.status == 'PENDING':
+        return previous, False
+
+    with db_transaction.atomic():
+        stored, stored_created = get_or_store(uploaded)
+        document = KYCDocument(
+            user=user,
+            document_type=document_type,
+            document_number=document_number,
+            sha256=stored.sha256,
+            file_size=stored.file_size,
+            content_type=stored.content_type,
+            stored=stored,
+        )
+        document.document_file.name = stored.file.name
+        document.thumbnail.name = stored.thumbnail.name
+        if previous is not None:
+            document.duplicate_of = previous
+            for field in DECISION_FIELDS:
+                setattr(document, field, getattr(previous, field))
+        if document.status == 'PENDING':
+            document.risk_score = score_document(user, stored)
+
+        document.save()
+        if stored_created:
+            record_event(
+                'kyc_document.uploaded',
+                {'document_id': str(document.id)},
+                aggregate_id=document.id,
+                task_name=PROCESS_TASK,
+            )
+        if document.status == 'PENDING' and user.kyc_status in ('NOT_STARTED', 'REJECTED', 'ADDITIONAL_INFO_REQUIRED'):
+            user.kyc_status = 'PENDING'
+            user.kyc_submitted_at = timezone.now()
+            user.save(update_fields=['kyc_status', 'kyc_submitted_at'])
+    return document, True
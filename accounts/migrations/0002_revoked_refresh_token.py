@@ -0,0 +1,27 @@
+# Generated by Django 6.0.2 on 2026-10-19 03:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevokedRefreshToken',
+            fields=[
+                ('jti', models.CharField(max_length=64, primary_key=True, serialize=False, verbose_name='token ID')),
+                ('user_id', models.UUIDField(verbose_name='user ID')),
+                ('expires_at', models.DateTimeField(verbose_name='expires at')),
+                ('expires_on', models.DateField(db_index=True, verbose_name='expiry bucket')),
+                ('revoked_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'revoked refresh token',
+                'verbose_name_plural': 'revoked refresh tokens',
+            },
+        ),
+    ]
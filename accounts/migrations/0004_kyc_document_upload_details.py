@@ -0,0 +1,39 @@
+# Generated by Django 6.0.2 on 2026-10-19 03:52
+
+import accounts.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_activity_log_event_time'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='kycdocument',
+            name='content_type',
+            field=models.CharField(blank=True, max_length=50, verbose_name='content type'),
+        ),
+        migrations.AddField(
+            model_name='kycdocument',
+            name='file_size',
+            field=models.PositiveBigIntegerField(blank=True, null=True, verbose_name='file size'),
+        ),
+        migrations.AddField(
+            model_name='kycdocument',
+            name='sha256',
+            field=models.CharField(blank=True, max_length=64, verbose_name='SHA-256'),
+        ),
+        migrations.AddField(
+            model_name='kycdocument',
+            name='thumbnail',
+            field=models.FileField(blank=True, upload_to='kyc_thumbnails/', verbose_name='thumbnail'),
+        ),
+        migrations.AlterField(
+            model_name='kycdocument',
+            name='document_file',
+            field=models.FileField(upload_to=accounts.models.kyc_document_path, verbose_name='document file'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 6.0.2 on 2026-10-19 03:52
+
+import accounts.models
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_kyc_document_upload_details'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredDocument',
+            fields=[
+                ('sha256', models.CharField(max_length=64, primary_key=True, serialize=False, verbose_name='SHA-256')),
+                ('file', models.FileField(upload_to=accounts.models.stored_document_path, verbose_name='file')),
+                ('file_size', models.PositiveBigIntegerField(verbose_name='file size')),
+                ('content_type', models.CharField(max_length=50, verbose_name='content type')),
+                ('ref_count', models.PositiveIntegerField(default=0, verbose_name='reference count')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'stored document',
+                'verbose_name_plural': 'stored documents',
+            },
+        ),
+        migrations.AddField(
+            model_name='kycdocument',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='accounts.kycdocument'),
+        ),
+        migrations.AddField(
+            model_name='kycdocument',
+            name='stored',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='kyc_documents', to='accounts.storeddocument'),
+        ),
+        migrations.AddIndex(
+            model_name='kycdocument',
+            index=models.Index(fields=['user', 'sha256'], name='kyc_document_user_hash_idx'),
+        ),
+    ]
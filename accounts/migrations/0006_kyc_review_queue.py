@@ -0,0 +1,34 @@
+# Generated by Django 6.0.2 on 2026-10-19 03:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_stored_document'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='kycdocument',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='claimed at'),
+        ),
+        migrations.AddField(
+            model_name='kycdocument',
+            name='claimed_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='claimed_documents', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='kycdocument',
+            name='risk_score',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='risk score'),
+        ),
+        migrations.AddIndex(
+            model_name='kycdocument',
+            index=models.Index(condition=models.Q(('status', 'PENDING')), fields=['-risk_score', 'uploaded_at'], name='kyc_review_queue_idx'),
+        ),
+    ]
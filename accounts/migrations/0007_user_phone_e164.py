@@ -0,0 +1,35 @@
+# Generated by Django 6.0.2 on 2026-10-19 03:52
+
+from django.db import migrations, models
+from accounts.phone import to_e164
+
+
+def backfill_phone_e164(apps, schema_editor):
+    """Fill phone_e164 from phone_number on existing rows."""
+    User = apps.get_model('accounts', 'User')
+    rows = User.objects.only('id', 'phone_number', 'country_of_residence', 'phone_e164').iterator(chunk_size=2000)
+    batch = []
+    for row in rows:
+        row.phone_e164 = to_e164(row.phone_number, row.country_of_residence) or ''
+        batch.append(row)
+        if len(batch) >= 2000:
+            User.objects.bulk_update(batch, ['phone_e164'])
+            batch = []
+    if batch:
+        User.objects.bulk_update(batch, ['phone_e164'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_kyc_review_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='phone_e164',
+            field=models.CharField(blank=True, db_index=True, max_length=16, verbose_name='phone number (E.164)'),
+        ),
+        migrations.RunPython(backfill_phone_e164, migrations.RunPython.noop),
+    ]
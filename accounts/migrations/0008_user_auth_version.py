@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-19 04:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_user_phone_e164'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='auth_version',
+            field=models.PositiveIntegerField(default=1, editable=False, verbose_name='auth version'),
+        ),
+    ]
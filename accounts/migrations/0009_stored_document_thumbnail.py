@@ -0,0 +1,39 @@
+# Generated by Django 6.0.2 on 2026-10-19 04:11
+
+from django.db import migrations, models
+
+
+def backfill_thumbnails(apps, schema_editor):
+    """Copy the thumbnail name the documents of each stored file share onto it."""
+    StoredDocument = apps.get_model('accounts', 'StoredDocument')
+    KYCDocument = apps.get_model('accounts', 'KYCDocument')
+    thumbnails = (
+        KYCDocument.objects
+        .filter(stored__isnull=False)
+        .exclude(thumbnail='')
+        .values_list('stored_id', 'thumbnail')
+        .distinct()
+        .iterator(chunk_size=2000)
+    )
+    for stored_id, thumbnail in thumbnails:
+        StoredDocument.objects.filter(pk=stored_id, thumbnail='').update(thumbnail=thumbnail)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_user_auth_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='storeddocument',
+            name='thumbnail',
+            field=models.FileField(blank=True, upload_to='kyc_thumbnails/', verbose_name='thumbnail'),
+        ),
+        migrations.RunPython(backfill_thumbnails, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='storeddocument',
+            name='ref_count',
+        ),
+    ]
@@ -3,8 +3,11 @@ Models for user accounts and KYC management.
 """
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db import transaction as db_transaction
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 import uuid
+from accounts.phone import to_e164
 
 
 class User(AbstractUser):
@@ -13,6 +16,7 @@ class User(AbstractUser):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     email = models.EmailField(_('email address'), unique=True)
     phone_number = models.CharField(_('phone number'), max_length=20, unique=True)
+    phone_e164 = models.CharField(_('phone number (E.164)'), max_length=16, blank=True, db_index=True)
     
     # Profile information
     date_of_birth = models.DateField(_('date of birth'), null=True, blank=True)
@@ -49,6 +53,9 @@ class User(AbstractUser):
     is_verified = models.BooleanField(_('email verified'), default=False)
     is_phone_verified = models.BooleanField(_('phone verified'), default=False)
     
+    # Embedded in issued tokens; bumped to revoke them (see accounts.authentication)
+    auth_version = models.PositiveIntegerField(_('auth version'), default=1, editable=False)
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -61,9 +68,54 @@ class User(AbstractUser):
         verbose_name_plural = _('users')
         ordering = ['-created_at']
     
+    # Fields copied into the JWT claims (see accounts.authentication)
+    CLAIM_FIELDS = ('is_active', 'kyc_status', 'kyc_level', 'country_of_residence')
+    
     def __str__(self):
         return self.email
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_claims = {
+            field: instance.__dict__[field]
+            for field in cls.CLAIM_FIELDS
+            if field in instance.__dict__
+        }
+        return instance
+    
+    def save(self, *args, **kwargs):
+        """Revoke issued tokens when a claim they carry or the password changes."""
+        # Deferred on token-built users; only refreshed when loaded
+        if 'phone_number' in self.__dict__:
+            self.phone_e164 = to_e164(self.phone_number, self.country_of_residence) or ''
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'phone_number' in update_fields:
+                kwargs['update_fields'] = set(update_fields) | {'phone_e164'}
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # auth_version only moves through revoke_tokens: a copy loaded
+            # before a revocation must not write the older version back
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname != 'auth_version' and field.attname not in deferred
+            ]
+        revoke = not self._state.adding and (
+            self._password is not None or
+            any(getattr(self, field) != value for field, value in getattr(self, '_loaded_claims', {}).items())
+        )
+        with db_transaction.atomic():
+            super().save(*args, **kwargs)
+            if revoke:
+                from accounts.authentication import revoke_tokens
+                revoke_tokens(self.pk)
+                self.refresh_from_db(fields=['auth_version'])
+        self._loaded_claims = {
+            field: self.__dict__[field]
+            for field in self.CLAIM_FIELDS
+            if field in self.__dict__
+        }
+    
     @property
     def full_name(self):
         return f"{self.first_name} {self.last_name}".strip()
@@ -74,6 +126,42 @@ class User(AbstractUser):
         return self.is_active and self.kyc_status == 'APPROVED'
 
 
+def kyc_document_path(instance, filename):
+    """Storage name of a KYC document; nothing of the client's file name is kept."""
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else 'bin'
+    return f'kyc_documents/{instance.user_id}/{instance.id}.{extension}'
+
+
+def stored_document_path(instance, filename):
+    """Content-addressed storage name: the SHA-256 of the file."""
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else 'bin'
+    return f'kyc_documents/sha256/{instance.sha256[:2]}/{instance.sha256}.{extension}'
+
+
+class StoredDocument(models.Model):
+    """
+    A KYC file stored once per content, shared by every KYCDocument
+    uploaded with the same bytes.
+    """
+    
+    sha256 = models.CharField(_('SHA-256'), max_length=64, primary_key=True)
+    file = models.FileField(_('file'), upload_to=stored_document_path)
+    file_size = models.PositiveBigIntegerField(_('file size'))
+    content_type = models.CharField(_('content type'), max_length=50)
+    # Shared by the documents using the file; purged with it
+    thumbnail = models.FileField(_('thumbnail'), upload_to='kyc_thumbnails/', blank=True)
+    
+    # Timestamp
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = _('stored document')
+        verbose_name_plural = _('stored documents')
+    
+    def __str__(self):
+        return self.sha256
+
+
 class KYCDocument(models.Model):
     """KYC documents submitted by users."""
     
@@ -89,9 +177,30 @@ class KYCDocument(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='kyc_documents')
     document_type = models.CharField(_('document type'), max_length=50, choices=DOCUMENT_TYPES)
-    document_file = models.FileField(_('document file'), upload_to='kyc_documents/')
+    document_file = models.FileField(_('document file'), upload_to=kyc_document_path)
     document_number = models.CharField(_('document number'), max_length=100, blank=True)
     
+    # File details, computed while the upload streams in
+    sha256 = models.CharField(_('SHA-256'), max_length=64, blank=True)
+    file_size = models.PositiveBigIntegerField(_('file size'), null=True, blank=True)
+    content_type = models.CharField(_('content type'), max_length=50, blank=True)
+    thumbnail = models.FileField(_('thumbnail'), upload_to='kyc_thumbnails/', blank=True)
+    stored = models.ForeignKey(
+        StoredDocument,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='kyc_documents'
+    )
+    # Earlier upload of the same file by the user, whose review decision this one took
+    duplicate_of = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='duplicates'
+    )
+    
     # Verification status
     status = models.CharField(
         _('status'),
@@ -115,6 +224,17 @@ class KYCDocument(models.Model):
     )
     verified_at = models.DateTimeField(_('verified at'), null=True, blank=True)
     
+    # Review queue
+    risk_score = models.PositiveSmallIntegerField(_('risk score'), default=0)
+    claimed_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='claimed_documents'
+    )
+    claimed_at = models.DateTimeField(_('claimed at'), null=True, blank=True)
+    
     # Timestamps
     uploaded_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -123,6 +243,15 @@ class KYCDocument(models.Model):
         verbose_name = _('KYC document')
         verbose_name_plural = _('KYC documents')
         ordering = ['-uploaded_at']
+        indexes = [
+            models.Index(fields=['user', 'sha256'], name='kyc_document_user_hash_idx'),
+            # Review queue: only pending documents, riskiest then oldest first
+            models.Index(
+                fields=['-risk_score', 'uploaded_at'],
+                name='kyc_review_queue_idx',
+                condition=models.Q(status='PENDING'),
+            ),
+        ]
     
     def __str__(self):
         return f"{self.user.email} - {self.document_type}"
@@ -141,8 +270,8 @@ class UserActivityLog(models.Model):
     # Metadata
     metadata = models.JSONField(_('metadata'), default=dict, blank=True)
     
-    # Timestamp
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Timestamp (set when the action happens; rows are written later in batches)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
     
     class Meta:
         verbose_name = _('user activity log')
@@ -155,3 +284,27 @@ class UserActivityLog(models.Model):
     
     def __str__(self):
         return f"{self.user.email} - {self.activity_type}"
+
+
+class RevokedRefreshToken(models.Model):
+    """
+    Refresh token that can no longer be used (rotated or revoked).
+    
+    Rows are bucketed by expiry day; a whole bucket is purged once its
+    tokens would be rejected as expired anyway.
+    """
+    
+    jti = models.CharField(_('token ID'), max_length=64, primary_key=True)
+    user_id = models.UUIDField(_('user ID'))
+    expires_at = models.DateTimeField(_('expires at'))
+    expires_on = models.DateField(_('expiry bucket'), db_index=True)
+    
+    # Timestamp
+    revoked_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = _('revoked refresh token')
+        verbose_name_plural = _('revoked refresh tokens')
+    
+    def __str__(self):
+        return self.jti
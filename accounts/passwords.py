@@ -0,0 +1,120 @@
+"""
+Bounded password hashing for the login and register endpoints.
+
+PBKDF2 deliberately burns ~100ms of CPU per hash. Left unbounded, a login
+storm hands that CPU to every worker at once and starves the
+money-movement endpoints. Hashing here runs in a fixed number of slots
+shared by every worker process through the cache, with a cap on in-flight
+hashes per client IP: requests that cannot get a slot quickly are refused
+(PasswordHashBusy) instead of queueing. The slots are counted in the cache
+rather than in the process because gunicorn's sync workers serve one
+request each, so a per-process limit would never be reached.
+
+Unknown emails do not hash at all: they wait for the average duration of a
+real hash, so the response time does not reveal whether the account exists
+and the wait costs no CPU. The wait takes a slot and counts against the
+client IP like a hash, so a refusal does not reveal it either.
+"""
+import time
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+
+# Average duration of a hash (seconds), measured on the first hash and
+# refined with every real one
+_average_duration = None
+
+SLOTS_KEY = 'accounts:hashing:slots'
+SLOT_POLL_SECONDS = 0.05
+
+
+class PasswordHashBusy(Exception):
+    """No hashing slot available for the request."""
+
+
+def client_ip(request):
+    return BaseThrottle().get_ident(request)
+
+
+def _ip_key(ip):
+    return f'accounts:hashing:{ip}'
+
+
+def _record_duration(duration):
+    global _average_duration
+    if _average_duration is None:
+        _average_duration = duration
+    else:
+        _average_duration = 0.9 * _average_duration + 0.1 * duration
+
+
+def _acquire(key, limit):
+    """Take one of `limit` slots counted under `key` in the shared cache."""
+    # The TTL only cleans up after a worker that died mid-hash
+    cache.add(key, 0, 60)
+    try:
+        taken = cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, 60)
+        taken = 1
+    if taken > limit:
+        _release(key)
+        return False
+    return True
+
+
+def _release(key):
+    try:
+        cache.decr(key)
+    except ValueError:
+        pass
+
+
+def _run(ip, func, *args, measure=True):
+    ip_key = _ip_key(ip)
+    if not _acquire(ip_key, settings.PASSWORD_HASH_PER_IP):
+        raise PasswordHashBusy(ip)
+    try:
+        deadline = time.monotonic() + settings.PASSWORD_HASH_WAIT_SECONDS
+        while not _acquire(SLOTS_KEY, settings.PASSWORD_HASH_CONCURRENCY):
+            if time.monotonic() >= deadline:
+                raise PasswordHashBusy(ip)
+            time.sleep(SLOT_POLL_SECONDS)
+        try:
+            started = time.monotonic()
+            result = func(*args)
+            if measure:
+                _record_duration(time.monotonic() - started)
+            return result
+        finally:
+            _release(SLOTS_KEY)
+    finally:
+        _release(ip_key)
+
+
+def verify_password(request, user, password):
+    """
+    Check `password` against `user` (None when the email is unknown).
+
+    Raises:
+        PasswordHashBusy: if the hashing capacity is exhausted
+    """
+    if user is None or not user.has_usable_password():
+        if _average_duration is None:
+            hash_password(request, password or '')
+        else:
+            _run(client_ip(request), time.sleep, _average_duration, measure=False)
+        return False
+    return _run(client_ip(request), user.check_password, password)
+
+
+def hash_password(request, password):
+    """
+    Encoded hash of `password` for a new account.
+
+    Raises:
+        PasswordHashBusy: if the hashing capacity is exhausted
+    """
+    return _run(client_ip(request), make_password, password)
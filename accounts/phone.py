@@ -0,0 +1,111 @@
+"""
+Phone number normalisation to E.164 (+<country code><national number>).
+
+Numbers are stored and compared in this canonical form, so "77 123 45 67"
+entered in Senegal, "+221771234567" and "00221 77-123-45-67" all match with
+an exact, indexed lookup.
+"""
+import re
+
+
+# ISO 3166-1 alpha-2 -> (calling code, national trunk prefix, national number lengths)
+COUNTRIES = {
+    # West and Central Africa
+    'SN': ('221', None, (9,)),
+    'CI': ('225', None, (10,)),
+    'ML': ('223', None, (8,)),
+    'BF': ('226', None, (8,)),
+    'NE': ('227', None, (8,)),
+    'TG': ('228', None, (8,)),
+    'BJ': ('229', None, (8, 10)),
+    'GN': ('224', None, (9,)),
+    'GH': ('233', '0', (9,)),
+    'NG': ('234', '0', (8, 10)),
+    'CM': ('237', None, (9,)),
+    'GA': ('241', None, (7, 8)),
+    'CG': ('242', None, (9,)),
+    'CD': ('243', '0', (9,)),
+    # East and North Africa
+    'KE': ('254', '0', (9,)),
+    'UG': ('256', '0', (9,)),
+    'MA': ('212', '0', (9,)),
+    # Europe and North America
+    'FR': ('33', '0', (9,)),
+    'BE': ('32', '0', (8, 9)),
+    'DE': ('49', '0', tuple(range(6, 14))),
+    'ES': ('34', None, (9,)),
+    'IT': ('39', None, tuple(range(6, 12))),
+    'GB': ('44', '0', (9, 10)),
+    'NL': ('31', '0', (9,)),
+    'PT': ('351', None, (9,)),
+    'CH': ('41', '0', (9,)),
+    'US': ('1', None, (10,)),
+    'CA': ('1', None, (10,)),
+}
+
+ALPHA3_TO_ALPHA2 = {
+    'SEN': 'SN', 'CIV': 'CI', 'MLI': 'ML', 'BFA': 'BF', 'NER': 'NE',
+    'TGO': 'TG', 'BEN': 'BJ', 'GIN': 'GN', 'GHA': 'GH', 'NGA': 'NG',
+    'CMR': 'CM', 'GAB': 'GA', 'COG': 'CG', 'COD': 'CD', 'KEN': 'KE',
+    'UGA': 'UG', 'MAR': 'MA', 'FRA': 'FR', 'BEL': 'BE', 'DEU': 'DE',
+    'ESP': 'ES', 'ITA': 'IT', 'GBR': 'GB', 'NLD': 'NL', 'PRT': 'PT',
+    'CHE': 'CH', 'USA': 'US', 'CAN': 'CA',
+}
+
+# Calling code -> national number lengths (several countries may share a code)
+_LENGTHS_BY_CODE = {}
+for _code, _trunk, _lengths in COUNTRIES.values():
+    _LENGTHS_BY_CODE.setdefault(_code, set()).update(_lengths)
+
+_SEPARATORS = re.compile(r'[\s\-.()/]')
+
+
+def _country(country):
+    country = (country or '').strip().upper()
+    return COUNTRIES.get(ALPHA3_TO_ALPHA2.get(country, country))
+
+
+def _is_valid_international(digits, known_code_only=False):
+    """Length check of a number written with its calling code."""
+    if not 8 <= len(digits) <= 15:
+        return False
+    for size in (1, 2, 3):
+        lengths = _LENGTHS_BY_CODE.get(digits[:size])
+        if lengths is not None:
+            return len(digits) - size in lengths
+    # Country not in the table: only the E.164 bounds apply, unless the
+    # number had no + or 00 and could just as well be a national one
+    return not known_code_only
+
+
+def to_e164(raw, country=None):
+    """
+    Canonical E.164 form of a phone number.
+
+    Args:
+        raw: Number as entered (spaces, dashes, dots, 00 or + prefix allowed)
+        country: Country (alpha-2 or alpha-3) assumed for national numbers
+
+    Returns:
+        '+<digits>', or None if the number cannot be read
+    """
+    number = _SEPARATORS.sub('', str(raw or ''))
+    international = True
+    if number.startswith('+'):
+        digits = number[1:]
+    elif number.startswith('00'):
+        digits = number[2:]
+    else:
+        digits = number
+        international = False
+        info = _country(country)
+        if info is not None and digits.isdigit():
+            code, trunk, lengths = info
+            national = digits[len(trunk):] if trunk and digits.startswith(trunk) else digits
+            if len(national) in lengths:
+                digits = code + national
+                international = True
+            # Otherwise the calling code may have been typed without + or 00
+    if not digits.isdigit() or not _is_valid_international(digits, known_code_only=not international):
+        return None
+    return f'+{digits}'
@@ -0,0 +1,140 @@
+"""
+KYC review queue.
+
+Pending documents are served riskiest first, then oldest first, straight
+from the partial index kyc_review_queue_idx, so a claim costs the same
+whatever the size of the backlog. Claims use SKIP LOCKED: reviewers working
+side by side never wait on, or get, each other's documents. A claim lapses
+after KYC_REVIEW_CLAIM_MINUTES so abandoned work returns to the queue.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.db.models import Case, Exists, F, OuterRef, Q, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from accounts.authentication import revoke_tokens_of_users
+from accounts.models import KYCDocument, User
+
+
+IDENTITY_DOCUMENTS = ('ID_CARD', 'PASSPORT', 'DRIVERS_LICENSE', 'RESIDENCE_PERMIT')
+
+# Risk points added at upload
+RISK_SHARED_FILE = 60       # the same file was sent by another user
+RISK_PER_REJECTION = 15     # per document of the user rejected before
+MAX_RISK_SCORE = 100
+
+
+def score_document(user, stored):
+    """Risk score of a new upload, used to order the review queue."""
+    score = 0
+    if stored.kyc_documents.exclude(user=user).exists():
+        score += RISK_SHARED_FILE
+    rejections = KYCDocument.objects.filter(user=user, status='REJECTED').count()
+    score += RISK_PER_REJECTION * rejections
+    return min(score, MAX_RISK_SCORE)
+
+
+class KYCReviewService:
+    """Claim and decide pending KYC documents."""
+
+    @staticmethod
+    def queue():
+        """Pending documents in review order."""
+        return KYCDocument.objects.filter(status='PENDING').order_by('-risk_score', 'uploaded_at')
+
+    @staticmethod
+    @db_transaction.atomic
+    def claim_documents(reviewer, limit=20):
+        """
+        Reserve the next pending documents for a reviewer.
+
+        Args:
+            reviewer: Staff user
+            limit: Maximum number of documents
+
+        Returns:
+            List of KYCDocument
+        """
+        now = timezone.now()
+        lapsed = now - timedelta(minutes=settings.KYC_REVIEW_CLAIM_MINUTES)
+        documents = list(
+            KYCReviewService.queue()
+            .filter(Q(claimed_at__isnull=True) | Q(claimed_at__lt=lapsed))
+            .select_for_update(skip_locked=True, of=('self',))
+            .select_related('user')[:limit]
+        )
+        KYCDocument.objects.filter(pk__in=[document.pk for document in documents]).update(
+            claimed_by=reviewer,
+            claimed_at=now,
+            updated_at=now
+        )
+        for document in documents:
+            document.claimed_by = reviewer
+            document.claimed_at = now
+        return documents
+
+    @staticmethod
+    @db_transaction.atomic
+    def decide(reviewer, document_ids, status, rejection_reason=''):
+        """
+        Approve or reject pending documents in bulk and update their owners'
+        KYC status and level.
+
+        Documents claimed by another reviewer (claim not lapsed) are skipped.
+
+        Args:
+            reviewer: Staff user
+            document_ids: IDs of the documents
+            status: 'APPROVED' or 'REJECTED'
+            rejection_reason: Shown to the user when rejected
+
+        Returns:
+            Number of documents decided
+
+        Raises:
+            ValueError: if status is not APPROVED or REJECTED
+        """
+        if status not in ('APPROVED', 'REJECTED'):
+            raise ValueError(f"Invalid KYC decision: {status}")
+
+        now = timezone.now()
+        lapsed = now - timedelta(minutes=settings.KYC_REVIEW_CLAIM_MINUTES)
+        documents = KYCDocument.objects.filter(pk__in=document_ids, status='PENDING').filter(
+            Q(claimed_by__isnull=True) | Q(claimed_by=reviewer) | Q(claimed_at__lt=lapsed)
+        )
+        user_ids = list(documents.values_list('user_id', flat=True).distinct())
+        decided = documents.update(
+            status=status,
+            rejection_reason=rejection_reason if status == 'REJECTED' else '',
+            verified_by=reviewer,
+            verified_at=now,
+            claimed_by=None,
+            claimed_at=None,
+            updated_at=now
+        )
+        if not decided:
+            return 0
+
+        users = User.objects.filter(pk__in=user_ids)
+        if status == 'APPROVED':
+            approved = KYCDocument.objects.filter(user=OuterRef('pk'), status='APPROVED')
+            has_identity = Exists(approved.filter(document_type__in=IDENTITY_DOCUMENTS))
+            has_address = Exists(approved.filter(document_type='PROOF_OF_ADDRESS'))
+            users = users.filter(has_identity)
+            users.update(
+                kyc_status='APPROVED',
+                kyc_approved_at=now,
+                kyc_level=Case(
+                    When(has_address, then=Greatest(F('kyc_level'), Value(2))),
+                    default=Greatest(F('kyc_level'), Value(1)),
+                ),
+                updated_at=now
+            )
+        else:
+            users = users.exclude(kyc_status='APPROVED')
+            users.update(kyc_status='REJECTED', updated_at=now)
+
+        # The status and level are token claims: make clients fetch new tokens
+        revoke_tokens_of_users(user_ids)
+        return decided
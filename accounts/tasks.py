@@ -0,0 +1,83 @@
+"""
+Celery tasks for the accounts app.
+"""
+import io
+import logging
+from celery import shared_task
+from django.conf import settings
+from django.core.files.base import ContentFile
+from accounts import denylist
+from django.db import transaction as db_transaction
+from accounts.models import KYCDocument, StoredDocument
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional: no thumbnails without it
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(ignore_result=True)
+def purge_revoked_refresh_tokens():
+    """Drop denylisted refresh tokens that have expired."""
+    return denylist.purge_expired()
+
+
+@shared_task(ignore_result=True)
+def process_kyc_document(event_id, event_type, payload):
+    """Build the JPEG thumbnail of an uploaded KYC image, upright and without metadata."""
+    document = KYCDocument.objects.filter(pk=payload['document_id']).first()
+    if document is None or Image is None or not document.content_type.startswith('image/'):
+        return
+    try:
+        with document.document_file.open('rb') as source:
+            image = ImageOps.exif_transpose(Image.open(source))
+            image = image.convert('RGB')
+            image.thumbnail(settings.KYC_THUMBNAIL_SIZE)
+            output = io.BytesIO()
+            image.save(output, 'JPEG', quality=80)
+    except (OSError, Image.DecompressionBombError):
+        logger.warning("Could not read KYC document %s as an image", document.pk)
+        return
+    name = f'{document.sha256 or document.pk}.jpg'
+    document.thumbnail.save(name, ContentFile(output.getvalue()), save=False)
+    # Every upload of the same file shares the thumbnail; the stored file
+    # keeps its actual name (the storage may have picked another one)
+    with db_transaction.atomic():
+        if document.stored_id:
+            StoredDocument.objects.filter(pk=document.stored_id).update(thumbnail=document.thumbnail.name)
+            documents = KYCDocument.objects.filter(stored_id=document.stored_id)
+        else:
+            documents = KYCDocument.objects.filter(pk=document.pk)
+        documents.update(thumbnail=document.thumbnail.name)
+
+
+def _delete_stored_files(stored):
+    storage = stored.file.storage
+    storage.delete(stored.file.name)
+    if stored.thumbnail:
+        storage.delete(stored.thumbnail.name)
+
+
+@shared_task(ignore_result=True)
+def purge_unreferenced_documents(batch_size=500):
+    """Delete the stored KYC files no document refers to any more."""
+    orphans = StoredDocument.objects.filter(kyc_documents__isnull=True)[:batch_size]
+    purged = 0
+    for stored in orphans:
+        with db_transaction.atomic():
+            # Re-check under lock: an upload may have just reused the file
+            # (get_or_store holds the lock until its document is saved)
+            stored = (
+                StoredDocument.objects
+                .select_for_update(skip_locked=True, of=('self',))
+                .filter(pk=stored.pk, kyc_documents__isnull=True)
+                .first()
+            )
+            if stored is None:
+                continue
+            stored.delete()
+            db_transaction.on_commit(lambda stored=stored: _delete_stored_files(stored))
+            purged += 1
+    return purged
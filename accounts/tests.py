@@ -0,0 +1,273 @@
+import shutil
+import tempfile
+from unittest import mock
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+from accounts.activity import ActivityLogWriter
+from accounts.authentication import issue_tokens, revoke_tokens
+from accounts.models import KYCDocument, RevokedRefreshToken, StoredDocument, User, UserActivityLog
+from accounts.passwords import SLOTS_KEY, PasswordHashBusy, verify_password
+from accounts.tasks import purge_unreferenced_documents
+from accounts.views import BUSY_RESPONSE
+
+
+class TokenRefreshTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='ada', email='ada@example.com', password='x')
+        self.client = APIClient()
+
+    def refresh(self, token):
+        return self.client.post('/api/accounts/token/refresh/', {'refresh': str(token)}, format='json')
+
+    def test_refresh_rotates_and_reuse_ends_every_session(self):
+        first = issue_tokens(self.user)
+
+        response = self.refresh(first)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(RevokedRefreshToken.objects.filter(jti=first['jti']).exists())
+
+        # The rotated token is presented again: it leaked
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.refresh(first).status_code, 401)
+        self.assertEqual(self.refresh(response.data['refresh']).status_code, 401)
+
+
+class AuthVersionTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='ada', email='ada@example.com', password='x')
+        self.client = APIClient()
+
+    def profile_status(self, token):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token.access_token}')
+        return self.client.get('/api/accounts/profile/').status_code
+
+    def test_claim_change_rejects_issued_tokens(self):
+        token = issue_tokens(self.user)
+        self.assertEqual(self.profile_status(token), 200)
+
+        self.user.country_of_residence = 'SEN'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+
+        self.assertEqual(self.profile_status(token), 401)
+        self.assertEqual(self.profile_status(issue_tokens(self.user)), 200)
+
+    def test_revocation_survives_losing_the_cache(self):
+        token = issue_tokens(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            revoke_tokens(self.user.pk)
+
+        cache.clear()
+
+        self.assertEqual(self.profile_status(token), 401)
+
+    def test_stale_copy_does_not_write_the_version_back(self):
+        stale = User.objects.get(pk=self.user.pk)
+        revoke_tokens(self.user.pk)
+
+        stale.first_name = 'Ada'
+        stale.save()
+
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.first_name, self.user.auth_version), ('Ada', 2))
+
+
+@override_settings(PASSWORD_HASH_PER_IP=1)
+class PasswordHashingTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='ada', email='ada@example.com', password='secret')
+        self.request = RequestFactory().post('/api/accounts/login/', REMOTE_ADDR='203.0.113.7')
+
+    @mock.patch('accounts.passwords._average_duration', 0.001)
+    def test_unknown_email_is_refused_like_a_known_one_when_busy(self):
+        self.assertTrue(verify_password(self.request, self.user, 'secret'))
+        self.assertFalse(verify_password(self.request, None, 'secret'))
+
+        # Another hash of the same IP is in flight
+        cache.set('accounts:hashing:203.0.113.7', 1, 60)
+        for user in (self.user, None):
+            with self.subTest(known=user is not None):
+                with self.assertRaises(PasswordHashBusy):
+                    verify_password(self.request, user, 'secret')
+
+    @override_settings(PASSWORD_HASH_CONCURRENCY=1, PASSWORD_HASH_WAIT_SECONDS=0.1)
+    def test_slots_are_shared_by_every_worker(self):
+        # Another worker process holds the only slot
+        cache.set(SLOTS_KEY, 1, 60)
+
+        with self.assertRaises(PasswordHashBusy):
+            verify_password(self.request, self.user, 'secret')
+        response = APIClient().post('/api/accounts/login/', {'email': 'ada@example.com', 'password': 'secret'}, format='json')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.data, BUSY_RESPONSE)
+
+        cache.set(SLOTS_KEY, 0, 60)
+        self.assertTrue(verify_password(self.request, self.user, 'secret'))
+        self.assertEqual(cache.get(SLOTS_KEY), 0)
+
+
+class ActivityLogWriterTests(TransactionTestCase):
+
+    def test_bad_entry_does_not_lose_its_batch(self):
+        user = User.objects.create_user(username='ada', email='ada@example.com', password='x')
+        with mock.patch('accounts.activity.threading.Thread'):
+            writer = ActivityLogWriter()
+        for description in ('first', None, 'third'):
+            writer.put(UserActivityLog(user_id=user.pk, activity_type='LOGIN', description=description))
+
+        with self.assertLogs('accounts.activity', 'WARNING'):
+            self.assertEqual(writer.flush(), 3)
+
+        self.assertEqual((writer.written, writer.failed), (2, 1))
+        self.assertQuerySetEqual(
+            UserActivityLog.objects.order_by('description').values_list('description', flat=True),
+            ['first', 'third']
+        )
+
+
+class KYCTestCase(TransactionTestCase):
+    """Token revocation runs on commit, so the requests really commit."""
+
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.settings_override = override_settings(MEDIA_ROOT=media_root)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        patcher = mock.patch('accounts.views.log_activity')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user(username='ada', email='ada@example.com', password='x')
+        self.client = APIClient()
+        self.authenticate(issue_tokens(self.user).access_token)
+
+    def authenticate(self, access):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+
+    def upload(self, content=b'%PDF-1.4 passport', document_type='PASSPORT'):
+        return self.client.post('/api/accounts/kyc/documents/', {
+            'document_type': document_type,
+            'document_file': SimpleUploadedFile('scan.pdf', content, content_type='application/pdf'),
+        }, format='multipart')
+
+
+class KYCUploadTests(KYCTestCase):
+
+    def test_first_upload_hands_back_tokens_with_the_new_status(self):
+        response = self.upload()
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(self.client.get('/api/accounts/profile/').status_code, 401)
+        self.authenticate(response.data['access'])
+        self.assertEqual(self.client.get('/api/accounts/profile/').status_code, 200)
+
+        # The status does not change again: the tokens stay valid
+        response = self.upload(b'%PDF-1.4 address', 'PROOF_OF_ADDRESS')
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('access', response.data)
+        self.assertEqual(self.client.get('/api/accounts/profile/').status_code, 200)
+
+
+class KYCDedupeTests(KYCTestCase):
+
+    def test_same_file_same_type_is_deduplicated(self):
+        first = self.upload()
+        self.authenticate(first.data['access'])
+        again = self.upload()
+
+        self.assertEqual(again.status_code, 200)
+        self.assertTrue(again.data['duplicate'])
+        self.assertEqual(again.data['id'], first.data['id'])
+        self.assertEqual(KYCDocument.objects.count(), 1)
+
+    def test_decision_is_inherited_for_the_same_type_only(self):
+        first = self.upload()
+        KYCDocument.objects.filter(pk=first.data['id']).update(status='APPROVED')
+        self.authenticate(first.data['access'])
+
+        as_address = self.upload(document_type='PROOF_OF_ADDRESS')
+        self.assertEqual(as_address.status_code, 201)
+        self.assertEqual(as_address.data['status'], 'PENDING')
+        self.assertIsNone(KYCDocument.objects.get(pk=as_address.data['id']).duplicate_of)
+
+        as_passport = self.upload()
+        self.assertEqual(as_passport.status_code, 201)
+        self.assertEqual(as_passport.data['status'], 'APPROVED')
+        self.assertEqual(str(KYCDocument.objects.get(pk=as_passport.data['id']).duplicate_of_id), first.data['id'])
+
+
+    def test_purge_keeps_referenced_files(self):
+        first = self.upload()
+        self.authenticate(first.data['access'])
+        self.upload(document_type='PROOF_OF_ADDRESS')
+        KYCDocument.objects.filter(pk=first.data['id']).delete()
+
+        self.assertEqual(purge_unreferenced_documents(), 0)
+        stored = StoredDocument.objects.get()
+        self.assertTrue(stored.file.storage.exists(stored.file.name))
+
+    def test_purge_deletes_files_left_by_queryset_deletes(self):
+        self.upload()
+        stored = StoredDocument.objects.get()
+        storage = stored.file.storage
+        # The storage may not have kept the hash as the thumbnail name
+        storage.save('kyc_thumbnails/renamed.jpg', SimpleUploadedFile('t.jpg', b'jpeg'))
+        StoredDocument.objects.filter(pk=stored.pk).update(thumbnail='kyc_thumbnails/renamed.jpg')
+        KYCDocument.objects.all().delete()
+
+        self.assertEqual(purge_unreferenced_documents(), 1)
+        self.assertFalse(StoredDocument.objects.exists())
+        self.assertFalse(storage.exists(stored.file.name))
+        self.assertFalse(storage.exists('kyc_thumbnails/renamed.jpg'))
+
+
+class KYCReviewTests(KYCTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.reviewer = User.objects.create_user(
+            username='staff', email='staff@example.com', password='x', phone_number='+33600000002', is_staff=True
+        )
+        upload = self.upload().data
+        self.document_id = upload['id']
+        self.owner_access = upload['access']
+        self.authenticate(issue_tokens(self.reviewer).access_token)
+
+    def test_claim_limit_is_clamped(self):
+        for limit in (-5, 0):
+            with self.subTest(limit=limit):
+                response = self.client.post('/api/accounts/kyc/review/claim/', {'limit': limit}, format='json')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data['documents']), 1)
+                KYCDocument.objects.update(claimed_by=None, claimed_at=None)
+
+    def test_malformed_document_id_is_refused(self):
+        response = self.client.post('/api/accounts/kyc/review/decide/', {
+            'document_ids': [self.document_id, 'not-a-uuid'], 'status': 'APPROVED'
+        }, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(KYCDocument.objects.get(pk=self.document_id).status, 'PENDING')
+
+    def test_approval_updates_the_owner(self):
+        self.client.post('/api/accounts/kyc/review/claim/', {}, format='json')
+        response = self.client.post('/api/accounts/kyc/review/decide/', {
+            'document_ids': [self.document_id], 'status': 'APPROVED'
+        }, format='json')
+
+        self.assertEqual(response.data, {'decided': 1})
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.kyc_status, self.user.kyc_level), ('APPROVED', 1))
+
+        # The owner's tokens carry the old status
+        self.authenticate(self.owner_access)
+        self.assertEqual(self.client.get('/api/accounts/profile/').status_code, 401)
@@ -0,0 +1,100 @@
+"""
+Streaming KYC document uploads.
+
+KYCUploadHandler replaces Django's default upload handlers for the KYC
+endpoint: every chunk goes straight to a temporary file while it is hashed,
+so a scan is never held in memory, the SHA-256 is known when the upload
+ends, and an upload is cut off as soon as it passes KYC_MAX_UPLOAD_BYTES.
+The file type is taken from the first bytes rather than from what the
+client claims. With FILE_UPLOAD_TEMP_DIR on the media volume, saving the
+result to the default storage is a rename, not a copy.
+"""
+import hashlib
+from django.conf import settings
+from django.core.files.uploadhandler import StopUpload, TemporaryFileUploadHandler
+
+
+# Leading bytes -> content type of the formats accepted for KYC documents
+SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'%PDF-', 'application/pdf'),
+)
+
+EXTENSIONS = {
+    'image/jpeg': 'jpg',
+    'image/png': 'png',
+    'application/pdf': 'pdf',
+}
+
+
+class UploadRejected(Exception):
+    """The upload is too large or not an accepted document format."""
+
+
+def sniff_content_type(head):
+    for signature, content_type in SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    return None
+
+
+class KYCUploadHandler(TemporaryFileUploadHandler):
+    """Temporary-file upload handler that hashes, sizes and sniffs the file."""
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.sniffed_type = None
+        self.error = None
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.sniffed_type is None:
+            self.sniffed_type = sniff_content_type(raw_data[:16])
+            if self.sniffed_type is None:
+                self.error = 'Format non accepte (JPEG, PNG ou PDF)'
+                raise StopUpload(connection_reset=True)
+        self.size += len(raw_data)
+        if self.size > settings.KYC_MAX_UPLOAD_BYTES:
+            self.error = 'Fichier trop volumineux'
+            raise StopUpload(connection_reset=True)
+        self.sha256.update(raw_data)
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        uploaded = super().file_complete(file_size)
+        uploaded.sha256 = self.sha256.hexdigest()
+        uploaded.content_type = self.sniffed_type
+        return uploaded
+
+
+def read_upload(request, field_name='document_file'):
+    """
+    Parse the multipart body of a KYC upload through KYCUploadHandler.
+
+    Must be called before anything reads request.data.
+
+    Returns:
+        (uploaded file, form data)
+
+    Raises:
+        UploadRejected: if the body is too large, the file missing, or not
+            JPEG, PNG or PDF
+    """
+    try:
+        content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        content_length = 0
+    if content_length > settings.KYC_MAX_UPLOAD_BYTES + 64 * 1024:
+        raise UploadRejected('Fichier trop volumineux')
+
+    handler = KYCUploadHandler(request)
+    request.upload_handlers = [handler]
+    data = request.data
+    uploaded = request.FILES.get(field_name)
+    if getattr(handler, 'error', None):
+        raise UploadRejected(handler.error)
+    if uploaded is None:
+        raise UploadRejected('Document requis')
+    return uploaded, data
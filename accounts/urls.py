@@ -4,5 +4,10 @@ from . import views
 urlpatterns = [
     path("login/", views.login, name="login"),
     path("register/", views.register, name="register"),
+    path("token/refresh/", views.token_refresh, name="token-refresh"),
     path("profile/", views.profile, name="profile"),
+    path("kyc/documents/", views.kyc_documents, name="kyc-documents"),
+    path("kyc/documents/<uuid:document_id>/file/", views.kyc_document_file, name="kyc-document-file"),
+    path("kyc/review/claim/", views.kyc_review_claim, name="kyc-review-claim"),
+    path("kyc/review/decide/", views.kyc_review_decide, name="kyc-review-decide"),
 ]
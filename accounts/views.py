@@ -1,32 +1,54 @@
-from django.contrib.auth import authenticate
+import uuid
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from moneybridge.ratelimit import rate_limit
+from . import denylist
+from .activity import log_activity
+from .models import KYCDocument
+from .documents import save_kyc_document
+from .review import KYCReviewService
+from .uploads import UploadRejected, read_upload
+from .passwords import PasswordHashBusy, hash_password, verify_password
+from .authentication import AUTH_VERSION_CLAIM, get_auth_version, issue_tokens, revoke_tokens
 
 User = get_user_model()
 
+# Fields login needs: the password, the token claims and the response
+LOGIN_FIELDS = ("id", "password", "email", "first_name", "last_name", "auth_version") + User.CLAIM_FIELDS
+
+BUSY_RESPONSE = {"error": "Trop de tentatives, veuillez reessayer dans un instant"}
+
 @api_view(["POST"])
 @permission_classes([AllowAny])
+@rate_limit("login")
 def login(request):
     email = request.data.get("email")
     password = request.data.get("password")
+    user = User.objects.filter(email=email).only(*LOGIN_FIELDS).first() if email else None
     try:
-        user = User.objects.get(email=email)
-        if user.check_password(password):
-            refresh = RefreshToken.for_user(user)
-            return Response({
-                "access": str(refresh.access_token),
-                "refresh": str(refresh),
-                "user": {"email": user.email, "name": user.get_full_name()}
-            })
-    except User.DoesNotExist:
-        pass
+        valid = verify_password(request, user, password)
+    except PasswordHashBusy:
+        return Response(BUSY_RESPONSE, status=429)
+    if valid and user.is_active:
+        log_activity(user, "LOGIN", "Connexion", request=request)
+        refresh = issue_tokens(user)
+        return Response({
+            "access": str(refresh.access_token),
+            "refresh": str(refresh),
+            "user": {"email": user.email, "name": user.get_full_name()}
+        })
     return Response({"error": "Identifiants incorrects"}, status=400)
 
 @api_view(["POST"])
 @permission_classes([AllowAny])
+@rate_limit("register")
 def register(request):
     email = request.data.get("email")
     password = request.data.get("password")
@@ -34,27 +56,63 @@ def register(request):
     last_name = request.data.get("last_name", "")
     if not email or not password:
         return Response({"error": "Email et mot de passe requis"}, status=400)
+    email = User.objects.normalize_email(email)
     if User.objects.filter(email=email).exists():
         return Response({"error": "Cet email est deja utilise"}, status=400)
-    user = User.objects.create_user(
-        username=email, email=email, password=password,
+    try:
+        encoded_password = hash_password(request, password)
+    except PasswordHashBusy:
+        return Response(BUSY_RESPONSE, status=429)
+    user = User(
+        username=email, email=email, password=encoded_password,
         first_name=first_name, last_name=last_name
     )
-    refresh = RefreshToken.for_user(user)
+    user.save()
+    log_activity(user, "REGISTER", "Creation du compte", request=request)
+    refresh = issue_tokens(user)
     return Response({
         "access": str(refresh.access_token),
         "refresh": str(refresh),
         "user": {"email": user.email, "name": user.get_full_name()}
     })
 
+@api_view(["POST"])
+@permission_classes([AllowAny])
+@rate_limit("token_refresh")
+def token_refresh(request):
+    try:
+        token = RefreshToken(request.data.get("refresh", ""))
+    except TokenError:
+        return Response({"error": "Session expiree, veuillez vous reconnecter"}, status=401)
+    user_id = token[api_settings.USER_ID_CLAIM]
+    # Tokens issued before the auth claims carry no version
+    auth_version = token.get(AUTH_VERSION_CLAIM)
+    if auth_version is not None and auth_version != get_auth_version(user_id):
+        return Response({"error": "Session expiree, veuillez vous reconnecter"}, status=401)
+    # A denylisted token being presented again means it leaked: end every session of the user
+    if not denylist.revoke(token):
+        revoke_tokens(user_id)
+        return Response({"error": "Session expiree, veuillez vous reconnecter"}, status=401)
+    # Fresh claims for the new tokens
+    user = User.objects.filter(pk=user_id, is_active=True).first()
+    if user is None:
+        return Response({"error": "Session expiree, veuillez vous reconnecter"}, status=401)
+    refresh = issue_tokens(user)
+    return Response({
+        "access": str(refresh.access_token),
+        "refresh": str(refresh),
+    })
+
 @api_view(["GET", "PATCH"])
 @permission_classes([IsAuthenticated])
 def profile(request):
-    user = request.user
+    # request.user only carries the token claims
+    user = User.objects.get(pk=request.user.pk)
     if request.method == "PATCH":
         user.first_name = request.data.get("first_name", user.first_name)
         user.last_name = request.data.get("last_name", user.last_name)
         user.save()
+        log_activity(user, "PROFILE_UPDATE", "Mise a jour du profil", request=request)
     return Response({
         "email": user.email,
         "first_name": user.first_name,
@@ -62,3 +120,99 @@ def profile(request):
         "name": user.get_full_name(),
         "date_joined": user.date_joined,
     })
+
+def _document_data(document):
+    return {
+        "id": str(document.id),
+        "document_type": document.document_type,
+        "status": document.status,
+        "rejection_reason": document.rejection_reason,
+        "file_size": document.file_size,
+        "content_type": document.content_type,
+        "uploaded_at": document.uploaded_at,
+        "duplicate_of": str(document.duplicate_of_id) if document.duplicate_of_id else None,
+    }
+
+@api_view(["GET", "POST"])
+@permission_classes([IsAuthenticated])
+def kyc_documents(request):
+    if request.method == "GET":
+        documents = KYCDocument.objects.filter(user=request.user)[:50]
+        return Response({"documents": [_document_data(document) for document in documents]})
+
+    # The file streams to disk while it is parsed, before anything reads request.data
+    try:
+        uploaded, data = read_upload(request)
+    except UploadRejected as e:
+        return Response({"error": str(e)}, status=400)
+
+    document_type = data.get("document_type")
+    if document_type not in dict(KYCDocument.DOCUMENT_TYPES):
+        return Response({"error": "Type de document invalide"}, status=400)
+
+    kyc_status = request.user.kyc_status
+    document, created = save_kyc_document(
+        request.user, uploaded, document_type, data.get("document_number", "")[:100]
+    )
+    if not created:
+        return Response(dict(_document_data(document), duplicate=True), status=200)
+    log_activity(request.user, "KYC_UPLOAD", f"Document {document_type} envoye", request=request)
+    response = _document_data(document)
+    if request.user.kyc_status != kyc_status:
+        # The KYC status is a token claim: the change revoked the client's tokens
+        refresh = issue_tokens(request.user)
+        response.update(access=str(refresh.access_token), refresh=str(refresh))
+    return Response(response, status=201)
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def kyc_document_file(request, document_id):
+    document = KYCDocument.objects.filter(pk=document_id).first()
+    if document is None or (document.user_id != request.user.pk and not request.user.is_staff):
+        return Response({"error": "Document introuvable"}, status=404)
+    if request.query_params.get("thumbnail") and document.thumbnail:
+        stored, content_type = document.thumbnail, "image/jpeg"
+    else:
+        stored, content_type = document.document_file, document.content_type or "application/octet-stream"
+
+    if settings.KYC_ACCEL_REDIRECT_PREFIX:
+        # The front web server sends the file; the worker is free right away
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = settings.KYC_ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + stored.name
+    else:
+        response = FileResponse(stored.open("rb"), content_type=content_type)
+    response["Content-Disposition"] = "inline"
+    response["Cache-Control"] = "private, no-store"
+    return response
+
+@api_view(["POST"])
+@permission_classes([IsAdminUser])
+def kyc_review_claim(request):
+    try:
+        limit = min(max(int(request.data.get("limit", 20)), 1), 100)
+    except (TypeError, ValueError):
+        return Response({"error": "Limite invalide"}, status=400)
+    documents = KYCReviewService.claim_documents(request.user, limit)
+    return Response({"documents": [
+        dict(_document_data(document), user=document.user.email, risk_score=document.risk_score)
+        for document in documents
+    ]})
+
+@api_view(["POST"])
+@permission_classes([IsAdminUser])
+def kyc_review_decide(request):
+    document_ids = request.data.get("document_ids") or []
+    if not isinstance(document_ids, list) or len(document_ids) > 500:
+        return Response({"error": "Liste de documents invalide"}, status=400)
+    try:
+        document_ids = [uuid.UUID(str(document_id)) for document_id in document_ids]
+    except ValueError:
+        return Response({"error": "Liste de documents invalide"}, status=400)
+    try:
+        decided = KYCReviewService.decide(
+            request.user, document_ids, request.data.get("status"),
+            rejection_reason=request.data.get("rejection_reason", "")
+        )
+    except ValueError:
+        return Response({"error": "Decision invalide"}, status=400)
+    return Response({"decided": decided})
@@ -0,0 +1,121 @@
+"""
+Streaming parser for ISO 20022 camt.053 / camt.054 bank statements.
+
+Entries are yielded one by one and discarded from the XML tree as soon as
+they are parsed, so memory use does not grow with the size of the file.
+"""
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation
+from xml.etree.ElementTree import iterparse
+
+
+StatementEntry = namedtuple('StatementEntry', [
+    'end_to_end_id',
+    'amount',
+    'currency',
+    'credit_debit',
+    'status',
+    'booking_date',
+    'account_servicer_reference',
+    'return_reason_code',
+    'return_reason_info',
+    'is_return',
+])
+
+# ISO 20022 bank transaction sub-family codes for returned credit transfers
+RETURN_SUB_FAMILY_CODES = {'RRTN', 'ARET'}
+
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def _text(elem, path, ns):
+    if elem is None:
+        return ''
+    found = elem.find(path, ns)
+    if found is None or found.text is None:
+        return ''
+    return found.text.strip()
+
+
+def _amount(elem, path, ns):
+    found = elem.find(path, ns)
+    if found is None or not found.text:
+        return None, ''
+    try:
+        return Decimal(found.text.strip()), found.get('Ccy', '')
+    except InvalidOperation:
+        return None, ''
+
+
+def _parse_entry(ntry, ns):
+    """Turn one <Ntry> element into one StatementEntry per <TxDtls>."""
+    entry_amount, entry_currency = _amount(ntry, 'c:Amt', ns)
+    credit_debit = _text(ntry, 'c:CdtDbtInd', ns)
+    # camt.053.001.02 uses a plain <Sts>, later versions wrap it in <Cd>
+    status = _text(ntry, 'c:Sts/c:Cd', ns) or _text(ntry, 'c:Sts', ns)
+    booking_date = _text(ntry, 'c:BookgDt/c:Dt', ns) or _text(ntry, 'c:BookgDt/c:DtTm', ns)
+    entry_reference = _text(ntry, 'c:AcctSvcrRef', ns)
+    sub_family = _text(ntry, 'c:BkTxCd/c:Domn/c:Fmly/c:SubFmlyCd', ns)
+
+    tx_details = ntry.findall('c:NtryDtls/c:TxDtls', ns)
+    if not tx_details:
+        tx_details = [None]
+
+    for tx in tx_details:
+        amount, currency = entry_amount, entry_currency
+        if tx is not None and len(tx_details) > 1:
+            tx_amount, tx_currency = _amount(tx, 'c:Amt', ns)
+            if tx_amount is None:
+                tx_amount, tx_currency = _amount(tx, 'c:AmtDtls/c:TxAmt/c:Amt', ns)
+            if tx_amount is not None:
+                amount, currency = tx_amount, tx_currency
+
+        return_info = tx.find('c:RtrInf', ns) if tx is not None else None
+        reason_code = _text(return_info, 'c:Rsn/c:Cd', ns)
+        reason_info = _text(return_info, 'c:AddtlInf', ns)
+
+        yield StatementEntry(
+            end_to_end_id=_text(tx, 'c:Refs/c:EndToEndId', ns),
+            amount=amount,
+            currency=currency,
+            credit_debit=credit_debit,
+            status=status,
+            booking_date=booking_date,
+            account_servicer_reference=_text(tx, 'c:Refs/c:AcctSvcrRef', ns) or entry_reference,
+            return_reason_code=reason_code,
+            return_reason_info=reason_info,
+            is_return=return_info is not None or sub_family in RETURN_SUB_FAMILY_CODES,
+        )
+
+
+def iter_statement_entries(source):
+    """
+    Stream entries from a camt.053 or camt.054 document.
+
+    Args:
+        source: File path or binary file object
+
+    Yields:
+        StatementEntry tuples, in document order
+    """
+    ns = {'c': ''}
+    stack = []
+    for event, elem in iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            if not stack and elem.tag.startswith('{'):
+                ns['c'] = elem.tag[1:].split('}', 1)[0]
+            stack.append(elem)
+            continue
+
+        stack.pop()
+        if _local_name(elem.tag) != 'Ntry':
+            continue
+
+        yield from _parse_entry(elem, ns)
+
+        # Drop the parsed entry so the tree never holds more than one of them
+        elem.clear()
+        if stack:
+            stack[-1].remove(elem)
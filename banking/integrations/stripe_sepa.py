@@ -0,0 +1,144 @@
+"""
+Stripe SEPA payouts - payout creation and balance transaction sources for reconciliation.
+"""
+import json
+from collections import namedtuple
+from decimal import Decimal
+import stripe
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from transactions.payouts import PayoutRejected
+
+
+PayoutRecord = namedtuple('PayoutRecord', [
+    'balance_transaction_id',
+    'payout_id',
+    'payout_status',
+    'fee',
+    'currency',
+    'arrival_date',
+    'failure_code',
+    'failure_message',
+])
+
+# Currencies Stripe reports without a minor unit
+ZERO_DECIMAL_CURRENCIES = {'BIF', 'CLP', 'DJF', 'GNF', 'JPY', 'KMF', 'KRW', 'MGA', 'PYG', 'RWF', 'UGX', 'VND', 'VUV', 'XAF', 'XOF', 'XPF'}
+
+
+def _client():
+    """
+    Stripe client for one call.
+
+    STRIPE_API_BASE can point to stripe-mock to run against the simulator; it
+    is passed to each client instead of being set on the stripe module.
+    """
+    return stripe.StripeClient(settings.STRIPE_SECRET_KEY, base_addresses={'api': settings.STRIPE_API_BASE})
+
+
+def _account_options(**options):
+    """Request options acting on the payout account, when one is configured."""
+    if settings.STRIPE_PAYOUT_ACCOUNT:
+        options['stripe_account'] = settings.STRIPE_PAYOUT_ACCOUNT
+    return options
+
+
+def _to_record(balance_transaction):
+    """Normalize a Stripe balance transaction (API object or exported dict)."""
+    source = balance_transaction.get('source')
+    payout = source if isinstance(source, dict) else {}
+    currency = (balance_transaction.get('currency') or '').upper()
+    divisor = Decimal('1') if currency in ZERO_DECIMAL_CURRENCIES else Decimal('100')
+
+    return PayoutRecord(
+        balance_transaction_id=balance_transaction['id'],
+        payout_id=payout.get('id') if payout else source,
+        payout_status=payout.get('status') or balance_transaction.get('status'),
+        fee=Decimal(balance_transaction.get('fee') or 0) / divisor,
+        currency=currency,
+        arrival_date=payout.get('arrival_date') or balance_transaction.get('available_on'),
+        failure_code=payout.get('failure_code') or '',
+        failure_message=payout.get('failure_message') or '',
+    )
+
+
+def iter_exported_payouts(path):
+    """
+    Read payout balance transactions from a Stripe JSON export.
+
+    Accepts either a bare list or a list response ({"data": [...]}).
+    """
+    with open(path, encoding='utf-8') as handle:
+        payload = json.load(handle)
+    rows = payload.get('data', []) if isinstance(payload, dict) else payload
+    for row in rows:
+        if row.get('type', 'payout') == 'payout' and row.get('source'):
+            yield _to_record(row)
+
+
+def iter_api_payouts(created_gte=None):
+    """Page through payout balance transactions of the payout account from the Stripe API."""
+    params = {
+        'type': 'payout',
+        'limit': 100,
+        'expand': ['data.source'],
+    }
+    if created_gte is not None:
+        params['created'] = {'gte': int(created_gte.timestamp())}
+
+    balance_transactions = _client().balance_transactions.list(params=params, options=_account_options())
+    for balance_transaction in balance_transactions.auto_paging_iter():
+        yield _to_record(balance_transaction)
+
+
+def send_payout(transfer):
+    """
+    Pay a bank transfer out to its beneficiary (PAYOUT_PROVIDERS entry for BANK).
+
+    The beneficiary IBAN is attached as an external account of the payout
+    account (STRIPE_PAYOUT_ACCOUNT), then the payout is sent to it. Both
+    calls are idempotent on the end-to-end ID, so sending a transfer again
+    after a timeout reuses the bank account and creates a single payout.
+
+    Returns:
+        Stripe payout ID (stored as provider_transfer_id for reconciliation)
+
+    Raises:
+        PayoutRejected: if Stripe refused the bank account or the payout
+    """
+    if not settings.STRIPE_PAYOUT_ACCOUNT:
+        raise ImproperlyConfigured("STRIPE_PAYOUT_ACCOUNT is required to send bank payouts")
+
+    client = _client()
+    currency = transfer.currency.upper()
+    multiplier = Decimal('1') if currency in ZERO_DECIMAL_CURRENCIES else Decimal('100')
+    try:
+        bank_account = client.accounts.external_accounts.create(
+            settings.STRIPE_PAYOUT_ACCOUNT,
+            params={
+                'external_account': {
+                    'object': 'bank_account',
+                    'country': transfer.beneficiary_iban[:2],
+                    'currency': currency.lower(),
+                    'account_holder_name': transfer.beneficiary_name,
+                    'account_number': transfer.beneficiary_iban,
+                },
+                'metadata': {'end_to_end_id': transfer.end_to_end_id},
+            },
+            options={'idempotency_key': f'{transfer.end_to_end_id}-destination'},
+        )
+        payout = client.payouts.create(
+            params={
+                'amount': int(transfer.amount * multiplier),
+                'currency': currency.lower(),
+                'destination': bank_account['id'],
+                'description': transfer.reference or f'MoneyBridge {transfer.end_to_end_id}',
+                'metadata': {
+                    'bank_transfer_id': str(transfer.id),
+                    'end_to_end_id': transfer.end_to_end_id,
+                },
+            },
+            options=_account_options(idempotency_key=transfer.end_to_end_id),
+        )
+    except (stripe.error.InvalidRequestError, stripe.error.PermissionError) as exc:
+        raise PayoutRejected(exc.user_message or str(exc))
+    return payout['id']
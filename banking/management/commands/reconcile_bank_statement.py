@@ -0,0 +1,22 @@
+"""
+Reconcile a camt.053/camt.054 bank statement file against bank transfers.
+"""
+from django.core.management.base import BaseCommand
+from banking.services import BankStatementService
+
+
+class Command(BaseCommand):
+    help = 'Reconcile a camt.053/camt.054 statement and refund returned transfers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('statement', help='Path to the camt.053 or camt.054 XML file')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        with open(options['statement'], 'rb') as statement:
+            summary = BankStatementService.reconcile_statement(statement, chunk_size=options['chunk_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            "Entries: {entries} | Returns: {returns} | Matched: {matched} | "
+            "Unmatched: {unmatched} | Refunded: {refunded}".format(**summary)
+        ))
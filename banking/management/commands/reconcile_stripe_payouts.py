@@ -0,0 +1,29 @@
+"""
+Reconcile Stripe payout balance transactions against bank transfers.
+"""
+from django.core.management.base import BaseCommand
+from banking.integrations.stripe_sepa import iter_api_payouts, iter_exported_payouts
+from banking.services import StripePayoutReconciliationService
+
+
+class Command(BaseCommand):
+    help = 'Apply Stripe payout fees, statuses and arrival dates to bank transfers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', help='Stripe JSON export of balance transactions (defaults to the API)')
+        parser.add_argument('--days', type=int, default=1, help='How many days back to page through the API (extended to the oldest open transfer)')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['file']:
+            records = iter_exported_payouts(options['file'])
+        else:
+            created_gte = StripePayoutReconciliationService.api_window_start(options['days'])
+            records = iter_api_payouts(created_gte=created_gte)
+
+        summary = StripePayoutReconciliationService.reconcile_payouts(records, chunk_size=options['chunk_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            "Records: {records} | Matched: {matched} | Unmatched: {unmatched} | "
+            "Completed: {completed} | Failed: {failed} | Flagged: {flagged} | Skipped: {skipped}".format(**summary)
+        ))
@@ -0,0 +1,38 @@
+# Generated by Django 6.0.2 on 2026-10-19 03:52
+
+from django.db import migrations, models
+
+
+def backfill_end_to_end_ids(apps, schema_editor):
+    BankTransfer = apps.get_model('banking', 'BankTransfer')
+    batch = []
+    for transfer in BankTransfer.objects.filter(end_to_end_id='').only('id').iterator(chunk_size=2000):
+        transfer.end_to_end_id = transfer.id.hex
+        batch.append(transfer)
+        if len(batch) >= 2000:
+            BankTransfer.objects.bulk_update(batch, ['end_to_end_id'])
+            batch = []
+    if batch:
+        BankTransfer.objects.bulk_update(batch, ['end_to_end_id'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0001_initial'),
+        ('transactions', '0001_initial'),
+        ('wallets', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='banktransfer',
+            name='end_to_end_id',
+            field=models.CharField(blank=True, help_text='ISO 20022 EndToEndId echoed back in camt.053/camt.054 statements', max_length=35, verbose_name='end-to-end ID'),
+        ),
+        migrations.AddIndex(
+            model_name='banktransfer',
+            index=models.Index(fields=['end_to_end_id'], name='banking_ban_end_to__10805d_idx'),
+        ),
+        migrations.RunPython(backfill_end_to_end_ids, migrations.RunPython.noop),
+    ]
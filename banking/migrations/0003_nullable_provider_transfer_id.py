@@ -0,0 +1,29 @@
+# Generated by Django 6.0.2 on 2026-10-19 03:52
+
+from django.db import migrations, models
+
+
+def blank_to_null(apps, schema_editor):
+    BankTransfer = apps.get_model('banking', 'BankTransfer')
+    BankTransfer.objects.filter(provider_transfer_id='').update(provider_transfer_id=None)
+
+
+def null_to_blank(apps, schema_editor):
+    BankTransfer = apps.get_model('banking', 'BankTransfer')
+    BankTransfer.objects.filter(provider_transfer_id__isnull=True).update(provider_transfer_id='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0002_bank_transfer_end_to_end_id'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='banktransfer',
+            name='provider_transfer_id',
+            field=models.CharField(blank=True, max_length=255, null=True, unique=True, verbose_name='provider transfer ID'),
+        ),
+        migrations.RunPython(blank_to_null, null_to_blank),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-19 03:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0003_nullable_provider_transfer_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='banktransfer',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='version'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 6.0.2 on 2026-10-19 03:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0004_bank_transfer_version'),
+        ('wallets', '0004_mobile_money_account_phone_e164'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='banktransfer',
+            name='bank_account',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='transfers', to='wallets.bankaccount'),
+        ),
+    ]
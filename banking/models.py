@@ -6,9 +6,10 @@ from django.utils.translation import gettext_lazy as _
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 import uuid
+from transactions.state_machine import StatefulModel
 
 
-class BankTransfer(models.Model):
+class BankTransfer(StatefulModel):
     """SEPA instant bank transfer from MoneyBridge to user's bank account."""
     
     TRANSFER_TYPES = [
@@ -26,6 +27,16 @@ class BankTransfer(models.Model):
         ('RETURNED', 'Returned'),
     ]
     
+    # Target status -> statuses it can be reached from
+    TRANSITIONS = {
+        'PENDING': {'INITIATED'},
+        'PROCESSING': {'INITIATED', 'PENDING'},
+        'COMPLETED': {'INITIATED', 'PENDING', 'PROCESSING'},
+        'FAILED': {'INITIATED', 'PENDING', 'PROCESSING'},
+        'CANCELLED': {'INITIATED', 'PENDING', 'PROCESSING'},
+        'RETURNED': {'INITIATED', 'PENDING', 'PROCESSING', 'COMPLETED'},
+    }
+    
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     transaction = models.OneToOneField(
         'transactions.Transaction',
@@ -33,10 +44,13 @@ class BankTransfer(models.Model):
         related_name='bank_transfer'
     )
     
-    # Bank account details
+    # Bank account details; empty for payouts to third parties, whose
+    # details are only kept in the beneficiary fields below
     bank_account = models.ForeignKey(
         'wallets.BankAccount',
         on_delete=models.PROTECT,
+        null=True,
+        blank=True,
         related_name='transfers'
     )
     
@@ -59,6 +73,12 @@ class BankTransfer(models.Model):
     
     # Payment reference
     reference = models.CharField(_('reference'), max_length=140, blank=True)
+    end_to_end_id = models.CharField(
+        _('end-to-end ID'),
+        max_length=35,
+        blank=True,
+        help_text='ISO 20022 EndToEndId echoed back in camt.053/camt.054 statements'
+    )
     
     # Status tracking
     status = models.CharField(_('status'), max_length=20, choices=STATUS_CHOICES, default='INITIATED')
@@ -69,6 +89,7 @@ class BankTransfer(models.Model):
         _('provider transfer ID'),
         max_length=255,
         unique=True,
+        null=True,
         blank=True
     )
     provider_metadata = models.JSONField(_('provider metadata'), default=dict, blank=True)
@@ -99,11 +120,18 @@ class BankTransfer(models.Model):
             models.Index(fields=['-initiated_at']),
             models.Index(fields=['status']),
             models.Index(fields=['provider_transfer_id']),
+            models.Index(fields=['end_to_end_id']),
             models.Index(fields=['bank_account', '-initiated_at']),
         ]
     
     def __str__(self):
         return f"Transfer to {self.beneficiary_iban[-4:]} - {self.amount} {self.currency}"
+    
+    def save(self, *args, **kwargs):
+        # The transfer UUID doubles as the end-to-end reference sent to the bank
+        if not self.end_to_end_id:
+            self.end_to_end_id = self.id.hex
+        super().save(*args, **kwargs)
 
 
 class StripeTransferDetails(models.Model):
@@ -0,0 +1,344 @@
+"""
+Banking services - reconciliation of bank statements and provider payouts.
+"""
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+from itertools import islice
+from django.db import transaction as db_transaction
+from django.db.models import Min
+from django.utils import timezone
+from banking.camt import iter_statement_entries
+from banking.models import BankTransfer, BankTransferReturn, StripeTransferDetails
+from transactions.models import Transaction
+from transactions.services import TransactionService
+
+
+logger = logging.getLogger(__name__)
+
+
+# ISO 20022 return reason codes mapped onto BankTransferReturn.RETURN_REASONS
+RETURN_REASON_CODES = {
+    'AC01': 'INVALID_ACCOUNT_NUMBER',
+    'AC03': 'INVALID_ACCOUNT_NUMBER',
+    'AC04': 'ACCOUNT_CLOSED',
+    'AC06': 'ACCOUNT_CLOSED',
+    'BE04': 'NO_ACCOUNT',
+    'RC01': 'INVALID_ACCOUNT_NUMBER',
+    'AM04': 'INSUFFICIENT_FUNDS',
+    'MD07': 'BENEFICIARY_DECEASED',
+    'MS03': 'BANK_PROCESSING_ERROR',
+    'FF01': 'BANK_PROCESSING_ERROR',
+}
+
+
+# Stripe payout status -> BankTransfer status
+STRIPE_PAYOUT_STATUSES = {
+    'pending': 'PROCESSING',
+    'in_transit': 'PROCESSING',
+    'paid': 'COMPLETED',
+    'failed': 'FAILED',
+    'canceled': 'CANCELLED',
+}
+
+
+def _chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class BankStatementService:
+    """Service for reconciling camt.053/camt.054 statements with bank transfers."""
+
+    @staticmethod
+    def reconcile_statement(source, chunk_size=1000):
+        """
+        Reconcile a bank statement file, recording returned transfers.
+
+        Entries are streamed from the file and processed in fixed-size chunks,
+        each in its own DB transaction, so memory stays constant whatever the
+        size of the statement.
+
+        Args:
+            source: File path or binary file object (camt.053 or camt.054)
+            chunk_size: Number of returned entries matched per DB round trip
+
+        Returns:
+            Dict with reconciliation counters
+        """
+        summary = {
+            'entries': 0,
+            'returns': 0,
+            'matched': 0,
+            'unmatched': 0,
+            'refunded': 0,
+        }
+
+        def returned_entries():
+            for entry in iter_statement_entries(source):
+                summary['entries'] += 1
+                if entry.is_return and entry.end_to_end_id:
+                    summary['returns'] += 1
+                    yield entry
+
+        for chunk in _chunked(returned_entries(), chunk_size):
+            BankStatementService._reconcile_returns(chunk, summary)
+
+        return summary
+
+    @staticmethod
+    @db_transaction.atomic
+    def _reconcile_returns(entries, summary):
+        """
+        Match one chunk of returned entries and refund the affected transfers.
+
+        Refunds go through TransactionService.fail_bank_transfer_transactions
+        for the whole chunk at once. Transactions are not select_related here:
+        the refund locks and reads them itself, so several returns of one
+        wallet in a chunk never work on stale copies of it.
+        """
+        references = {entry.end_to_end_id for entry in entries}
+
+        # Single indexed lookup for the whole chunk; transfers already returned are skipped
+        transfers = (
+            BankTransfer.objects
+            .select_for_update()
+            .filter(
+                end_to_end_id__in=references,
+                return_details__isnull=True,
+                status__in=BankTransfer.allowed_sources('RETURNED')
+            )
+            .order_by('pk')
+        )
+        by_reference = {transfer.end_to_end_id: transfer for transfer in transfers}
+
+        now = timezone.now()
+        returns = []
+        returned_transfers = []
+        failures = {}
+
+        for entry in entries:
+            transfer = by_reference.pop(entry.end_to_end_id, None)
+            if transfer is None:
+                summary['unmatched'] += 1
+                continue
+
+            summary['matched'] += 1
+            reason_code = RETURN_REASON_CODES.get(entry.return_reason_code, 'OTHER')
+            description = entry.return_reason_info or f"Returned by bank ({entry.return_reason_code or 'no reason code'})"
+
+            transfer_return = BankTransferReturn(
+                bank_transfer=transfer,
+                return_reason_code=reason_code,
+                return_reason_description=description,
+                return_amount=entry.amount if entry.amount is not None else transfer.amount,
+                bank_return_reference=entry.account_servicer_reference,
+            )
+
+            failures[transfer.transaction_id] = f"Bank transfer returned: {description}"
+
+            # Rows are locked above, so the version is bumped in the bulk update
+            transfer.status = 'RETURNED'
+            transfer.version += 1
+            transfer.error_code = entry.return_reason_code
+            transfer.failure_reason = description
+            transfer.updated_at = now
+
+            returns.append(transfer_return)
+            returned_transfers.append(transfer)
+
+        # Only transfers whose funds are still locked can be refunded automatically;
+        # completed ones are left with is_refunded=False for manual handling.
+        refunded = TransactionService.fail_bank_transfer_transactions(failures)
+        for transfer_return in returns:
+            if transfer_return.bank_transfer.transaction_id in refunded:
+                transfer_return.is_refunded = True
+                transfer_return.refunded_at = now
+        summary['refunded'] += len(refunded)
+
+        BankTransferReturn.objects.bulk_create(returns)
+        BankTransfer.objects.bulk_update(
+            returned_transfers,
+            ['status', 'version', 'error_code', 'failure_reason', 'updated_at']
+        )
+
+
+class StripePayoutReconciliationService:
+    """Service for reconciling Stripe payout balance transactions with bank transfers."""
+
+    @staticmethod
+    def api_window_start(days=1):
+        """
+        Creation date from which to page payouts out of the Stripe API.
+
+        Covers the last `days` days, extended back to the oldest Stripe
+        transfer not yet in a final status, so a payout that is paid or
+        fails long after it was created is still picked up.
+        """
+        since = timezone.now() - timedelta(days=days)
+        oldest_open = (
+            BankTransfer.objects
+            .filter(
+                payment_provider='STRIPE',
+                provider_transfer_id__isnull=False,
+                status__in=BankTransfer.allowed_sources('COMPLETED')
+            )
+            .aggregate(oldest=Min('initiated_at'))['oldest']
+        )
+        if oldest_open is not None:
+            # The payout is created after the transfer; keep a margin for clock skew
+            since = min(since, oldest_open - timedelta(hours=1))
+        return since
+
+    @staticmethod
+    def reconcile_payouts(records, chunk_size=1000):
+        """
+        Apply Stripe payout data (fees, status, arrival dates) to bank transfers.
+
+        Records are matched by provider_transfer_id one chunk at a time and
+        written back with bulk operations, so each chunk costs a fixed number
+        of queries regardless of its size.
+
+        Args:
+            records: Iterable of PayoutRecord (see banking.integrations.stripe_sepa)
+            chunk_size: Number of records matched per DB round trip
+
+        Returns:
+            Dict with reconciliation counters
+        """
+        summary = {
+            'records': 0,
+            'matched': 0,
+            'unmatched': 0,
+            'completed': 0,
+            'failed': 0,
+            'flagged': 0,
+            'skipped': 0,
+        }
+        for chunk in _chunked(records, chunk_size):
+            summary['records'] += len(chunk)
+            StripePayoutReconciliationService._reconcile_chunk(chunk, summary)
+        return summary
+
+    @staticmethod
+    @db_transaction.atomic
+    def _reconcile_chunk(records, summary):
+        """
+        Match and update one chunk of payout records.
+
+        Paid and failed payouts are settled through the bulk transaction
+        paths, like statement returns. A payout whose transaction was settled
+        concurrently is skipped; one whose transaction cannot be settled any
+        more is flagged for review.
+        """
+        by_payout = {record.payout_id: record for record in records}
+
+        transfers = (
+            BankTransfer.objects
+            .select_for_update(of=('self',))
+            .select_related('transaction', 'stripe_details')
+            .filter(payment_provider='STRIPE', provider_transfer_id__in=list(by_payout))
+            .order_by('pk')
+        )
+
+        now = timezone.now()
+        details_to_create = []
+        details_to_update = []
+        transfers_to_update = []
+        in_flight = []
+        completions = {}
+        failures = {}
+        failed_transfers = {}
+
+        for transfer in transfers:
+            record = by_payout.pop(transfer.provider_transfer_id)
+            summary['matched'] += 1
+
+            arrival_date = None
+            if record.arrival_date:
+                arrival_date = datetime.fromtimestamp(record.arrival_date, tz=dt_timezone.utc)
+
+            try:
+                details = transfer.stripe_details
+                details_to_update.append(details)
+            except StripeTransferDetails.DoesNotExist:
+                details = StripeTransferDetails(bank_transfer=transfer)
+                details_to_create.append(details)
+
+            details.stripe_payout_id = record.payout_id
+            details.stripe_balance_transaction_id = record.balance_transaction_id
+            details.stripe_fee = record.fee
+            details.stripe_status = record.payout_status or ''
+            details.stripe_arrival_date = arrival_date.date() if arrival_date else None
+            details.updated_at = now
+
+            transfer.updated_at = now
+            transfers_to_update.append(transfer)
+
+            new_status = STRIPE_PAYOUT_STATUSES.get(record.payout_status)
+            txn = transfer.transaction
+            if new_status == 'PROCESSING' and txn.status == 'PENDING':
+                # Money is on its way: the transaction must no longer expire
+                in_flight.append(txn.pk)
+            if not new_status or not transfer.can_transition_to(new_status):
+                continue
+
+            transfer.status = new_status
+            transfer.version += 1
+            if new_status == 'COMPLETED':
+                transfer.completed_at = now
+                transfer.actual_arrival_date = arrival_date
+                completions[txn.pk] = transfer
+            elif new_status in ['FAILED', 'CANCELLED']:
+                transfer.error_code = record.failure_code
+                transfer.failure_reason = record.failure_message
+                failures[txn.pk] = record.failure_message or f"Stripe payout {record.payout_status}"
+                failed_transfers[txn.pk] = transfer
+
+        # Settle the whole chunk with a fixed number of statements
+        completed, inactive = TransactionService.complete_bank_transfer_transactions(completions)
+        failed = TransactionService.fail_bank_transfer_transactions(failures)
+        summary['completed'] += len(completed)
+        summary['failed'] += len(failed)
+
+        unsettled = {
+            txn_id: (transfer, 'COMPLETED')
+            for txn_id, transfer in completions.items() if txn_id not in completed
+        }
+        unsettled.update(
+            (txn_id, (transfer, 'FAILED'))
+            for txn_id, transfer in failed_transfers.items() if txn_id not in failed
+        )
+        statuses = dict(Transaction.objects.filter(pk__in=list(unsettled)).values_list('pk', 'status'))
+        for txn_id, (transfer, target) in unsettled.items():
+            status = statuses.get(txn_id)
+            if status == target:
+                # Settled concurrently by a webhook or another reconciler
+                summary['skipped'] += 1
+                continue
+            # The transaction was cancelled or its hold closed while the
+            # payout was out: keep Stripe's status and leave it for review
+            if txn_id in inactive:
+                reason = f"Transaction {txn_id} has no active hold"
+            else:
+                reason = f"Transaction cannot be {target.lower()}: {status}"
+            logger.warning("Stripe payout %s needs review: %s", transfer.provider_transfer_id, reason)
+            transfer.error_code = 'NEEDS_REVIEW'
+            transfer.failure_reason = reason
+            summary['flagged'] += 1
+
+        Transaction.objects.filter(pk__in=in_flight).transition('PROCESSING')
+        summary['unmatched'] += len(by_payout)
+
+        StripeTransferDetails.objects.bulk_create(details_to_create)
+        StripeTransferDetails.objects.bulk_update(details_to_update, [
+            'stripe_payout_id', 'stripe_balance_transaction_id', 'stripe_fee',
+            'stripe_status', 'stripe_arrival_date', 'updated_at',
+        ])
+        BankTransfer.objects.bulk_update(transfers_to_update, [
+            'status', 'version', 'completed_at', 'actual_arrival_date',
+            'error_code', 'failure_reason', 'updated_at',
+        ])
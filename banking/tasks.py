@@ -0,0 +1,17 @@
+"""
+Celery tasks for the banking app.
+"""
+from celery import shared_task
+from banking.integrations.stripe_sepa import iter_api_payouts
+from banking.services import StripePayoutReconciliationService
+
+
+@shared_task
+def reconcile_stripe_payouts(days=1):
+    """
+    Daily reconciliation of Stripe payouts created in the last `days` days,
+    and of older ones whose transfer is still waiting for a final status.
+    """
+    created_gte = StripePayoutReconciliationService.api_window_start(days)
+    records = iter_api_payouts(created_gte=created_gte)
+    return StripePayoutReconciliationService.reconcile_payouts(records)
@@ -0,0 +1,257 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO
+from unittest import mock
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from accounts.models import User
+from banking.integrations.stripe_sepa import PayoutRecord, send_payout
+from banking.models import BankTransfer, BankTransferReturn
+from banking.services import BankStatementService, StripePayoutReconciliationService
+from transactions.models import LedgerEntry
+from transactions.services import TransactionService
+from wallets.models import BankAccount, Wallet
+
+
+CAMT_054 = '''<?xml version="1.0" encoding="UTF-8"?>
+<Document xmlns="urn:iso:std:iso:20022:tech:xsd:camt.054.001.02">
+  <BkToCstmrDbtCdtNtfctn>
+    <Ntfctn>{entries}</Ntfctn>
+  </BkToCstmrDbtCdtNtfctn>
+</Document>'''
+
+RETURN_ENTRY = '''
+      <Ntry>
+        <Amt Ccy="EUR">{amount}</Amt>
+        <CdtDbtInd>CRDT</CdtDbtInd>
+        <Sts>BOOK</Sts>
+        <BkTxCd><Domn><Fmly><SubFmlyCd>RRTN</SubFmlyCd></Fmly></Domn></BkTxCd>
+        <NtryDtls><TxDtls>
+          <Refs><EndToEndId>{end_to_end_id}</EndToEndId></Refs>
+          <RtrInf><Rsn><Cd>AC04</Cd></Rsn><AddtlInf>Account closed</AddtlInf></RtrInf>
+        </TxDtls></NtryDtls>
+      </Ntry>'''
+
+
+def statement(*returns):
+    entries = ''.join(
+        RETURN_ENTRY.format(end_to_end_id=end_to_end_id, amount=amount)
+        for end_to_end_id, amount in returns
+    )
+    return BytesIO(CAMT_054.format(entries=entries).encode())
+
+
+def payout(payout_id, status, failure_message=''):
+    return PayoutRecord(
+        balance_transaction_id=f'txn_{payout_id}',
+        payout_id=payout_id,
+        payout_status=status,
+        fee=Decimal('0.25'),
+        currency='EUR',
+        arrival_date=None,
+        failure_code='account_closed' if failure_message else '',
+        failure_message=failure_message,
+    )
+
+
+class TransferTestCase(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='payer', email='payer@example.com', password='x', phone_number='+33612345678'
+        )
+        self.wallet = Wallet.objects.create(user=self.user, currency='EUR', available_balance=Decimal('100.00'))
+        self.account = BankAccount.objects.create(
+            user=self.user, iban='FR7630006000011234567890189', account_holder_name='Payer'
+        )
+
+    def send(self, amount, **transfer_fields):
+        txn = TransactionService.create_bank_transfer_transaction(self.user, self.account, Decimal(amount))
+        return BankTransfer.objects.create(
+            transaction=txn,
+            bank_account=self.account,
+            amount=txn.amount,
+            beneficiary_name='Payer',
+            beneficiary_iban=self.account.iban,
+            **transfer_fields
+        )
+
+
+class BankStatementReconciliationTests(TransferTestCase):
+
+    def test_returns_of_one_wallet_are_all_refunded(self):
+        first, second = self.send('10.00'), self.send('20.00')
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.available_balance, Decimal('70.00'))
+        self.assertEqual(self.wallet.locked_balance, Decimal('30.00'))
+
+        summary = BankStatementService.reconcile_statement(statement(
+            (first.end_to_end_id, '10.00'),
+            (second.end_to_end_id, '20.00'),
+            ('unknown-reference', '5.00'),
+        ))
+
+        self.assertEqual(summary['returns'], 3)
+        self.assertEqual(summary['matched'], 2)
+        self.assertEqual(summary['unmatched'], 1)
+        self.assertEqual(summary['refunded'], 2)
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.available_balance, Decimal('100.00'))
+        self.assertEqual(self.wallet.locked_balance, Decimal('0.00'))
+        for transfer in (first, second):
+            transfer.refresh_from_db()
+            transfer.transaction.refresh_from_db()
+            self.assertEqual(transfer.status, 'RETURNED')
+            self.assertEqual(transfer.transaction.status, 'FAILED')
+            self.assertTrue(transfer.return_details.is_refunded)
+            self.assertEqual(
+                LedgerEntry.objects.filter(transaction=transfer.transaction, account_type='USER_WALLET', entry_type='CREDIT').count(),
+                1
+            )
+
+    def test_statement_is_only_applied_once(self):
+        transfer = self.send('10.00')
+        BankStatementService.reconcile_statement(statement((transfer.end_to_end_id, '10.00')))
+        summary = BankStatementService.reconcile_statement(statement((transfer.end_to_end_id, '10.00')))
+
+        self.assertEqual(summary['matched'], 0)
+        self.assertEqual(BankTransferReturn.objects.count(), 1)
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.available_balance, Decimal('100.00'))
+
+    def test_completed_transfer_is_recorded_but_not_refunded(self):
+        transfer = self.send('10.00')
+        TransactionService.complete_bank_transfer_transaction(transfer.transaction)
+
+        summary = BankStatementService.reconcile_statement(statement((transfer.end_to_end_id, '10.00')))
+
+        self.assertEqual(summary['matched'], 1)
+        self.assertEqual(summary['refunded'], 0)
+        transfer.refresh_from_db()
+        self.assertEqual(transfer.status, 'RETURNED')
+        self.assertFalse(transfer.return_details.is_refunded)
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.available_balance, Decimal('90.00'))
+
+
+class StripePayoutReconciliationTests(TransferTestCase):
+
+    def test_paid_and_failed_payouts_settle_their_transactions(self):
+        paid = self.send('10.00', provider_transfer_id='po_paid')
+        failed = self.send('20.00', provider_transfer_id='po_failed')
+
+        summary = StripePayoutReconciliationService.reconcile_payouts([
+            payout('po_paid', 'paid'),
+            payout('po_failed', 'failed', 'Account closed'),
+            payout('po_unknown', 'paid'),
+        ])
+
+        self.assertEqual((summary['matched'], summary['unmatched']), (2, 1))
+        self.assertEqual((summary['completed'], summary['failed']), (1, 1))
+        paid.refresh_from_db()
+        failed.refresh_from_db()
+        self.assertEqual(paid.status, 'COMPLETED')
+        self.assertEqual(paid.stripe_details.stripe_fee, Decimal('0.25'))
+        self.assertEqual(failed.status, 'FAILED')
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.available_balance, Decimal('90.00'))
+        self.assertEqual(self.wallet.locked_balance, Decimal('0.00'))
+
+    def test_api_window_reaches_back_to_oldest_open_transfer(self):
+        now = timezone.now()
+        self.assertGreater(StripePayoutReconciliationService.api_window_start(days=1), now - timedelta(days=1, minutes=1))
+
+        old = self.send('10.00', provider_transfer_id='po_old')
+        BankTransfer.objects.filter(pk=old.pk).update(initiated_at=now - timedelta(days=9))
+        self.assertLess(StripePayoutReconciliationService.api_window_start(days=1), now - timedelta(days=9))
+
+        BankTransfer.objects.filter(pk=old.pk).update(status='COMPLETED')
+        self.assertGreater(StripePayoutReconciliationService.api_window_start(days=1), now - timedelta(days=1, minutes=1))
+
+    def test_in_flight_payout_holds_its_transaction(self):
+        transfer = self.send('10.00', provider_transfer_id='po_out')
+
+        StripePayoutReconciliationService.reconcile_payouts([payout('po_out', 'in_transit')])
+
+        transfer.transaction.refresh_from_db()
+        self.assertEqual(transfer.transaction.status, 'PROCESSING')
+
+    def test_paid_payout_of_cancelled_transaction_is_flagged(self):
+        cancelled = self.send('10.00', provider_transfer_id='po_cancelled')
+        cancelled.transaction.transition_to('CANCELLED')
+        paid = self.send('20.00', provider_transfer_id='po_paid')
+
+        with self.assertLogs('banking.services', 'WARNING'):
+            summary = StripePayoutReconciliationService.reconcile_payouts([
+                payout('po_cancelled', 'paid'),
+                payout('po_paid', 'paid'),
+            ])
+
+        self.assertEqual((summary['completed'], summary['flagged']), (1, 1))
+        cancelled.refresh_from_db()
+        self.assertEqual(cancelled.status, 'COMPLETED')
+        self.assertEqual(cancelled.error_code, 'NEEDS_REVIEW')
+        paid.transaction.refresh_from_db()
+        self.assertEqual(paid.transaction.status, 'COMPLETED')
+
+    def test_transaction_settled_concurrently_is_skipped(self):
+        transfer = self.send('10.00', provider_transfer_id='po_paid')
+        TransactionService.complete_bank_transfer_transaction(transfer.transaction)
+
+        summary = StripePayoutReconciliationService.reconcile_payouts([payout('po_paid', 'paid')])
+
+        self.assertEqual((summary['completed'], summary['skipped'], summary['flagged']), (0, 1, 0))
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.available_balance, Decimal('90.00'))
+        self.assertEqual(self.wallet.locked_balance, Decimal('0.00'))
+        self.assertEqual(LedgerEntry.objects.filter(
+            transaction=transfer.transaction, account_type='LOCKED', entry_type='DEBIT'
+        ).count(), 1)
+
+    def test_chunk_is_settled_in_a_fixed_number_of_queries(self):
+        def reconcile(*amounts):
+            records = []
+            for amount in amounts:
+                transfer = self.send(amount, provider_transfer_id=f'po_{BankTransfer.objects.count()}')
+                records.append(payout(transfer.provider_transfer_id, 'paid'))
+            with CaptureQueriesContext(connection) as queries:
+                summary = StripePayoutReconciliationService.reconcile_payouts(records)
+            self.assertEqual(summary['completed'], len(amounts))
+            return len(queries)
+
+        self.assertEqual(reconcile('10.00'), reconcile('5.00', '6.00', '7.00'))
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.available_balance, Decimal('72.00'))
+        self.assertEqual(self.wallet.locked_balance, Decimal('0.00'))
+
+
+@override_settings(STRIPE_PAYOUT_ACCOUNT='acct_payouts')
+class StripeSendPayoutTests(TransferTestCase):
+
+    def test_payout_goes_to_the_beneficiary_iban(self):
+        transfer = self.send('12.34')
+
+        with mock.patch('banking.integrations.stripe_sepa._client') as client:
+            client.return_value.accounts.external_accounts.create.return_value = {'id': 'ba_beneficiary'}
+            client.return_value.payouts.create.return_value = {'id': 'po_1'}
+            self.assertEqual(send_payout(transfer), 'po_1')
+
+        attach = client.return_value.accounts.external_accounts.create.call_args
+        self.assertEqual(attach.args, ('acct_payouts',))
+        self.assertEqual(attach.kwargs['params']['external_account']['account_number'], self.account.iban)
+        payout_call = client.return_value.payouts.create.call_args.kwargs
+        self.assertEqual(payout_call['params']['destination'], 'ba_beneficiary')
+        self.assertEqual(payout_call['params']['amount'], 1234)
+        self.assertEqual(payout_call['options'], {
+            'idempotency_key': transfer.end_to_end_id, 'stripe_account': 'acct_payouts'
+        })
+
+    @override_settings(STRIPE_PAYOUT_ACCOUNT='')
+    def test_payout_account_is_required(self):
+        with mock.patch('banking.integrations.stripe_sepa._client') as client:
+            with self.assertRaises(ImproperlyConfigured):
+                send_payout(self.send('10.00'))
+        self.assertFalse(client.called)
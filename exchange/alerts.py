@@ -0,0 +1,149 @@
+"""
+Rate alert evaluation.
+
+Active alerts of a pair are kept in memory as two sorted threshold arrays
+(ABOVE and BELOW). For a new rate, the triggered ABOVE alerts are the prefix
+of thresholds <= rate and the triggered BELOW alerts the suffix of
+thresholds >= rate, both found with one binary search whatever the number
+of subscriptions. The arrays are reloaded only when the pair's alert
+version moves (an alert was created, deleted or fired elsewhere).
+"""
+from bisect import bisect_left, bisect_right
+from django.core.cache import cache
+from django.db import transaction as db_transaction
+from django.utils import timezone
+from exchange.models import RateAlert
+from transactions.models import OutboxEvent
+from transactions.outbox import record_events
+
+
+ALERT_TASK = 'exchange.tasks.notify_rate_alerts'
+NOTIFICATION_CHUNK_SIZE = 1000
+
+_books = {}
+
+
+def _version_key(base_currency, quote_currency):
+    return f'exchange:alerts:version:{base_currency}:{quote_currency}'
+
+
+def get_book_version(base_currency, quote_currency):
+    key = _version_key(base_currency, quote_currency)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, 1, None)
+        version = cache.get(key, 1)
+    return version
+
+
+def bump_book_version(base_currency, quote_currency):
+    key = _version_key(base_currency, quote_currency)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.set(key, 2, None)
+        return 2
+
+
+class AlertBook:
+    """Sorted active alert thresholds of one currency pair."""
+
+    def __init__(self, base_currency, quote_currency, version):
+        self.version = version
+        self.thresholds = {}
+        self.ids = {}
+        for direction, _ in RateAlert.DIRECTIONS:
+            rows = (
+                RateAlert.objects
+                .filter(
+                    base_currency=base_currency,
+                    quote_currency=quote_currency,
+                    direction=direction,
+                    is_active=True
+                )
+                .order_by('threshold')
+                .values_list('threshold', 'id')
+            )
+            thresholds = []
+            ids = []
+            for threshold, alert_id in rows.iterator(chunk_size=10000):
+                thresholds.append(threshold)
+                ids.append(alert_id)
+            self.thresholds[direction] = thresholds
+            self.ids[direction] = ids
+
+    def take_triggered(self, rate):
+        """Remove and return the IDs of the alerts triggered by `rate`."""
+        above = bisect_right(self.thresholds['ABOVE'], rate)
+        below = bisect_left(self.thresholds['BELOW'], rate)
+
+        triggered = self.ids['ABOVE'][:above] + self.ids['BELOW'][below:]
+        del self.thresholds['ABOVE'][:above]
+        del self.ids['ABOVE'][:above]
+        del self.thresholds['BELOW'][below:]
+        del self.ids['BELOW'][below:]
+        return triggered
+
+
+def get_book(base_currency, quote_currency):
+    version = get_book_version(base_currency, quote_currency)
+    book = _books.get((base_currency, quote_currency))
+    if book is None or book.version != version:
+        book = AlertBook(base_currency, quote_currency, version)
+        _books[(base_currency, quote_currency)] = book
+    return book
+
+
+def evaluate_alerts(base_currency, quote_currency, rate):
+    """
+    Fire every active alert of the pair triggered by a new rate.
+
+    Triggered alerts are deactivated and their notifications queued in the
+    outbox, NOTIFICATION_CHUNK_SIZE alerts per event, in the caller's DB
+    transaction.
+
+    Returns:
+        Number of alerts fired
+    """
+    book = get_book(base_currency, quote_currency)
+    triggered = book.take_triggered(rate)
+    if not triggered:
+        return 0
+
+    now = timezone.now()
+    events = []
+    for start in range(0, len(triggered), NOTIFICATION_CHUNK_SIZE):
+        chunk = triggered[start:start + NOTIFICATION_CHUNK_SIZE]
+        RateAlert.objects.filter(pk__in=chunk, is_active=True).update(
+            is_active=False,
+            triggered_at=now,
+            triggered_rate=rate,
+            updated_at=now
+        )
+        events.append(OutboxEvent(
+            event_type='rate_alert.triggered',
+            aggregate_id=f'{base_currency}/{quote_currency}',
+            payload={
+                'alert_ids': [str(alert_id) for alert_id in chunk],
+                'base_currency': base_currency,
+                'quote_currency': quote_currency,
+                'rate': str(rate),
+            },
+            task_name=ALERT_TASK,
+        ))
+    record_events(events)
+
+    # The in-memory book already dropped the fired alerts. Until commit it
+    # must not be trusted (a rollback would bring them back), so force a
+    # reload unless the commit adopts the new version. If anything else
+    # changed the pair meanwhile, the next evaluation reloads instead.
+    loaded_version = book.version
+    book.version = None
+
+    def adopt_new_version():
+        version = bump_book_version(base_currency, quote_currency)
+        if version == loaded_version + 1:
+            book.version = version
+
+    db_transaction.on_commit(adopt_new_version)
+    return len(triggered)
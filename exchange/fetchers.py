@@ -0,0 +1,145 @@
+"""
+Exchange rate sources and the concurrent fetcher that combines them.
+
+Every configured source is queried at the same time, so a full refresh takes
+about as long as the slowest source. Sources are plain classes; the list is
+read from settings.EXCHANGE_RATE_SOURCES, so local stand-ins can be swapped
+in without touching the network.
+"""
+import asyncio
+import logging
+from decimal import Decimal
+from statistics import median
+import requests
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class RateSource:
+    """A provider of mid-market rates for one base currency."""
+
+    name = ''
+
+    def fetch(self, base_currency, quote_currencies):
+        """
+        Returns:
+            Dict quote currency -> mid rate (Decimal); missing quotes are omitted
+        """
+        raise NotImplementedError
+
+
+class ExchangeRateApiSource(RateSource):
+    """exchangerate-api.com (needs EXCHANGE_RATE_API_KEY)."""
+
+    name = 'exchangerate-api'
+    url = 'https://v6.exchangerate-api.com/v6/{key}/latest/{base}'
+
+    def fetch(self, base_currency, quote_currencies):
+        if not settings.EXCHANGE_RATE_API_KEY:
+            raise RuntimeError('EXCHANGE_RATE_API_KEY is not configured')
+        response = requests.get(
+            self.url.format(key=settings.EXCHANGE_RATE_API_KEY, base=base_currency),
+            timeout=settings.EXCHANGE_RATE_FETCH_TIMEOUT
+        )
+        response.raise_for_status()
+        rates = response.json()['conversion_rates']
+        return {quote: Decimal(str(rates[quote])) for quote in quote_currencies if quote in rates}
+
+
+class FrankfurterSource(RateSource):
+    """ECB reference rates through the Frankfurter API (no key, major currencies only)."""
+
+    name = 'frankfurter'
+    url = 'https://api.frankfurter.app/latest'
+    # Currencies the ECB publishes; asking for any other one fails the whole request
+    CURRENCIES = frozenset({
+        'AUD', 'BGN', 'BRL', 'CAD', 'CHF', 'CNY', 'CZK', 'DKK', 'EUR', 'GBP',
+        'HKD', 'HUF', 'IDR', 'ILS', 'INR', 'ISK', 'JPY', 'KRW', 'MXN', 'MYR',
+        'NOK', 'NZD', 'PHP', 'PLN', 'RON', 'SEK', 'SGD', 'THB', 'TRY', 'USD',
+        'ZAR',
+    })
+
+    def fetch(self, base_currency, quote_currencies):
+        quotes = [q for q in quote_currencies if q != base_currency and q in self.CURRENCIES]
+        if base_currency not in self.CURRENCIES or not quotes:
+            return {}
+        response = requests.get(
+            self.url,
+            params={'from': base_currency, 'to': ','.join(quotes)},
+            timeout=settings.EXCHANGE_RATE_FETCH_TIMEOUT
+        )
+        response.raise_for_status()
+        rates = response.json()['rates']
+        return {quote: Decimal(str(rate)) for quote, rate in rates.items() if quote in quotes}
+
+
+class CfaPegSource(RateSource):
+    """Fixed EUR parity of the CFA francs (1 EUR = 655.957 XOF/XAF)."""
+
+    name = 'cfa-peg'
+    PEG = Decimal('655.957')
+
+    def fetch(self, base_currency, quote_currencies):
+        if base_currency != 'EUR':
+            return {}
+        return {quote: self.PEG for quote in ('XOF', 'XAF') if quote in quote_currencies}
+
+
+def get_sources():
+    return [import_string(path)() for path in settings.EXCHANGE_RATE_SOURCES]
+
+
+async def _fetch_all(sources, base_currency, quote_currencies, timeout):
+    """Run every source in a worker thread at once; failures become exceptions in the result list."""
+    async def run(source):
+        return await asyncio.wait_for(
+            asyncio.to_thread(source.fetch, base_currency, quote_currencies),
+            timeout
+        )
+    return await asyncio.gather(*(run(source) for source in sources), return_exceptions=True)
+
+
+def fetch_mid_rates(base_currency, quote_currencies, sources=None, strategy=None):
+    """
+    Query all sources concurrently and combine their answers per currency.
+
+    Args:
+        base_currency: Currency the rates are quoted against (e.g. 'EUR')
+        quote_currencies: Currencies to price
+        sources: RateSource instances (default: settings.EXCHANGE_RATE_SOURCES)
+        strategy: 'median' of every answer, or 'first' good answer in source
+            order (default: settings.EXCHANGE_RATE_STRATEGY)
+
+    Returns:
+        Dict quote currency -> (mid rate, list of source names used)
+    """
+    sources = get_sources() if sources is None else sources
+    strategy = strategy or settings.EXCHANGE_RATE_STRATEGY
+    quote_currencies = [quote for quote in quote_currencies if quote != base_currency]
+
+    results = asyncio.run(_fetch_all(
+        sources, base_currency, quote_currencies, settings.EXCHANGE_RATE_FETCH_TIMEOUT
+    ))
+
+    answers = {quote: [] for quote in quote_currencies}
+    for source, result in zip(sources, results):
+        if isinstance(result, BaseException):
+            logger.warning("Exchange rate source %s failed: %r", source.name, result)
+            continue
+        for quote, rate in result.items():
+            if quote in answers and rate > 0:
+                answers[quote].append((source.name, rate))
+
+    combined = {}
+    for quote, quotes in answers.items():
+        if not quotes:
+            logger.warning("No exchange rate source priced %s/%s", base_currency, quote)
+            continue
+        if strategy == 'first':
+            name, rate = quotes[0]
+            combined[quote] = (rate, [name])
+        else:
+            combined[quote] = (median(rate for _, rate in quotes), [name for name, _ in quotes])
+    return combined
@@ -0,0 +1,18 @@
+"""
+Rebuild the daily OHLC candles of ExchangeRateHistory from raw exchange rates.
+"""
+from datetime import date
+from django.core.management.base import BaseCommand
+from exchange.rollups import backfill_history
+
+
+class Command(BaseCommand):
+    help = 'Rebuild daily exchange rate candles from ExchangeRate rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=date.fromisoformat, help='First day to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        written = backfill_history(since=options['since'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"Candles written: {written}"))
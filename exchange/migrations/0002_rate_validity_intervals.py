@@ -0,0 +1,45 @@
+# Generated by Django 6.0.2 on 2026-10-19 03:52
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def close_validity_intervals(apps, schema_editor):
+    """Set effective_to of every rate to the effective_from of the next rate of its pair."""
+    ExchangeRate = apps.get_model('exchange', 'ExchangeRate')
+    rates = (
+        ExchangeRate.objects
+        .order_by('base_currency', 'quote_currency', 'effective_from')
+        .only('id', 'base_currency', 'quote_currency', 'effective_from', 'effective_to')
+        .iterator(chunk_size=2000)
+    )
+    batch = []
+    previous = None
+    for rate in rates:
+        if (previous is not None and
+                (previous.base_currency, previous.quote_currency) == (rate.base_currency, rate.quote_currency) and
+                previous.effective_to is None):
+            previous.effective_to = rate.effective_from
+            batch.append(previous)
+            if len(batch) >= 2000:
+                ExchangeRate.objects.bulk_update(batch, ['effective_to'])
+                batch = []
+        previous = rate
+    if batch:
+        ExchangeRate.objects.bulk_update(batch, ['effective_to'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exchange', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='exchangerate',
+            name='effective_from',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='effective from'),
+        ),
+        migrations.RunPython(close_validity_intervals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 6.0.2 on 2026-10-19 03:52
+
+import django.core.validators
+import django.db.models.deletion
+import uuid
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exchange', '0002_rate_validity_intervals'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RateAlert',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('base_currency', models.CharField(max_length=3, verbose_name='base currency')),
+                ('quote_currency', models.CharField(max_length=3, verbose_name='quote currency')),
+                ('direction', models.CharField(choices=[('ABOVE', 'Rises to or above'), ('BELOW', 'Falls to or below')], max_length=5, verbose_name='direction')),
+                ('threshold', models.DecimalField(decimal_places=6, max_digits=15, validators=[django.core.validators.MinValueValidator(Decimal('0.000001'))], verbose_name='threshold')),
+                ('is_active', models.BooleanField(default=True, verbose_name='active')),
+                ('triggered_at', models.DateTimeField(blank=True, null=True, verbose_name='triggered at')),
+                ('triggered_rate', models.DecimalField(blank=True, decimal_places=6, max_digits=15, null=True, verbose_name='triggered rate')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rate_alerts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'rate alert',
+                'verbose_name_plural': 'rate alerts',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(condition=models.Q(('is_active', True)), fields=['base_currency', 'quote_currency', 'direction', 'threshold'], name='rate_alert_active_book_idx'), models.Index(fields=['user', 'is_active'], name='exchange_ra_user_id_b7f2a1_idx')],
+            },
+        ),
+    ]
@@ -1,7 +1,8 @@
 """
 Models for currency exchange rates management.
 """
-from django.db import models
+from django.db import models, transaction as db_transaction
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import MinValueValidator
 from decimal import Decimal
@@ -54,7 +55,7 @@ class ExchangeRate(models.Model):
     is_active = models.BooleanField(_('active'), default=True)
     
     # Timestamps
-    effective_from = models.DateTimeField(_('effective from'), auto_now_add=True)
+    effective_from = models.DateTimeField(_('effective from'), default=timezone.now)
     effective_to = models.DateTimeField(_('effective to'), null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -72,6 +73,50 @@ class ExchangeRate(models.Model):
     def __str__(self):
         return f"{self.base_currency}/{self.quote_currency}: {self.rate}"
     
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        if adding:
+            ExchangeRate.close_previous_rates([self])
+        from exchange.alerts import evaluate_alerts
+        from exchange.rollups import record_tick
+        from exchange.services import ExchangeRateService
+        if adding:
+            # Only a new rate is a tick; edits (e.g. deactivation) are not market data
+            record_tick(self.base_currency, self.quote_currency, self.rate, self.created_at)
+            if self.is_active:
+                evaluate_alerts(self.base_currency, self.quote_currency, self.rate)
+        # Invalidate cached rates once the new rate is visible to other connections
+        db_transaction.on_commit(ExchangeRateService.bump_rates_version)
+    
+    @classmethod
+    def close_previous_rates(cls, rates):
+        """End the validity interval of the rows the given new rates replace."""
+        for rate in rates:
+            cls.objects.filter(
+                base_currency=rate.base_currency,
+                quote_currency=rate.quote_currency,
+                effective_from__lt=rate.effective_from,
+                effective_to__isnull=True
+            ).update(effective_to=rate.effective_from)
+    
+    @classmethod
+    def get_rate_as_of(cls, base_currency, quote_currency, at):
+        """
+        Get the rate that was in force at a given time.
+        
+        Uses the (base, quote, effective_from) index: one backward index
+        step to the last rate published at or before `at`.
+        """
+        rate = cls.objects.filter(
+            base_currency=base_currency,
+            quote_currency=quote_currency,
+            effective_from__lte=at
+        ).order_by('-effective_from').first()
+        if rate is None or (rate.effective_to is not None and rate.effective_to <= at):
+            return None
+        return rate
+    
     @classmethod
     def get_current_rate(cls, base_currency, quote_currency):
         """Get the current active exchange rate."""
@@ -129,6 +174,64 @@ class ExchangeRateHistory(models.Model):
         return f"{self.base_currency}/{self.quote_currency} - {self.date}"
 
 
+class RateAlert(models.Model):
+    """User subscription: notify when a pair's rate crosses a threshold."""
+    
+    DIRECTIONS = [
+        ('ABOVE', 'Rises to or above'),
+        ('BELOW', 'Falls to or below'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey('accounts.User', on_delete=models.CASCADE, related_name='rate_alerts')
+    
+    # Condition
+    base_currency = models.CharField(_('base currency'), max_length=3)
+    quote_currency = models.CharField(_('quote currency'), max_length=3)
+    direction = models.CharField(_('direction'), max_length=5, choices=DIRECTIONS)
+    threshold = models.DecimalField(
+        _('threshold'),
+        max_digits=15,
+        decimal_places=6,
+        validators=[MinValueValidator(Decimal('0.000001'))]
+    )
+    
+    # Status (alerts fire once)
+    is_active = models.BooleanField(_('active'), default=True)
+    triggered_at = models.DateTimeField(_('triggered at'), null=True, blank=True)
+    triggered_rate = models.DecimalField(_('triggered rate'), max_digits=15, decimal_places=6, null=True, blank=True)
+    
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = _('rate alert')
+        verbose_name_plural = _('rate alerts')
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['base_currency', 'quote_currency', 'direction', 'threshold'],
+                condition=models.Q(is_active=True),
+                name='rate_alert_active_book_idx'
+            ),
+            models.Index(fields=['user', 'is_active']),
+        ]
+    
+    def __str__(self):
+        return f"{self.base_currency}/{self.quote_currency} {self.direction} {self.threshold}"
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        from exchange.alerts import bump_book_version
+        db_transaction.on_commit(lambda: bump_book_version(self.base_currency, self.quote_currency))
+    
+    def delete(self, *args, **kwargs):
+        from exchange.alerts import bump_book_version
+        db_transaction.on_commit(lambda: bump_book_version(self.base_currency, self.quote_currency))
+        return super().delete(*args, **kwargs)
+
+
 class CurrencyConversion(models.Model):
     """Log of all currency conversions performed."""
     
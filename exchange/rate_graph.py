@@ -0,0 +1,161 @@
+"""
+Cross-rate matrix for every pair of supported wallet currencies.
+
+The matrix is built from the active ExchangeRate rows whenever the rates
+version changes (see ExchangeRateService.bump_rates_version). Each pair is
+priced directly, through the inverse of the reverse pair, or through a pivot
+currency, keeping the route that gives the customer the most quote currency.
+Lookups are a single index into a flat list.
+"""
+from decimal import Decimal
+from django.core.cache import cache
+from exchange.models import ExchangeRate
+from exchange.services import ExchangeRateService
+from wallets.models import Wallet
+
+
+SUPPORTED_CURRENCIES = tuple(code for code, _ in Wallet.CURRENCIES)
+PIVOT_CURRENCIES = ('EUR', 'USD')
+
+MATRIX_CACHE_TIMEOUT = 3600
+
+_matrix = None
+
+
+class RateMatrix:
+    """Dense currency x currency matrix of conversion rates and their routes."""
+
+    def __init__(self, currencies, rates, paths, version):
+        self.currencies = currencies
+        self.index = {code: position for position, code in enumerate(currencies)}
+        self.rates = rates
+        self.paths = paths
+        self.version = version
+
+    def _position(self, from_currency, to_currency):
+        try:
+            return self.index[from_currency] * len(self.currencies) + self.index[to_currency]
+        except KeyError:
+            raise ValueError(f"Unsupported currency pair {from_currency}/{to_currency}")
+
+    def quote(self, from_currency, to_currency):
+        """
+        Rate and route for converting from_currency into to_currency.
+
+        Returns:
+            Tuple (rate, path), e.g. (Decimal(...), ('GHS', 'EUR', 'XOF')),
+            or (None, None) if no route exists
+        """
+        position = self._position(from_currency, to_currency)
+        return self.rates[position], self.paths[position]
+
+    def rate(self, from_currency, to_currency):
+        return self.rates[self._position(from_currency, to_currency)]
+
+
+def _load_edges():
+    """Latest active conversion rate for every priced direction, from and to any currency."""
+    edges = {}
+    rows = (
+        ExchangeRate.objects
+        .filter(is_active=True)
+        .order_by('base_currency', 'quote_currency', '-created_at')
+        .values_list('base_currency', 'quote_currency', 'sell_rate', 'buy_rate')
+    )
+    seen = set()
+    for base, quote, sell_rate, buy_rate in rows:
+        if (base, quote) in seen:
+            continue
+        seen.add((base, quote))
+        # A direct quote always wins over the inverse of the reverse pair
+        edges[(base, quote)] = sell_rate
+        edges.setdefault((quote, base), Decimal('1') / buy_rate)
+    return edges
+
+
+def build_rate_matrix(version=None):
+    """
+    Build the matrix from the database for the given rates version.
+
+    Best rates are closed over the pivot currencies only (a Floyd-Warshall
+    pass with pivots as the sole intermediates), so a pair can route through
+    EUR, USD or both, e.g. GHS -> USD -> EUR -> XOF.
+    """
+    edges = _load_edges()
+    nodes = set(SUPPORTED_CURRENCIES) | set(PIVOT_CURRENCIES)
+    for base, quote in edges:
+        nodes.update((base, quote))
+
+    best = {node: {} for node in nodes}
+    routes = {node: {} for node in nodes}
+    for (base, quote), rate in edges.items():
+        best[base][quote] = rate
+        routes[base][quote] = (base, quote)
+
+    for pivot in PIVOT_CURRENCIES:
+        to_pivot = [(node, best[node][pivot]) for node in nodes if pivot in best[node]]
+        from_pivot = list(best[pivot].items())
+        for from_currency, first in to_pivot:
+            for to_currency, second in from_pivot:
+                if from_currency == to_currency:
+                    continue
+                route = routes[from_currency][pivot] + routes[pivot][to_currency][1:]
+                if len(set(route)) != len(route):
+                    # Never price a pair through a loop back into one of its own legs
+                    continue
+                candidate = first * second
+                current = best[from_currency].get(to_currency)
+                if current is None or candidate > current:
+                    best[from_currency][to_currency] = candidate
+                    routes[from_currency][to_currency] = route
+
+    currencies = SUPPORTED_CURRENCIES
+    rates = []
+    paths = []
+    for from_currency in currencies:
+        for to_currency in currencies:
+            if from_currency == to_currency:
+                rates.append(Decimal('1'))
+                paths.append((from_currency,))
+            else:
+                rates.append(best[from_currency].get(to_currency))
+                paths.append(routes[from_currency].get(to_currency))
+
+    return RateMatrix(currencies, rates, paths, version)
+
+
+def get_rate_matrix():
+    """
+    Current matrix, rebuilt only when the rates version has moved.
+
+    The built matrix is shared between processes through the cache, so a
+    rate change costs one rebuild, not one per worker.
+    """
+    global _matrix
+    version = ExchangeRateService.get_rates_version()
+    if _matrix is not None and _matrix.version == version:
+        return _matrix
+
+    key = f'exchange:matrix:{version}'
+    matrix = cache.get(key)
+    if matrix is None:
+        matrix = build_rate_matrix(version)
+        cache.set(key, matrix, MATRIX_CACHE_TIMEOUT)
+    _matrix = matrix
+    return matrix
+
+
+def get_cross_rate(from_currency, to_currency):
+    """
+    Rate for any supported pair, direct or triangulated.
+
+    Returns:
+        Tuple (rate, path)
+
+    Raises:
+        ValueError: if the pair is unsupported or has no route
+    """
+    rate, path = get_rate_matrix().quote(from_currency, to_currency)
+    if rate is None:
+        raise ValueError(f"Exchange rate not found for {from_currency}/{to_currency}")
+    return rate, path
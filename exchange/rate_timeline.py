@@ -0,0 +1,98 @@
+"""
+In-memory "rate as of T" lookups over a window of exchange rate history.
+
+A RateTimeline holds the publication times of one pair in a sorted list and
+answers point-in-time queries with a binary search, so re-pricing many
+historical transactions costs one query plus one bisect per transaction.
+"""
+from bisect import bisect_right
+from datetime import timedelta
+from django.utils import timezone
+from exchange.models import ExchangeRate
+from exchange.services import ExchangeRateService
+
+
+HOT_WINDOW = timedelta(days=7)
+
+_hot_timelines = {}
+
+
+class RateTimeline:
+    """Sorted rate history of one currency pair over [start, end] (end=None: open-ended)."""
+
+    def __init__(self, base_currency, quote_currency, start, end=None):
+        self.base_currency = base_currency
+        self.quote_currency = quote_currency
+        self.start = start
+        self.end = end
+        self.starts = []
+        self.ends = []
+        self.rates = []
+
+        # The rate in force at `start` began before it, so the query reaches back one row
+        first = ExchangeRate.get_rate_as_of(base_currency, quote_currency, start)
+        rows = ExchangeRate.objects.filter(
+            base_currency=base_currency,
+            quote_currency=quote_currency,
+            effective_from__gt=start
+        ).order_by('effective_from')
+        if end is not None:
+            rows = rows.filter(effective_from__lte=end)
+        for rate in ([first] if first else []) + list(rows):
+            self.starts.append(rate.effective_from)
+            self.ends.append(rate.effective_to)
+            self.rates.append(rate)
+
+    def covers(self, at):
+        return self.start <= at and (self.end is None or at <= self.end)
+
+    def rate_as_of(self, at):
+        """
+        ExchangeRate in force at `at`, or None.
+
+        Raises:
+            ValueError: if `at` is outside the loaded window
+        """
+        if not self.covers(at):
+            raise ValueError(f"{at} is outside the loaded window {self.start} - {self.end}")
+        position = bisect_right(self.starts, at) - 1
+        if position < 0:
+            return None
+        end = self.ends[position]
+        if end is not None and end <= at:
+            return None
+        return self.rates[position]
+
+
+def rates_as_of(base_currency, quote_currency, timestamps):
+    """
+    Rates in force at each of the given times, for bulk re-pricing.
+
+    Returns:
+        List of ExchangeRate (or None), in the order of `timestamps`
+    """
+    if not timestamps:
+        return []
+    timeline = RateTimeline(base_currency, quote_currency, min(timestamps), max(timestamps))
+    return [timeline.rate_as_of(at) for at in timestamps]
+
+
+def get_rate_as_of(base_currency, quote_currency, at):
+    """
+    Rate in force at `at`.
+
+    Times within HOT_WINDOW of now are answered from a per-process timeline
+    that stays open-ended until the rates version moves; older times go to
+    the index.
+    """
+    now = timezone.now()
+    if at < now - HOT_WINDOW:
+        return ExchangeRate.get_rate_as_of(base_currency, quote_currency, at)
+
+    version = ExchangeRateService.get_rates_version()
+    key = (base_currency, quote_currency)
+    cached = _hot_timelines.get(key)
+    if cached is None or cached[0] != version or not cached[1].covers(at):
+        cached = (version, RateTimeline(base_currency, quote_currency, now - HOT_WINDOW))
+        _hot_timelines[key] = cached
+    return cached[1].rate_as_of(at)
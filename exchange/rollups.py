@@ -0,0 +1,167 @@
+"""
+Daily OHLC candles in ExchangeRateHistory, kept up to date from rate ticks.
+
+Live ticks update the day's candle in place (high/low with GREATEST/LEAST,
+close overwritten), so reading a chart never touches ExchangeRate. Weekly
+and monthly candles are folded from the daily ones.
+"""
+from datetime import timedelta
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models import Value
+from django.db.models.functions import Greatest, Least
+from django.utils import timezone
+from exchange.models import ExchangeRate, ExchangeRateHistory
+
+
+INTERVALS = ('day', 'week', 'month')
+
+
+def record_tick(base_currency, quote_currency, rate, at=None):
+    """
+    Fold one rate into the candle of its day.
+
+    Ticks are expected in time order (live publishing); use backfill_history
+    to rebuild candles from out-of-order data.
+    """
+    day = timezone.localdate(at or timezone.now())
+    candle = ExchangeRateHistory.objects.filter(
+        base_currency=base_currency,
+        quote_currency=quote_currency,
+        date=day
+    )
+    update = {
+        'high_rate': Greatest('high_rate', Value(rate)),
+        'low_rate': Least('low_rate', Value(rate)),
+        'close_rate': rate,
+    }
+    if candle.update(**update):
+        return
+
+    # First tick of the day; another worker may open the candle concurrently
+    try:
+        with db_transaction.atomic():
+            ExchangeRateHistory.objects.create(
+                base_currency=base_currency,
+                quote_currency=quote_currency,
+                date=day,
+                open_rate=rate,
+                high_rate=rate,
+                low_rate=rate,
+                close_rate=rate
+            )
+    except IntegrityError:
+        candle.update(**update)
+
+
+def record_ticks(rates):
+    """Fold a batch of ExchangeRate objects into their candles."""
+    for rate in rates:
+        record_tick(rate.base_currency, rate.quote_currency, rate.rate, rate.created_at)
+
+
+def backfill_history(since=None, chunk_size=5000):
+    """
+    Rebuild daily candles from the raw rates.
+
+    Rates are streamed in (pair, time) order so only the candle being built
+    is held in memory, and candles are upserted chunk by chunk.
+
+    Args:
+        since: Only rebuild days from this date on (default: all history)
+        chunk_size: Rates read and candles written per round trip
+
+    Returns:
+        Number of candles written
+    """
+    rates = ExchangeRate.objects.order_by('base_currency', 'quote_currency', 'created_at')
+    if since:
+        rates = rates.filter(created_at__date__gte=since)
+    rows = rates.values_list('base_currency', 'quote_currency', 'rate', 'created_at').iterator(chunk_size=chunk_size)
+
+    written = 0
+    pending = []
+    candle = None
+    for base, quote, rate, created_at in rows:
+        key = (base, quote, timezone.localdate(created_at))
+        if candle is not None and candle[0] == key:
+            values = candle[1]
+            values['high_rate'] = max(values['high_rate'], rate)
+            values['low_rate'] = min(values['low_rate'], rate)
+            values['close_rate'] = rate
+            continue
+
+        if candle is not None:
+            pending.append(candle)
+        candle = (key, {'open_rate': rate, 'high_rate': rate, 'low_rate': rate, 'close_rate': rate})
+        if len(pending) >= chunk_size:
+            written += _upsert_candles(pending)
+            pending = []
+
+    if candle is not None:
+        pending.append(candle)
+    if pending:
+        written += _upsert_candles(pending)
+    return written
+
+
+def _upsert_candles(candles):
+    ExchangeRateHistory.objects.bulk_create(
+        [
+            ExchangeRateHistory(base_currency=base, quote_currency=quote, date=day, **values)
+            for (base, quote, day), values in candles
+        ],
+        update_conflicts=True,
+        unique_fields=['base_currency', 'quote_currency', 'date'],
+        update_fields=['open_rate', 'high_rate', 'low_rate', 'close_rate']
+    )
+    return len(candles)
+
+
+def _period_start(day, interval):
+    if interval == 'week':
+        return day - timedelta(days=day.weekday())
+    if interval == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def get_candles(base_currency, quote_currency, interval='day', limit=90):
+    """
+    OHLC series for a pair, oldest first.
+
+    Args:
+        interval: 'day', 'week' or 'month'
+        limit: Number of candles
+
+    Returns:
+        List of dicts with date, open, high, low, close
+    """
+    if interval not in INTERVALS:
+        raise ValueError(f"Unknown interval: {interval}")
+
+    days = {'day': 1, 'week': 7, 'month': 31}[interval] * limit
+    start = _period_start(timezone.localdate() - timedelta(days=days), interval)
+    daily = (
+        ExchangeRateHistory.objects
+        .filter(base_currency=base_currency, quote_currency=quote_currency, date__gte=start)
+        .order_by('date')
+        .values_list('date', 'open_rate', 'high_rate', 'low_rate', 'close_rate')
+    )
+
+    candles = []
+    for day, open_rate, high_rate, low_rate, close_rate in daily:
+        period = _period_start(day, interval)
+        if candles and candles[-1]['date'] == period:
+            current = candles[-1]
+            current['high'] = max(current['high'], high_rate)
+            current['low'] = min(current['low'], low_rate)
+            current['close'] = close_rate
+        else:
+            candles.append({
+                'date': period,
+                'open': open_rate,
+                'high': high_rate,
+                'low': low_rate,
+                'close': close_rate,
+            })
+    return candles[-limit:]
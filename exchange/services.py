@@ -0,0 +1,125 @@
+"""
+Exchange rate service - cached access to current rates.
+"""
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction as db_transaction
+from exchange.alerts import evaluate_alerts
+from exchange.models import ExchangeRate
+from exchange.rollups import record_ticks
+
+
+RATES_VERSION_KEY = 'exchange:rates:version'
+RATE_CACHE_TIMEOUT = 300
+
+RATE_PRECISION = Decimal('0.000001')
+
+# Cached marker for pairs with no rate, so misses don't hit the DB either
+_MISSING = 'missing'
+
+
+class ExchangeRateService:
+    """Service for reading exchange rates through the shared cache."""
+
+    @staticmethod
+    def get_rates_version():
+        """Current rates generation; every cached rate is keyed by it."""
+        version = cache.get(RATES_VERSION_KEY)
+        if version is None:
+            cache.add(RATES_VERSION_KEY, 1, None)
+            version = cache.get(RATES_VERSION_KEY, 1)
+        return version
+
+    @staticmethod
+    def bump_rates_version():
+        """Invalidate every cached rate at once by moving to a new generation."""
+        try:
+            return cache.incr(RATES_VERSION_KEY)
+        except ValueError:
+            cache.set(RATES_VERSION_KEY, 2, None)
+            return 2
+
+    @staticmethod
+    def get_rate(base_currency, quote_currency):
+        """
+        Cached equivalent of ExchangeRate.get_current_rate.
+
+        Returns:
+            ExchangeRate object or None
+        """
+        version = ExchangeRateService.get_rates_version()
+        key = f'exchange:rate:{version}:{base_currency}:{quote_currency}'
+        rate = cache.get(key)
+        if rate is None:
+            rate = ExchangeRate.get_current_rate(base_currency, quote_currency) or _MISSING
+            cache.set(key, rate, RATE_CACHE_TIMEOUT)
+        return None if rate == _MISSING else rate
+
+    @staticmethod
+    def get_conversion_rate(from_currency, to_currency):
+        """
+        Rate applied when converting from_currency into to_currency.
+
+        Supported wallet currencies are priced from the cross-rate matrix
+        (direct, inverse or through a pivot). Other currencies use the direct
+        pair's sell rate, or the inverse of the reverse pair's buy rate
+        (matching ExchangeRate.convert).
+
+        Raises:
+            ValueError: if no rate is available
+        """
+        if from_currency == to_currency:
+            return Decimal('1')
+
+        from exchange.rate_graph import SUPPORTED_CURRENCIES, get_cross_rate
+        if from_currency in SUPPORTED_CURRENCIES and to_currency in SUPPORTED_CURRENCIES:
+            return get_cross_rate(from_currency, to_currency)[0]
+
+        rate = ExchangeRateService.get_rate(from_currency, to_currency)
+        if rate:
+            return rate.sell_rate
+
+        inverse = ExchangeRateService.get_rate(to_currency, from_currency)
+        if inverse:
+            return Decimal('1') / inverse.buy_rate
+
+        raise ValueError(f"Exchange rate not found for {from_currency}/{to_currency}")
+
+    @staticmethod
+    @db_transaction.atomic
+    def publish_rates(base_currency, mid_rates):
+        """
+        Store a fresh set of rates in one bulk INSERT.
+
+        The configured spread is applied around each mid rate: sell_rate
+        (base -> quote) is below it and buy_rate (quote -> base, divided by)
+        above it, so both directions carry the margin.
+
+        Args:
+            base_currency: Base currency of every pair
+            mid_rates: Dict quote currency -> (mid rate, list of source names),
+                as returned by exchange.fetchers.fetch_mid_rates
+
+        Returns:
+            List of created ExchangeRate objects
+        """
+        spread = Decimal(str(settings.EXCHANGE_RATE_SPREAD))
+        rates = ExchangeRate.objects.bulk_create([
+            ExchangeRate(
+                base_currency=base_currency,
+                quote_currency=quote,
+                rate=mid.quantize(RATE_PRECISION),
+                buy_rate=(mid * (1 + spread)).quantize(RATE_PRECISION),
+                sell_rate=(mid * (1 - spread)).quantize(RATE_PRECISION),
+                source='+'.join(sources)[:50]
+            )
+            for quote, (mid, sources) in sorted(mid_rates.items())
+        ])
+        # bulk_create bypasses ExchangeRate.save(), so do its bookkeeping here
+        ExchangeRate.close_previous_rates(rates)
+        record_ticks(rates)
+        for rate in rates:
+            evaluate_alerts(rate.base_currency, rate.quote_currency, rate.rate)
+        db_transaction.on_commit(ExchangeRateService.bump_rates_version)
+        return rates
@@ -0,0 +1,44 @@
+"""
+Celery tasks for the exchange app.
+"""
+from celery import shared_task
+from django.conf import settings
+from django.core.mail import send_mass_mail
+from exchange.fetchers import fetch_mid_rates
+from exchange.models import RateAlert
+from exchange.rate_graph import PIVOT_CURRENCIES, SUPPORTED_CURRENCIES
+from exchange.services import ExchangeRateService
+
+
+@shared_task(ignore_result=True)
+def refresh_exchange_rates(base_currency='EUR'):
+    """Fetch every supported pair (and the pivots) from all sources and publish them."""
+    quote_currencies = sorted(set(SUPPORTED_CURRENCIES) | set(PIVOT_CURRENCIES))
+    mid_rates = fetch_mid_rates(base_currency, quote_currencies)
+    if mid_rates:
+        ExchangeRateService.publish_rates(base_currency, mid_rates)
+    return len(mid_rates)
+
+
+@shared_task(ignore_result=True)
+def notify_rate_alerts(event_id, event_type, payload):
+    """Email the owners of a chunk of triggered rate alerts over one SMTP connection."""
+    alerts = (
+        RateAlert.objects
+        .filter(pk__in=payload['alert_ids'])
+        .select_related('user')
+        .only('direction', 'threshold', 'user__email')
+    )
+    pair = f"{payload['base_currency']}/{payload['quote_currency']}"
+    messages = [
+        (
+            f"Alerte taux {pair}",
+            f"Le taux {pair} est de {payload['rate']} "
+            f"({'au-dessus' if alert.direction == 'ABOVE' else 'en dessous'} de votre seuil {alert.threshold}).",
+            settings.DEFAULT_FROM_EMAIL,
+            [alert.user.email],
+        )
+        for alert in alerts
+        if alert.user.email
+    ]
+    return send_mass_mail(messages, fail_silently=True)
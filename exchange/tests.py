@@ -0,0 +1,261 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from accounts.models import User
+from exchange.fetchers import CfaPegSource, FrankfurterSource, RateSource, fetch_mid_rates
+from exchange.models import ExchangeRate, ExchangeRateHistory, RateAlert
+from exchange.rate_graph import get_cross_rate, get_rate_matrix
+from exchange.rate_timeline import RateTimeline, get_rate_as_of, rates_as_of
+from exchange.rollups import get_candles
+
+
+class FixedSource(RateSource):
+    """Local stand-in answering from a dict."""
+
+    def __init__(self, name, rates):
+        self.name = name
+        self.rates = rates
+
+    def fetch(self, base_currency, quote_currencies):
+        return {quote: Decimal(rate) for quote, rate in self.rates.items() if quote in quote_currencies}
+
+
+class FailingSource(RateSource):
+
+    name = 'down'
+
+    def fetch(self, base_currency, quote_currencies):
+        raise ConnectionError('unreachable')
+
+
+@override_settings(EXCHANGE_RATE_SOURCES=['exchange.tests.FailingSource'], EXCHANGE_RATE_FETCH_TIMEOUT=5)
+class FetchMidRatesTests(SimpleTestCase):
+
+    def test_median_of_answers_and_failed_sources_are_skipped(self):
+        sources = [
+            FixedSource('a', {'USD': '1.08', 'GBP': '0.85'}),
+            FixedSource('b', {'USD': '1.10'}),
+            FixedSource('c', {'USD': '1.12'}),
+            FailingSource(),
+        ]
+
+        with self.assertLogs('exchange.fetchers', 'WARNING'):
+            rates = fetch_mid_rates('EUR', ['EUR', 'USD', 'GBP', 'XOF'], sources=sources, strategy='median')
+
+        self.assertEqual(rates['USD'], (Decimal('1.10'), ['a', 'b', 'c']))
+        self.assertEqual(rates['GBP'], (Decimal('0.85'), ['a']))
+        self.assertNotIn('XOF', rates)
+        self.assertNotIn('EUR', rates)
+
+    def test_first_strategy_keeps_source_order(self):
+        sources = [FixedSource('a', {'USD': '1.08'}), FixedSource('b', {'USD': '1.10'})]
+
+        rates = fetch_mid_rates('EUR', ['USD'], sources=sources, strategy='first')
+
+        self.assertEqual(rates['USD'], (Decimal('1.08'), ['a']))
+
+    def test_sources_come_from_settings(self):
+        with self.assertLogs('exchange.fetchers', 'WARNING'):
+            self.assertEqual(fetch_mid_rates('EUR', ['USD']), {})
+
+
+@override_settings(EXCHANGE_RATE_FETCH_TIMEOUT=5)
+class FrankfurterSourceTests(SimpleTestCase):
+
+    def test_only_ecb_currencies_are_requested(self):
+        with mock.patch('exchange.fetchers.requests.get') as get:
+            get.return_value.json.return_value = {'rates': {'USD': 1.09}}
+            rates = FrankfurterSource().fetch('EUR', ['USD', 'XOF', 'GHS', 'EUR'])
+
+        self.assertEqual(get.call_args.kwargs['params'], {'from': 'EUR', 'to': 'USD'})
+        self.assertEqual(rates, {'USD': Decimal('1.09')})
+
+    def test_unpublished_base_is_not_requested(self):
+        with mock.patch('exchange.fetchers.requests.get') as get:
+            self.assertEqual(FrankfurterSource().fetch('XOF', ['EUR', 'USD']), {})
+            self.assertEqual(FrankfurterSource().fetch('EUR', ['XOF']), {})
+        self.assertFalse(get.called)
+
+    def test_cfa_peg(self):
+        self.assertEqual(CfaPegSource().fetch('EUR', ['XOF', 'USD']), {'XOF': Decimal('655.957')})
+        self.assertEqual(CfaPegSource().fetch('USD', ['XOF']), {})
+
+
+class RateAlertTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='ada', email='ada@example.com', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        ExchangeRate.objects.create(
+            base_currency='EUR', quote_currency='USD', rate=Decimal('1.08'),
+            buy_rate=Decimal('1.09'), sell_rate=Decimal('1.07'), source='test'
+        )
+
+    def create(self, **data):
+        return self.client.post('/api/exchange/alerts/', {'base': 'EUR', 'quote': 'USD', **data}, format='json')
+
+    def test_alert_on_published_pair(self):
+        response = self.create(threshold='1.1', direction='above')
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['threshold'], '1.100000')
+
+    def test_unpublished_pair_is_refused(self):
+        for base, quote in [('USD', 'EUR'), ('EUR', 'ZZZ')]:
+            with self.subTest(base=base, quote=quote):
+                self.assertEqual(self.create(base=base, quote=quote, threshold='1').status_code, 400)
+        self.assertFalse(RateAlert.objects.exists())
+
+    def test_out_of_range_threshold_is_refused(self):
+        for threshold in ['0', '-1', '0.0000001', '1000000000', '1e30', 'NaN', 'abc']:
+            with self.subTest(threshold=threshold):
+                self.assertEqual(self.create(threshold=threshold).status_code, 400)
+        self.assertEqual(self.create(threshold='999999999.999999').status_code, 201)
+
+
+class RateGraphTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch('exchange.rate_graph._matrix', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.publish('EUR', 'XOF', sell='655', buy='660')
+        self.publish('EUR', 'GHS', sell='12', buy='12.5')
+
+    def publish(self, base, quote, sell, buy):
+        with self.captureOnCommitCallbacks(execute=True):
+            ExchangeRate.objects.create(
+                base_currency=base, quote_currency=quote, rate=Decimal(sell),
+                buy_rate=Decimal(buy), sell_rate=Decimal(sell), source='test'
+            )
+
+    def test_direct_inverse_and_pivot_routes(self):
+        self.assertEqual(get_cross_rate('EUR', 'XOF'), (Decimal('655'), ('EUR', 'XOF')))
+        self.assertEqual(get_cross_rate('XOF', 'EUR'), (Decimal('1') / Decimal('660'), ('XOF', 'EUR')))
+        self.assertEqual(get_cross_rate('GHS', 'XOF'), (Decimal('655') / Decimal('12.5'), ('GHS', 'EUR', 'XOF')))
+        self.assertEqual(get_cross_rate('XOF', 'XOF'), (Decimal('1'), ('XOF',)))
+
+    def test_direct_quote_wins_over_the_inverse(self):
+        self.publish('XOF', 'EUR', sell='0.0016', buy='0.0015')
+
+        self.assertEqual(get_cross_rate('XOF', 'EUR'), (Decimal('0.0016'), ('XOF', 'EUR')))
+
+    def test_missing_route_and_unknown_currency(self):
+        for pair in [('KES', 'UGX'), ('EUR', 'ZZZ')]:
+            with self.subTest(pair=pair):
+                with self.assertRaises(ValueError):
+                    get_cross_rate(*pair)
+
+    def test_new_rate_replaces_the_cached_matrix(self):
+        self.assertEqual(get_cross_rate('EUR', 'XOF')[0], Decimal('655'))
+        version = get_rate_matrix().version
+
+        self.publish('EUR', 'XOF', sell='650', buy='652')
+
+        self.assertNotEqual(get_rate_matrix().version, version)
+        self.assertEqual(get_cross_rate('EUR', 'XOF')[0], Decimal('650'))
+        self.assertEqual(get_cross_rate('GHS', 'XOF')[0], Decimal('650') / Decimal('12.5'))
+
+
+class RollupTests(TestCase):
+
+    def rate(self, value, **fields):
+        return ExchangeRate.objects.create(
+            base_currency='EUR', quote_currency='USD', rate=Decimal(value),
+            buy_rate=Decimal(value), sell_rate=Decimal(value), source='test', **fields
+        )
+
+    def test_ticks_fold_into_the_day_candle(self):
+        for value in ('1.08', '1.11', '1.05', '1.09'):
+            self.rate(value)
+
+        candle = ExchangeRateHistory.objects.get(base_currency='EUR', quote_currency='USD')
+        self.assertEqual(
+            (candle.open_rate, candle.high_rate, candle.low_rate, candle.close_rate),
+            (Decimal('1.08'), Decimal('1.11'), Decimal('1.05'), Decimal('1.09'))
+        )
+
+    def test_updating_a_rate_is_not_a_tick(self):
+        self.rate('1.08')
+        old = self.rate('1.20')
+        self.rate('1.10')
+
+        old.is_active = False
+        old.save()
+
+        candle = ExchangeRateHistory.objects.get(base_currency='EUR', quote_currency='USD')
+        self.assertEqual((candle.high_rate, candle.close_rate), (Decimal('1.20'), Decimal('1.10')))
+
+    def test_weekly_candles_are_folded_from_days(self):
+        monday = timezone.localdate() - timedelta(days=timezone.localdate().weekday() + 7)
+        for offset, (open_rate, high, low, close) in enumerate([
+            ('1.00', '1.10', '0.95', '1.05'),
+            ('1.05', '1.20', '1.00', '1.15'),
+        ]):
+            ExchangeRateHistory.objects.create(
+                base_currency='EUR', quote_currency='USD', date=monday + timedelta(days=offset),
+                open_rate=Decimal(open_rate), high_rate=Decimal(high), low_rate=Decimal(low), close_rate=Decimal(close)
+            )
+
+        week, = get_candles('EUR', 'USD', interval='week', limit=4)
+
+        self.assertEqual(week, {
+            'date': monday, 'open': Decimal('1.00'), 'high': Decimal('1.20'),
+            'low': Decimal('0.95'), 'close': Decimal('1.15'),
+        })
+
+
+class RateTimelineTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.dict('exchange.rate_timeline._hot_timelines', clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.now = timezone.now()
+        self.times = [self.now - timedelta(hours=hours) for hours in (3, 2, 1)]
+        self.rates = [self.publish(at, value) for at, value in zip(self.times, ('1.08', '1.09', '1.10'))]
+
+    def publish(self, at, value):
+        with self.captureOnCommitCallbacks(execute=True):
+            return ExchangeRate.objects.create(
+                base_currency='EUR', quote_currency='USD', rate=Decimal(value),
+                buy_rate=Decimal(value), sell_rate=Decimal(value), source='test', effective_from=at
+            )
+
+    def test_rates_as_of_each_time(self):
+        first, second, third = self.times
+        minute = timedelta(minutes=1)
+
+        rates = rates_as_of('EUR', 'USD', [first - minute, first + minute, second, third + minute])
+
+        self.assertEqual(rates, [None, self.rates[0], self.rates[1], self.rates[2]])
+
+    def test_window_reaches_back_to_the_rate_in_force(self):
+        start = self.times[0] + timedelta(minutes=30)
+        timeline = RateTimeline('EUR', 'USD', start, self.times[1])
+
+        self.assertEqual(timeline.rate_as_of(start), self.rates[0])
+        with self.assertRaises(ValueError):
+            timeline.rate_as_of(self.times[2])
+
+    def test_closed_interval_has_no_rate(self):
+        ExchangeRate.objects.filter(pk=self.rates[2].pk).update(effective_to=self.times[2] + timedelta(minutes=30))
+
+        self.assertIsNone(rates_as_of('EUR', 'USD', [self.times[2] + timedelta(minutes=45)])[0])
+
+    def test_hot_timeline_follows_new_rates(self):
+        self.assertEqual(get_rate_as_of('EUR', 'USD', self.now), self.rates[2])
+
+        newest = self.publish(self.now - timedelta(minutes=5), '1.11')
+
+        self.assertEqual(get_rate_as_of('EUR', 'USD', self.now), newest)
+        self.assertEqual(get_rate_as_of('EUR', 'USD', self.times[1]), self.rates[1])
+        self.assertIsNone(get_rate_as_of('EUR', 'USD', self.now - timedelta(days=30)))
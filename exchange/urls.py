@@ -1,3 +1,8 @@
 from django.urls import path
+from . import views
 
-urlpatterns = []
+urlpatterns = [
+    path('candles/', views.rate_candles, name='rate_candles'),
+    path('alerts/', views.rate_alerts, name='rate_alerts'),
+    path('alerts/<uuid:alert_id>/', views.delete_rate_alert, name='delete_rate_alert'),
+]
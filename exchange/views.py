@@ -0,0 +1,112 @@
+from decimal import Decimal, InvalidOperation
+from django.views.decorators.cache import cache_page
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.response import Response
+from .models import RateAlert
+from .rollups import INTERVALS, get_candles
+from .services import ExchangeRateService
+
+CANDLES_CACHE_SECONDS = 300
+MAX_CANDLES = 365
+MAX_ACTIVE_ALERTS = 20
+# RateAlert.threshold is DecimalField(max_digits=15, decimal_places=6)
+THRESHOLD_PRECISION = Decimal('0.000001')
+MAX_THRESHOLD = Decimal('999999999.999999')
+
+
+@cache_page(CANDLES_CACHE_SECONDS)
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def rate_candles(request):
+    base = request.query_params.get('base', 'EUR').upper()
+    quote = request.query_params.get('quote', '').upper()
+    interval = request.query_params.get('interval', 'day')
+
+    if not quote:
+        return Response({'error': 'Devise cible requise'}, status=400)
+    if interval not in INTERVALS:
+        return Response({'error': 'Intervalle invalide'}, status=400)
+    try:
+        limit = min(max(int(request.query_params.get('limit', 90)), 1), MAX_CANDLES)
+    except ValueError:
+        return Response({'error': 'Limite invalide'}, status=400)
+
+    candles = get_candles(base, quote, interval, limit)
+    return Response({
+        'base': base,
+        'quote': quote,
+        'interval': interval,
+        'candles': [
+            {
+                'date': candle['date'].isoformat(),
+                'open': str(candle['open']),
+                'high': str(candle['high']),
+                'low': str(candle['low']),
+                'close': str(candle['close']),
+            }
+            for candle in candles
+        ],
+    })
+
+
+def _alert_data(alert):
+    return {
+        'id': str(alert.id),
+        'base': alert.base_currency,
+        'quote': alert.quote_currency,
+        'direction': alert.direction,
+        'threshold': str(alert.threshold),
+        'is_active': alert.is_active,
+        'triggered_at': alert.triggered_at,
+        'triggered_rate': str(alert.triggered_rate) if alert.triggered_rate is not None else None,
+        'created_at': alert.created_at,
+    }
+
+
+@api_view(["GET", "POST"])
+@permission_classes([IsAuthenticated])
+def rate_alerts(request):
+    if request.method == 'GET':
+        alerts = RateAlert.objects.filter(user=request.user)[:100]
+        return Response([_alert_data(alert) for alert in alerts])
+
+    base = str(request.data.get('base', 'EUR')).upper()
+    quote = str(request.data.get('quote', '')).upper()
+    direction = str(request.data.get('direction', 'ABOVE')).upper()
+    try:
+        threshold = Decimal(str(request.data.get('threshold')))
+        if not threshold.is_finite() or not 0 < threshold <= MAX_THRESHOLD:
+            raise InvalidOperation
+        threshold = threshold.quantize(THRESHOLD_PRECISION)
+        if threshold <= 0:
+            raise InvalidOperation
+    except (InvalidOperation, ValueError):
+        return Response({'error': 'Seuil invalide'}, status=400)
+
+    # Alerts are only evaluated when rates of their exact pair are published
+    if len(base) != 3 or len(quote) != 3 or base == quote or ExchangeRateService.get_rate(base, quote) is None:
+        return Response({'error': 'Paire de devises invalide'}, status=400)
+    if direction not in dict(RateAlert.DIRECTIONS):
+        return Response({'error': 'Direction invalide'}, status=400)
+    if RateAlert.objects.filter(user=request.user, is_active=True).count() >= MAX_ACTIVE_ALERTS:
+        return Response({'error': f'Maximum {MAX_ACTIVE_ALERTS} alertes actives'}, status=400)
+
+    alert = RateAlert.objects.create(
+        user=request.user,
+        base_currency=base,
+        quote_currency=quote,
+        direction=direction,
+        threshold=threshold
+    )
+    return Response(_alert_data(alert), status=201)
+
+
+@api_view(["DELETE"])
+@permission_classes([IsAuthenticated])
+def delete_rate_alert(request, alert_id):
+    alert = RateAlert.objects.filter(pk=alert_id, user=request.user).first()
+    if alert is None:
+        return Response({'error': 'Alerte introuvable'}, status=404)
+    alert.delete()
+    return Response(status=204)
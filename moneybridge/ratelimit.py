@@ -0,0 +1,188 @@
+"""
+Token bucket rate limiting shared by all web workers.
+
+Each policy in settings.RATE_LIMITS refills a bucket per client (user or IP)
+at `rate` tokens per period, up to `burst` tokens. Buckets live in Redis and
+are updated by one Lua script, so concurrent workers never double-spend.
+
+To keep the check in the microsecond range, a process takes up to `lease`
+tokens at once and spends them locally for at most LEASE_SECONDS; an empty
+bucket is also remembered locally until its next token is due, so a client
+hammering an endpoint is refused without a round-trip. Outside Redis (local
+development) buckets are kept per process.
+"""
+import logging
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.decorators import throttle_classes
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger(__name__)
+
+
+LEASE_SECONDS = 1.0
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# KEYS[1]: bucket; ARGV: refill per second, capacity, tokens wanted.
+# Returns the tokens granted and the seconds until the next one.
+TOKEN_BUCKET_SCRIPT = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local wanted = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'at')
+local tokens = tonumber(bucket[1]) or capacity
+local at = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - at) * rate)
+local granted = math.min(wanted, math.floor(tokens))
+tokens = tokens - granted
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'at', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+local wait = 0
+if tokens < 1 then
+    wait = (1 - tokens) / rate
+end
+return {granted, tostring(wait)}
+"""
+
+
+class Policy:
+    """Parsed entry of settings.RATE_LIMITS."""
+
+    def __init__(self, name, rate, burst=None, key='user', lease=None):
+        count, period = rate.split('/')
+        self.name = name
+        self.per_second = int(count) / PERIODS[period[0]]
+        self.burst = burst or int(count)
+        self.key = key
+        self.lease = lease or max(1, self.burst // 10)
+
+
+class LocalBuckets:
+    """Per-process token buckets (no shared cache available)."""
+
+    def __init__(self):
+        self.buckets = {}
+
+    def take(self, key, policy, wanted):
+        now = time.monotonic()
+        tokens, at = self.buckets.get(key, (policy.burst, now))
+        tokens = min(policy.burst, tokens + (now - at) * policy.per_second)
+        granted = min(wanted, int(tokens))
+        tokens -= granted
+        self.buckets[key] = (tokens, now)
+        wait = (1 - tokens) / policy.per_second if tokens < 1 else 0
+        return granted, wait
+
+
+class RedisBuckets:
+    """Token buckets in the Redis default cache."""
+
+    def __init__(self):
+        self.script = None
+
+    def take(self, key, policy, wanted):
+        cache_key = cache.make_and_validate_key(key)
+        client = cache._cache.get_client(cache_key, write=True)
+        if self.script is None:
+            self.script = client.register_script(TOKEN_BUCKET_SCRIPT)
+        granted, wait = self.script(
+            keys=[cache_key],
+            args=[policy.per_second, policy.burst, wanted],
+            client=client
+        )
+        return int(granted), float(wait)
+
+
+class RateLimiter:
+    """Shared buckets behind a per-process lease of tokens."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.policies = {
+            name: Policy(name, **options)
+            for name, options in settings.RATE_LIMITS.items()
+        }
+        redis_backend = 'django.core.cache.backends.redis.RedisCache'
+        if settings.CACHES['default']['BACKEND'] == redis_backend:
+            self.backend = RedisBuckets()
+        else:
+            self.backend = LocalBuckets()
+        # key -> [leased tokens, lease expiry, refused until]
+        self.leases = {}
+
+    def check(self, policy_name, ident):
+        """
+        Take one token for `ident` under the policy.
+
+        Returns:
+            (allowed, seconds to wait before the next token when refused)
+        """
+        policy = self.policies[policy_name]
+        key = f'ratelimit:{policy_name}:{ident}'
+        now = time.monotonic()
+        with self.lock:
+            lease = self.leases.get(key)
+            if lease is not None:
+                if lease[2] > now:
+                    return False, lease[2] - now
+                if lease[0] > 0 and lease[1] > now:
+                    lease[0] -= 1
+                    return True, 0
+
+        try:
+            granted, wait = self.backend.take(key, policy, policy.lease)
+        except Exception:
+            # Never let the limiter take the API down with it
+            logger.exception("Rate limit check failed for %s", key)
+            return True, 0
+
+        with self.lock:
+            if len(self.leases) > 100000:
+                self.leases.clear()
+            if granted:
+                self.leases[key] = [granted - 1, now + LEASE_SECONDS, 0]
+                return True, 0
+            self.leases[key] = [0, 0, now + wait]
+            return False, wait
+
+
+_limiter = None
+
+
+def get_limiter():
+    global _limiter
+    if _limiter is None:
+        _limiter = RateLimiter()
+    return _limiter
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """DRF throttle applying one policy of settings.RATE_LIMITS."""
+
+    policy = None
+
+    def allow_request(self, request, view):
+        limiter = get_limiter()
+        if limiter.policies[self.policy].key == 'user' and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        allowed, self._wait = limiter.check(self.policy, ident)
+        return allowed
+
+    def wait(self):
+        return self._wait
+
+    @classmethod
+    def for_policy(cls, policy):
+        return type(f'{policy.title()}TokenBucketThrottle', (cls,), {'policy': policy})
+
+
+def rate_limit(policy):
+    """Decorator for @api_view functions: throttle with the named policy."""
+    return throttle_classes([TokenBucketThrottle.for_policy(policy)])
@@ -125,13 +125,22 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# KYC documents: upload size limit, and the internal location under which the
+# front web server serves MEDIA_ROOT (X-Accel-Redirect). Without it, Django
+# streams the files itself.
+KYC_MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+KYC_ACCEL_REDIRECT_PREFIX = env('KYC_ACCEL_REDIRECT_PREFIX', default='')
+KYC_THUMBNAIL_SIZE = (480, 480)
+# Documents claimed by a reviewer return to the queue after this delay
+KYC_REVIEW_CLAIM_MINUTES = 15
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -139,6 +148,8 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # Railway's edge proxy appends the client IP to X-Forwarded-For
+    'NUM_PROXIES': 1,
 }
 
 # JWT Settings
@@ -151,6 +162,28 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': True,
 }
 
+# Password hashing (login/register): concurrent hashes across every worker,
+# in-flight hashes per client IP, and how long to wait for a free slot
+PASSWORD_HASH_CONCURRENCY = 4
+PASSWORD_HASH_PER_IP = 2
+PASSWORD_HASH_WAIT_SECONDS = 1.0
+
+# User activity log: queued entries per process (further ones are dropped),
+# and the batch size / interval at which the queue is written
+ACTIVITY_LOG_BUFFER_SIZE = 10000
+ACTIVITY_LOG_BATCH_SIZE = 500
+ACTIVITY_LOG_FLUSH_SECONDS = 2.0
+
+# Rate limits (moneybridge.ratelimit): token buckets refilled at `rate`
+# ('N/s', 'N/m', 'N/h', 'N/d') up to `burst` tokens, per user or client IP
+RATE_LIMITS = {
+    'login': {'rate': '10/m', 'burst': 5, 'key': 'ip'},
+    'register': {'rate': '5/h', 'burst': 3, 'key': 'ip'},
+    'token_refresh': {'rate': '30/m', 'burst': 10, 'key': 'ip'},
+    'quote': {'rate': '60/m', 'burst': 20, 'key': 'user', 'lease': 5},
+    'money_movement': {'rate': '10/m', 'burst': 5, 'key': 'user'},
+}
+
 # CORS Settings
 CORS_ALLOWED_ORIGINS = [
     env('FRONTEND_URL', default='http://localhost:3000'),
@@ -158,6 +191,15 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Cache (shared between web and Celery workers)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': env('REDIS_URL'),
+        'KEY_PREFIX': 'moneybridge',
+    }
+}
+
 # Celery Configuration
 CELERY_BROKER_URL = env('REDIS_URL')
 CELERY_RESULT_BACKEND = env('REDIS_URL')
@@ -166,6 +208,43 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
+from celery.schedules import crontab
+
+CELERY_BEAT_SCHEDULE = {
+    'relay-outbox-events': {
+        'task': 'transactions.tasks.relay_outbox_events',
+        'schedule': 5.0,
+    },
+    'purge-outbox-events': {
+        'task': 'transactions.tasks.purge_outbox_events',
+        'schedule': crontab(hour=3, minute=30),
+    },
+    'reconcile-stripe-payouts': {
+        'task': 'banking.tasks.reconcile_stripe_payouts',
+        'schedule': crontab(hour=6, minute=0),
+    },
+    'redispatch-bulk-payouts': {
+        'task': 'transactions.tasks.redispatch_bulk_payouts',
+        'schedule': 300.0,
+    },
+    'release-expired-holds': {
+        'task': 'wallets.tasks.release_expired_holds',
+        'schedule': 60.0,
+    },
+    'refresh-exchange-rates': {
+        'task': 'exchange.tasks.refresh_exchange_rates',
+        'schedule': crontab(minute='*/15'),
+    },
+    'purge-unreferenced-documents': {
+        'task': 'accounts.tasks.purge_unreferenced_documents',
+        'schedule': crontab(hour=4, minute=30),
+    },
+    'purge-revoked-refresh-tokens': {
+        'task': 'accounts.tasks.purge_revoked_refresh_tokens',
+        'schedule': crontab(hour=4, minute=0),
+    },
+}
+
 # API Spectacular (OpenAPI/Swagger)
 SPECTACULAR_SETTINGS = {
     'TITLE': 'MoneyBridge API',
@@ -189,9 +268,21 @@ WAVE_BASE_URL = env('WAVE_BASE_URL', default='')
 
 STRIPE_SECRET_KEY = env('STRIPE_SECRET_KEY', default='')
 STRIPE_PUBLISHABLE_KEY = env('STRIPE_PUBLISHABLE_KEY', default='')
+STRIPE_API_BASE = env('STRIPE_API_BASE', default='https://api.stripe.com')
+# Connected account holding the payout balance; beneficiary IBANs are attached
+# to it as external accounts (see banking.integrations.stripe_sepa)
+STRIPE_PAYOUT_ACCOUNT = env('STRIPE_PAYOUT_ACCOUNT', default='')
 
 # Exchange Rate API
 EXCHANGE_RATE_API_KEY = env('EXCHANGE_RATE_API_KEY', default='')
+EXCHANGE_RATE_SOURCES = [
+    'exchange.fetchers.ExchangeRateApiSource',
+    'exchange.fetchers.FrankfurterSource',
+    'exchange.fetchers.CfaPegSource',
+]
+EXCHANGE_RATE_STRATEGY = 'median'  # 'median' or 'first'
+EXCHANGE_RATE_SPREAD = '0.008'  # Margin applied on each side of the mid rate
+EXCHANGE_RATE_FETCH_TIMEOUT = 10
 
 # Transaction Limits
 TRANSACTION_LIMITS = {
@@ -201,6 +292,43 @@ TRANSACTION_LIMITS = {
     'MAX_TRANSACTION_EUR': 5000,
 }
 
+# Outbox relay: failed publishes are retried with exponential backoff
+# (base * 2^(attempts - 1), capped), then dead-lettered after the last attempt
+OUTBOX_MAX_ATTEMPTS = 10
+OUTBOX_RETRY_BASE_SECONDS = 5
+OUTBOX_RETRY_MAX_SECONDS = 3600
+
+# Price quotes (calculate_fee): how long a quoted rate and fee stay valid
+QUOTE_TTL_SECONDS = 60
+
+# Bulk payouts
+BULK_PAYOUT_MAX_ITEMS = 1000
+# Payouts claimed this long ago without a provider reference are sent again
+BULK_PAYOUT_CLAIM_TIMEOUT_SECONDS = 900
+
+# Payout providers by payout method (see transactions.payouts): dotted path to
+# a function sending one payout. Methods without a provider are refused and
+# refunded when their batch is dispatched.
+PAYOUT_PROVIDERS = {
+    'BANK': 'banking.integrations.stripe_sepa.send_payout',
+}
+
+# Wallet holds: reserved funds not captured within this delay go back to the wallet
+WALLET_HOLD_TTL_HOURS = 72
+
+# Risk rules (transactions.risk): sliding-window limits on outgoing transfers
+# per user, destination phone, destination IBAN or device (X-Device-Id header).
+# metric 'count' counts transfers, 'amount' sums EUR debited (fees included).
+# REVIEW holds the funds until a reviewer decides; BLOCK refuses the transfer.
+RISK_RULES = [
+    {'name': 'user_burst', 'dimension': 'user', 'window': 60, 'metric': 'count', 'limit': 5, 'action': 'BLOCK'},
+    {'name': 'user_hourly_count', 'dimension': 'user', 'window': 3600, 'metric': 'count', 'limit': 10, 'action': 'REVIEW'},
+    {'name': 'user_daily_amount', 'dimension': 'user', 'window': 86400, 'metric': 'amount', 'limit': 2000, 'action': 'REVIEW'},
+    {'name': 'phone_daily_count', 'dimension': 'phone', 'window': 86400, 'metric': 'count', 'limit': 10, 'action': 'REVIEW'},
+    {'name': 'iban_daily_amount', 'dimension': 'iban', 'window': 86400, 'metric': 'amount', 'limit': 3000, 'action': 'REVIEW'},
+    {'name': 'device_hourly_count', 'dimension': 'device', 'window': 3600, 'metric': 'count', 'limit': 20, 'action': 'REVIEW'},
+]
+
 # KYC Requirements
 KYC_REQUIRED_FOR_AMOUNT_EUR = 150
 
@@ -0,0 +1,126 @@
+from unittest import mock
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+from moneybridge.ratelimit import LocalBuckets, Policy, RateLimiter, RedisBuckets
+
+
+class Clock:
+    """Stand-in for time.monotonic, moved by hand."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class RateLimitTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        patcher = mock.patch('moneybridge.ratelimit.time.monotonic', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class LocalBucketsTests(RateLimitTestCase):
+
+    def test_burst_then_refill(self):
+        buckets = LocalBuckets()
+        policy = Policy('login', rate='10/m', burst=5)
+
+        self.assertEqual(buckets.take('k', policy, 3), (3, 0))
+        granted, wait = buckets.take('k', policy, 3)
+        self.assertEqual(granted, 2)
+        self.assertAlmostEqual(wait, 6.0)
+
+        # 10/m: one token every 6 seconds, never above the burst
+        self.clock.now += 12
+        self.assertEqual(buckets.take('k', policy, 5)[0], 2)
+        self.clock.now += 3600
+        self.assertEqual(buckets.take('k', policy, 10)[0], 5)
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    RATE_LIMITS={'login': {'rate': '10/m', 'burst': 5, 'key': 'ip', 'lease': 2}},
+)
+class RateLimiterTests(RateLimitTestCase):
+
+    def test_leased_tokens_are_spent_locally(self):
+        limiter = RateLimiter()
+        with mock.patch.object(limiter.backend, 'take', wraps=limiter.backend.take) as take:
+            results = [limiter.check('login', '203.0.113.7')[0] for _ in range(6)]
+
+        self.assertEqual(results, [True] * 5 + [False])
+        # Leases of 2, 2 and 1 tokens, then the empty bucket
+        self.assertEqual(take.call_count, 4)
+
+    def test_empty_bucket_is_remembered_until_the_next_token(self):
+        limiter = RateLimiter()
+        for _ in range(5):
+            limiter.check('login', 'ip')
+
+        with mock.patch.object(limiter.backend, 'take', wraps=limiter.backend.take) as take:
+            allowed, wait = limiter.check('login', 'ip')
+            self.assertEqual((allowed, wait), (False, 6.0))
+            self.clock.now += 3
+            self.assertEqual(limiter.check('login', 'ip'), (False, 3.0))
+            self.assertEqual(take.call_count, 1)
+
+            self.clock.now += 3
+            self.assertTrue(limiter.check('login', 'ip')[0])
+
+    def test_backend_failure_lets_requests_through(self):
+        limiter = RateLimiter()
+        with mock.patch.object(limiter.backend, 'take', side_effect=ConnectionError('redis down')):
+            with self.assertLogs('moneybridge.ratelimit', 'ERROR'):
+                self.assertEqual(limiter.check('login', 'ip'), (True, 0))
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://localhost:6379/0',
+    }})
+    def test_redis_cache_selects_shared_buckets(self):
+        self.assertIsInstance(RateLimiter().backend, RedisBuckets)
+
+
+class RedisBucketsTests(SimpleTestCase):
+
+    def test_script_runs_once_registered_against_the_bucket_key(self):
+        client = mock.Mock()
+        client.register_script.return_value.return_value = [2, b'0']
+        buckets = RedisBuckets()
+        policy = Policy('quote', rate='60/m', burst=20, lease=5)
+
+        with mock.patch('moneybridge.ratelimit.cache') as fake_cache:
+            fake_cache.make_and_validate_key.return_value = ':1:ratelimit:quote:42'
+            fake_cache._cache.get_client.return_value = client
+            self.assertEqual(buckets.take('ratelimit:quote:42', policy, 5), (2, 0.0))
+            buckets.take('ratelimit:quote:42', policy, 5)
+
+        client.register_script.assert_called_once()
+        client.register_script.return_value.assert_called_with(
+            keys=[':1:ratelimit:quote:42'], args=[1.0, 20, 5], client=client
+        )
+
+
+@override_settings(RATE_LIMITS={'login': {'rate': '1/m', 'burst': 1, 'key': 'ip'}})
+class ThrottledResponseTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch('moneybridge.ratelimit._limiter', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_refusal_is_a_429_with_retry_after(self):
+        client = APIClient()
+        login = {'email': 'nobody@example.com', 'password': 'x'}
+        self.assertEqual(client.post('/api/accounts/login/', login, format='json').status_code, 400)
+
+        response = client.post('/api/accounts/login/', login, format='json')
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '60')
+        self.assertIn('detail', response.data)
@@ -0,0 +1,29 @@
+# Generated by Django 6.0.2 on 2026-10-19 03:52
+
+from django.db import migrations, models
+
+
+def blank_to_null(apps, schema_editor):
+    MobileMoneyTransaction = apps.get_model('payments', 'MobileMoneyTransaction')
+    MobileMoneyTransaction.objects.filter(provider_transaction_id='').update(provider_transaction_id=None)
+
+
+def null_to_blank(apps, schema_editor):
+    MobileMoneyTransaction = apps.get_model('payments', 'MobileMoneyTransaction')
+    MobileMoneyTransaction.objects.filter(provider_transaction_id__isnull=True).update(provider_transaction_id='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='mobilemoneytransaction',
+            name='provider_transaction_id',
+            field=models.CharField(blank=True, max_length=255, null=True, unique=True, verbose_name='provider transaction ID'),
+        ),
+        migrations.RunPython(blank_to_null, null_to_blank),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 6.0.2 on 2026-10-19 03:52
+
+from django.db import migrations, models
+from accounts.phone import to_e164
+
+
+def backfill_sender_phone_e164(apps, schema_editor):
+    """Fill sender_phone_e164 from sender_phone_number on existing rows."""
+    MobileMoneyTransaction = apps.get_model('payments', 'MobileMoneyTransaction')
+    rows = MobileMoneyTransaction.objects.only('id', 'sender_phone_number', 'sender_country', 'sender_phone_e164').iterator(chunk_size=2000)
+    batch = []
+    for row in rows:
+        row.sender_phone_e164 = to_e164(row.sender_phone_number, row.sender_country) or ''
+        batch.append(row)
+        if len(batch) >= 2000:
+            MobileMoneyTransaction.objects.bulk_update(batch, ['sender_phone_e164'])
+            batch = []
+    if batch:
+        MobileMoneyTransaction.objects.bulk_update(batch, ['sender_phone_e164'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0003_mobile_money_transaction_version'),
+        ('transactions', '0005_corridor_price'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mobilemoneytransaction',
+            name='sender_phone_e164',
+            field=models.CharField(blank=True, max_length=16, verbose_name='sender phone number (E.164)'),
+        ),
+        migrations.AddIndex(
+            model_name='mobilemoneytransaction',
+            index=models.Index(fields=['sender_phone_e164', '-initiated_at'], name='payments_mo_sender__16176a_idx'),
+        ),
+        migrations.RunPython(backfill_sender_phone_e164, migrations.RunPython.noop),
+    ]
@@ -6,9 +6,11 @@ from django.utils.translation import gettext_lazy as _
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 import uuid
+from accounts.phone import to_e164
+from transactions.state_machine import StatefulModel
 
 
-class MobileMoneyTransaction(models.Model):
+class MobileMoneyTransaction(StatefulModel):
     """Mobile money transactions from Africa to MoneyBridge."""
     
     PROVIDERS = [
@@ -29,6 +31,16 @@ class MobileMoneyTransaction(models.Model):
         ('EXPIRED', 'Expired'),
     ]
     
+    # Target status -> statuses it can be reached from
+    TRANSITIONS = {
+        'PENDING': {'INITIATED'},
+        'PROCESSING': {'INITIATED', 'PENDING'},
+        'COMPLETED': {'INITIATED', 'PENDING', 'PROCESSING'},
+        'FAILED': {'INITIATED', 'PENDING', 'PROCESSING'},
+        'CANCELLED': {'INITIATED', 'PENDING', 'PROCESSING'},
+        'EXPIRED': {'INITIATED', 'PENDING'},
+    }
+    
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     transaction = models.OneToOneField(
         'transactions.Transaction',
@@ -42,11 +54,13 @@ class MobileMoneyTransaction(models.Model):
         _('provider transaction ID'),
         max_length=255,
         unique=True,
+        null=True,
         blank=True
     )
     
     # Sender details (person sending from Africa)
     sender_phone_number = models.CharField(_('sender phone number'), max_length=20)
+    sender_phone_e164 = models.CharField(_('sender phone number (E.164)'), max_length=16, blank=True)
     sender_name = models.CharField(_('sender name'), max_length=255, blank=True)
     sender_country = models.CharField(_('sender country'), max_length=3)
     
@@ -100,10 +114,15 @@ class MobileMoneyTransaction(models.Model):
             models.Index(fields=['status']),
             models.Index(fields=['provider_transaction_id']),
             models.Index(fields=['qr_code_reference']),
+            models.Index(fields=['sender_phone_e164', '-initiated_at']),
         ]
     
     def __str__(self):
         return f"{self.provider} - {self.amount} {self.currency}"
+    
+    def save(self, *args, **kwargs):
+        self.sender_phone_e164 = to_e164(self.sender_phone_number, self.sender_country) or ''
+        super().save(*args, **kwargs)
 
 
 class WavePaymentRequest(models.Model):
@@ -1,5 +1,50 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.apps import apps
+from .models import OutboxEvent, RiskReview
+from .outbox import requeue_dead_letters
+from .risk import RiskReviewService
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ("event_type", "aggregate_id", "attempts", "created_at", "published_at", "dead_lettered_at")
+    list_filter = ("event_type",)
+    search_fields = ("aggregate_id",)
+    readonly_fields = ("created_at", "published_at", "attempts", "last_error", "next_attempt_at", "dead_lettered_at")
+    actions = ("requeue_events",)
+
+    @admin.action(description="Relancer les evenements en echec definitif")
+    def requeue_events(self, request, queryset):
+        requeued = requeue_dead_letters(queryset)
+        self.message_user(request, f"{requeued} evenement(s) relance(s)", messages.SUCCESS)
+
+
+@admin.register(RiskReview)
+class RiskReviewAdmin(admin.ModelAdmin):
+    list_display = ("transaction", "user", "status", "rules", "created_at", "reviewed_by")
+    list_filter = ("status",)
+    list_select_related = ("transaction", "user", "reviewed_by")
+    search_fields = ("user__email",)
+    raw_id_fields = ("transaction", "user", "reviewed_by")
+    readonly_fields = ("rules", "created_at", "updated_at")
+    actions = ("clear_reviews", "confirm_fraud")
+
+    def _resolve(self, request, queryset, fraud):
+        outcomes = {}
+        for review in queryset.filter(status="OPEN"):
+            status = RiskReviewService.resolve(review, request.user, fraud)
+            outcomes[status] = outcomes.get(status, 0) + 1
+        summary = ", ".join(f"{count} {status}" for status, count in outcomes.items()) or "Aucune revue ouverte"
+        self.message_user(request, summary, messages.SUCCESS)
+
+    @admin.action(description="Valider les operations selectionnees")
+    def clear_reviews(self, request, queryset):
+        self._resolve(request, queryset, fraud=False)
+
+    @admin.action(description="Confirmer la fraude et annuler les operations")
+    def confirm_fraud(self, request, queryset):
+        self._resolve(request, queryset, fraud=True)
+
 
 for model in apps.get_app_config("transactions").get_models():
     try:
@@ -0,0 +1,129 @@
+"""
+Parsing and validation of bulk payout files (CSV or JSON).
+"""
+import csv
+import io
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation
+from django.conf import settings
+from accounts.phone import to_e164
+from wallets.iban import normalize_iban, is_valid_iban
+from wallets.models import MobileMoneyAccount
+
+
+PayoutItem = namedtuple('PayoutItem', [
+    'method',
+    'amount',
+    'beneficiary_name',
+    'iban',
+    'phone_number',
+    'country',
+    'reference',
+])
+
+MOBILE_MONEY_METHODS = {code for code, _ in MobileMoneyAccount.PROVIDERS}
+PAYOUT_METHODS = MOBILE_MONEY_METHODS | {'BANK'}
+
+# Bounds of the columns the rows are stored in
+# Per payout, so a full batch still fits the totals' DecimalField(max_digits=15, decimal_places=2)
+MAX_AMOUNT = Decimal('1000000000')
+MAX_NAME_LENGTH = 255
+MAX_PHONE_LENGTH = 32  # as entered; stored in E.164 (16 characters at most)
+
+
+def parse_csv(content):
+    """
+    Read payout rows from CSV text.
+
+    Expected header: method,amount,beneficiary_name,iban,phone_number,country,reference
+
+    Raises:
+        ValueError: if the file is not UTF-8 or not readable as CSV
+    """
+    if isinstance(content, bytes):
+        try:
+            content = content.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise ValueError("Le fichier doit être encodé en UTF-8")
+    try:
+        return list(csv.DictReader(io.StringIO(content)))
+    except csv.Error as exc:
+        raise ValueError(f"Fichier CSV illisible: {exc}")
+
+
+def validate_items(rows):
+    """
+    Validate all payout rows in a single pass.
+
+    Args:
+        rows: List of dicts (from CSV or JSON)
+
+    Returns:
+        Tuple (items, errors): PayoutItem list and a list of
+        {'row': n, 'errors': [...]} for every invalid row
+    """
+    max_items = settings.BULK_PAYOUT_MAX_ITEMS
+    if not rows:
+        return [], [{'row': 0, 'errors': ['Aucun paiement dans le fichier']}]
+    if len(rows) > max_items:
+        return [], [{'row': 0, 'errors': [f'Maximum {max_items} paiements par lot']}]
+
+    items = []
+    errors = []
+    for index, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            errors.append({'row': index, 'errors': ['Ligne invalide']})
+            continue
+
+        row_errors = []
+        method = str(row.get('method') or 'BANK').strip().upper()
+        name = str(row.get('beneficiary_name') or '').strip()
+        iban = normalize_iban(str(row.get('iban') or ''))
+        phone_number = str(row.get('phone_number') or '').strip()
+        country = str(row.get('country') or '').strip().upper()
+
+        try:
+            amount = Decimal(str(row.get('amount')).strip())
+            if not amount.is_finite() or not 0 < amount < MAX_AMOUNT or amount.as_tuple().exponent < -2:
+                raise InvalidOperation
+        except (InvalidOperation, ValueError):
+            amount = None
+            row_errors.append('Montant invalide')
+
+        if method not in PAYOUT_METHODS:
+            row_errors.append(f'Methode inconnue: {method}')
+        if not name:
+            row_errors.append('Nom du beneficiaire requis')
+        elif len(name) > MAX_NAME_LENGTH:
+            row_errors.append(f'Nom du beneficiaire trop long ({MAX_NAME_LENGTH} caracteres maximum)')
+        if country and not (len(country) in (2, 3) and country.isalpha()):
+            row_errors.append('Pays invalide (code ISO a 2 ou 3 lettres)')
+        if method == 'BANK' and not is_valid_iban(iban):
+            row_errors.append('IBAN invalide')
+        if method in MOBILE_MONEY_METHODS:
+            if not phone_number:
+                row_errors.append('Telephone requis')
+            elif len(phone_number) > MAX_PHONE_LENGTH:
+                row_errors.append('Telephone invalide')
+            else:
+                phone_number = to_e164(phone_number, country)
+                if phone_number is None:
+                    row_errors.append('Telephone invalide')
+            if not country:
+                row_errors.append('Pays requis')
+
+        if row_errors:
+            errors.append({'row': index, 'errors': row_errors})
+            continue
+
+        items.append(PayoutItem(
+            method=method,
+            amount=amount,
+            beneficiary_name=name,
+            iban=iban if method == 'BANK' else '',
+            phone_number=phone_number if method != 'BANK' else '',
+            country=country,
+            reference=str(row.get('reference') or '')[:140],
+        ))
+
+    return items, errors
@@ -0,0 +1,34 @@
+# Generated by Django 6.0.2 on 2026-10-19 03:52
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEvent',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('event_type', models.CharField(max_length=100, verbose_name='event type')),
+                ('aggregate_id', models.CharField(blank=True, help_text='ID of the object the event is about (transaction, transfer, etc.)', max_length=64, verbose_name='aggregate ID')),
+                ('payload', models.JSONField(blank=True, default=dict, verbose_name='payload')),
+                ('task_name', models.CharField(max_length=255, verbose_name='task name')),
+                ('published_at', models.DateTimeField(blank=True, null=True, verbose_name='published at')),
+                ('attempts', models.IntegerField(default=0, verbose_name='attempts')),
+                ('last_error', models.TextField(blank=True, verbose_name='last error')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'outbox event',
+                'verbose_name_plural': 'outbox events',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(condition=models.Q(('published_at__isnull', True)), fields=['created_at'], name='outbox_unpublished_idx'), models.Index(fields=['published_at'], name='transaction_publish_575436_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 6.0.2 on 2026-10-19 03:52
+
+import django.db.models.deletion
+import uuid
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0002_outbox_event'),
+        ('wallets', '0002_bank_account_iban_validators'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transaction',
+            name='transaction_type',
+            field=models.CharField(choices=[('RECEIVE_MOBILE_MONEY', 'Receive from Mobile Money'), ('SEND_BANK_TRANSFER', 'Send to Bank Account'), ('SEND_MOBILE_MONEY', 'Send to Mobile Money'), ('WALLET_TO_WALLET', 'Wallet to Wallet'), ('FEE', 'Transaction Fee'), ('REFUND', 'Refund')], max_length=50, verbose_name='transaction type'),
+        ),
+        migrations.CreateModel(
+            name='BulkPayout',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('DISPATCHING', 'Dispatching'), ('DISPATCHED', 'Dispatched'), ('FAILED', 'Failed')], default='PENDING', max_length=20, verbose_name='status')),
+                ('source_format', models.CharField(choices=[('CSV', 'CSV'), ('JSON', 'JSON')], max_length=10, verbose_name='source format')),
+                ('reference', models.CharField(blank=True, max_length=140, verbose_name='reference')),
+                ('currency', models.CharField(default='EUR', max_length=3, verbose_name='currency')),
+                ('total_amount', models.DecimalField(decimal_places=2, max_digits=15, verbose_name='total amount')),
+                ('total_fee', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=15, verbose_name='total fee')),
+                ('item_count', models.IntegerField(verbose_name='item count')),
+                ('dispatched_count', models.IntegerField(default=0, verbose_name='dispatched count')),
+                ('failed_count', models.IntegerField(default=0, verbose_name='failed count')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('dispatched_at', models.DateTimeField(blank=True, null=True, verbose_name='dispatched at')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bulk_payouts', to=settings.AUTH_USER_MODEL)),
+                ('wallet', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='bulk_payouts', to='wallets.wallet')),
+            ],
+            options={
+                'verbose_name': 'bulk payout',
+                'verbose_name_plural': 'bulk payouts',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='bulk_payout',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transactions', to='transactions.bulkpayout'),
+        ),
+        migrations.AddIndex(
+            model_name='bulkpayout',
+            index=models.Index(fields=['user', '-created_at'], name='transaction_user_id_acaa99_idx'),
+        ),
+    ]
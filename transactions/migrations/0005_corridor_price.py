@@ -0,0 +1,51 @@
+# Generated by Django 6.0.2 on 2026-10-19 03:52
+
+import uuid
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def seed_corridor_prices(apps, schema_editor):
+    """Prices previously hardcoded in transactions/views.py: 1 EUR per send, free bank withdrawals."""
+    CorridorPrice = apps.get_model('transactions', 'CorridorPrice')
+    CorridorPrice.objects.bulk_create([
+        CorridorPrice(payout_currency='XOF', fixed_fee=Decimal('1.00')),
+        CorridorPrice(destination_country='GH', payout_currency='GHS', fixed_fee=Decimal('1.00')),
+        CorridorPrice(method='BANK', payout_currency='EUR'),
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0004_transaction_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CorridorPrice',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('origin_country', models.CharField(default='*', max_length=3, verbose_name='origin country')),
+                ('destination_country', models.CharField(default='*', max_length=3, verbose_name='destination country')),
+                ('method', models.CharField(default='*', help_text='Payout method: BANK, WAVE, ORANGE_MONEY, ... or * for any', max_length=20, verbose_name='method')),
+                ('min_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text='Lower bound of the amount tier (in source currency)', max_digits=15, verbose_name='minimum amount')),
+                ('payout_currency', models.CharField(default='EUR', max_length=3, verbose_name='payout currency')),
+                ('fixed_fee', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=15, verbose_name='fixed fee')),
+                ('percentage_fee', models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text='Percentage (e.g., 1.5 for 1.5%)', max_digits=5, verbose_name='percentage fee')),
+                ('min_fee', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=15, verbose_name='minimum fee')),
+                ('max_fee', models.DecimalField(blank=True, decimal_places=2, max_digits=15, null=True, verbose_name='maximum fee')),
+                ('fx_margin', models.DecimalField(decimal_places=4, default=Decimal('0.0000'), help_text='Margin taken off the exchange rate (e.g., 0.008 for 0.8%)', max_digits=6, verbose_name='FX margin')),
+                ('is_active', models.BooleanField(default=True, verbose_name='active')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'corridor price',
+                'verbose_name_plural': 'corridor prices',
+                'ordering': ['origin_country', 'destination_country', 'method', 'min_amount'],
+                'unique_together': {('origin_country', 'destination_country', 'method', 'min_amount')},
+            },
+        ),
+        migrations.RunPython(seed_corridor_prices, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 6.0.2 on 2026-10-19 03:52
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0005_corridor_price'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RiskReview',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('rules', models.JSONField(default=list, verbose_name='rules')),
+                ('status', models.CharField(choices=[('OPEN', 'Open'), ('CLEARED', 'Cleared'), ('CONFIRMED_FRAUD', 'Confirmed Fraud'), ('EXPIRED', 'Expired')], default='OPEN', max_length=20, verbose_name='status')),
+                ('reviewed_at', models.DateTimeField(blank=True, null=True, verbose_name='reviewed at')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('reviewed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='risk_decisions', to=settings.AUTH_USER_MODEL)),
+                ('transaction', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='risk_review', to='transactions.transaction')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='risk_reviews', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'risk review',
+                'verbose_name_plural': 'risk reviews',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(condition=models.Q(('status', 'OPEN')), fields=['created_at'], name='risk_review_open_idx')],
+            },
+        ),
+    ]
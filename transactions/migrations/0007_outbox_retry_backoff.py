@@ -0,0 +1,35 @@
+# Generated by Django 6.0.2 on 2026-10-19 03:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0006_risk_review'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='outboxevent',
+            name='outbox_unpublished_idx',
+        ),
+        migrations.AddField(
+            model_name='outboxevent',
+            name='dead_lettered_at',
+            field=models.DateTimeField(blank=True, help_text='Set when publishing failed OUTBOX_MAX_ATTEMPTS times; the relay gives up', null=True, verbose_name='dead-lettered at'),
+        ),
+        migrations.AddField(
+            model_name='outboxevent',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, help_text='Set after a failed publish; the event is not retried before then', null=True, verbose_name='next attempt at'),
+        ),
+        migrations.AddIndex(
+            model_name='outboxevent',
+            index=models.Index(condition=models.Q(('dead_lettered_at__isnull', True), ('published_at__isnull', True)), fields=['created_at'], name='outbox_unpublished_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='outboxevent',
+            index=models.Index(condition=models.Q(('dead_lettered_at__isnull', False)), fields=['dead_lettered_at'], name='outbox_dead_letter_idx'),
+        ),
+    ]
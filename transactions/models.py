@@ -1,19 +1,21 @@
 """
 Models for transactions and double-entry ledger system.
 """
-from django.db import models
+from django.db import models, transaction as db_transaction
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 import uuid
+from transactions.state_machine import StatefulModel
 
 
-class Transaction(models.Model):
+class Transaction(StatefulModel):
     """Main transaction record."""
     
     TRANSACTION_TYPES = [
         ('RECEIVE_MOBILE_MONEY', 'Receive from Mobile Money'),
         ('SEND_BANK_TRANSFER', 'Send to Bank Account'),
+        ('SEND_MOBILE_MONEY', 'Send to Mobile Money'),
         ('WALLET_TO_WALLET', 'Wallet to Wallet'),
         ('FEE', 'Transaction Fee'),
         ('REFUND', 'Refund'),
@@ -28,6 +30,15 @@ class Transaction(models.Model):
         ('REFUNDED', 'Refunded'),
     ]
     
+    # Target status -> statuses it can be reached from
+    TRANSITIONS = {
+        'PROCESSING': {'PENDING'},
+        'COMPLETED': {'PENDING', 'PROCESSING'},
+        'FAILED': {'PENDING', 'PROCESSING'},
+        'CANCELLED': {'PENDING'},
+        'REFUNDED': {'COMPLETED'},
+    }
+    
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey('accounts.User', on_delete=models.CASCADE, related_name='transactions')
     
@@ -86,6 +97,15 @@ class Transaction(models.Model):
         related_name='incoming_transactions'
     )
     
+    # Bulk payout this transaction belongs to, if any
+    bulk_payout = models.ForeignKey(
+        'BulkPayout',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='transactions'
+    )
+    
     # External references
     external_transaction_id = models.CharField(
         _('external transaction ID'),
@@ -122,6 +142,57 @@ class Transaction(models.Model):
         return f"{self.transaction_type} - {self.amount} {self.currency}"
 
 
+class BulkPayout(models.Model):
+    """Batch of payouts submitted in a single request (CSV or JSON)."""
+    
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('DISPATCHING', 'Dispatching'),
+        ('DISPATCHED', 'Dispatched'),
+        ('FAILED', 'Failed'),
+    ]
+    
+    SOURCE_FORMATS = [
+        ('CSV', 'CSV'),
+        ('JSON', 'JSON'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey('accounts.User', on_delete=models.CASCADE, related_name='bulk_payouts')
+    wallet = models.ForeignKey('wallets.Wallet', on_delete=models.PROTECT, related_name='bulk_payouts')
+    
+    # Batch details
+    status = models.CharField(_('status'), max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    source_format = models.CharField(_('source format'), max_length=10, choices=SOURCE_FORMATS)
+    reference = models.CharField(_('reference'), max_length=140, blank=True)
+    
+    # Totals reserved against the wallet
+    currency = models.CharField(_('currency'), max_length=3, default='EUR')
+    total_amount = models.DecimalField(_('total amount'), max_digits=15, decimal_places=2)
+    total_fee = models.DecimalField(_('total fee'), max_digits=15, decimal_places=2, default=Decimal('0.00'))
+    
+    # Progress
+    item_count = models.IntegerField(_('item count'))
+    dispatched_count = models.IntegerField(_('dispatched count'), default=0)
+    failed_count = models.IntegerField(_('failed count'), default=0)
+    
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+    dispatched_at = models.DateTimeField(_('dispatched at'), null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = _('bulk payout')
+        verbose_name_plural = _('bulk payouts')
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at']),
+        ]
+    
+    def __str__(self):
+        return f"Bulk payout - {self.item_count} items - {self.total_amount} {self.currency}"
+
+
 class LedgerEntry(models.Model):
     """Double-entry ledger for all financial transactions."""
     
@@ -245,7 +316,24 @@ class TransactionLimit(models.Model):
         return f"KYC Level {self.kyc_level} Limits"
 
 
-class TransactionFee(models.Model):
+class FeeScheduleMixin:
+    """Fee computation shared by models with fixed/percentage/min/max fee fields."""
+    
+    def calculate_fee(self, amount):
+        """Calculate fee for a given amount."""
+        percentage_amount = (amount * self.percentage_fee) / Decimal('100.0')
+        total_fee = self.fixed_fee + percentage_amount
+        
+        # Apply min/max constraints
+        if total_fee < self.min_fee:
+            total_fee = self.min_fee
+        if self.max_fee and total_fee > self.max_fee:
+            total_fee = self.max_fee
+            
+        return total_fee.quantize(Decimal('0.01'))
+
+
+class TransactionFee(FeeScheduleMixin, models.Model):
     """Fee structure for different transaction types."""
     
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -298,16 +386,192 @@ class TransactionFee(models.Model):
     
     def __str__(self):
         return f"{self.transaction_type} Fee"
+
+
+class CorridorPrice(FeeScheduleMixin, models.Model):
+    """
+    Price of sending money along a corridor, for one amount tier.
     
-    def calculate_fee(self, amount):
-        """Calculate fee for a given amount."""
-        percentage_amount = (amount * self.percentage_fee) / Decimal('100.0')
-        total_fee = self.fixed_fee + percentage_amount
-        
-        # Apply min/max constraints
-        if total_fee < self.min_fee:
-            total_fee = self.min_fee
-        if self.max_fee and total_fee > self.max_fee:
-            total_fee = self.max_fee
-            
-        return total_fee.quantize(Decimal('0.01'))
+    '*' in origin_country, destination_country or method matches anything;
+    the most specific row wins (see transactions.pricing).
+    """
+    
+    ANY = '*'
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    
+    # Corridor
+    origin_country = models.CharField(_('origin country'), max_length=3, default=ANY)
+    destination_country = models.CharField(_('destination country'), max_length=3, default=ANY)
+    method = models.CharField(
+        _('method'),
+        max_length=20,
+        default=ANY,
+        help_text='Payout method: BANK, WAVE, ORANGE_MONEY, ... or * for any'
+    )
+    min_amount = models.DecimalField(
+        _('minimum amount'),
+        max_digits=15,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        help_text='Lower bound of the amount tier (in source currency)'
+    )
+    
+    # Pricing
+    payout_currency = models.CharField(_('payout currency'), max_length=3, default='EUR')
+    fixed_fee = models.DecimalField(_('fixed fee'), max_digits=15, decimal_places=2, default=Decimal('0.00'))
+    percentage_fee = models.DecimalField(
+        _('percentage fee'),
+        max_digits=5,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        help_text='Percentage (e.g., 1.5 for 1.5%)'
+    )
+    min_fee = models.DecimalField(_('minimum fee'), max_digits=15, decimal_places=2, default=Decimal('0.00'))
+    max_fee = models.DecimalField(_('maximum fee'), max_digits=15, decimal_places=2, null=True, blank=True)
+    fx_margin = models.DecimalField(
+        _('FX margin'),
+        max_digits=6,
+        decimal_places=4,
+        default=Decimal('0.0000'),
+        help_text='Margin taken off the exchange rate (e.g., 0.008 for 0.8%)'
+    )
+    
+    # Status
+    is_active = models.BooleanField(_('active'), default=True)
+    
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = _('corridor price')
+        verbose_name_plural = _('corridor prices')
+        ordering = ['origin_country', 'destination_country', 'method', 'min_amount']
+        unique_together = ['origin_country', 'destination_country', 'method', 'min_amount']
+    
+    def __str__(self):
+        return f"{self.origin_country}->{self.destination_country} {self.method} from {self.min_amount}"
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Recompile the pricing table everywhere once the change is committed
+        from transactions.pricing import bump_pricing_version
+        db_transaction.on_commit(bump_pricing_version)
+    
+    def delete(self, *args, **kwargs):
+        from transactions.pricing import bump_pricing_version
+        db_transaction.on_commit(bump_pricing_version)
+        return super().delete(*args, **kwargs)
+
+
+class OutboxEvent(models.Model):
+    """Side effect recorded in the same DB transaction as the change that caused it."""
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    
+    # Event details
+    event_type = models.CharField(_('event type'), max_length=100)
+    aggregate_id = models.CharField(
+        _('aggregate ID'),
+        max_length=64,
+        blank=True,
+        help_text='ID of the object the event is about (transaction, transfer, etc.)'
+    )
+    payload = models.JSONField(_('payload'), default=dict, blank=True)
+    
+    # Celery task the relay publishes the event to
+    task_name = models.CharField(_('task name'), max_length=255)
+    
+    # Relay status
+    published_at = models.DateTimeField(_('published at'), null=True, blank=True)
+    attempts = models.IntegerField(_('attempts'), default=0)
+    last_error = models.TextField(_('last error'), blank=True)
+    next_attempt_at = models.DateTimeField(
+        _('next attempt at'),
+        null=True,
+        blank=True,
+        help_text='Set after a failed publish; the event is not retried before then'
+    )
+    dead_lettered_at = models.DateTimeField(
+        _('dead-lettered at'),
+        null=True,
+        blank=True,
+        help_text='Set when publishing failed OUTBOX_MAX_ATTEMPTS times; the relay gives up'
+    )
+    
+    # Timestamp
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = _('outbox event')
+        verbose_name_plural = _('outbox events')
+        ordering = ['created_at']
+        indexes = [
+            models.Index(
+                fields=['created_at'],
+                condition=models.Q(published_at__isnull=True, dead_lettered_at__isnull=True),
+                name='outbox_unpublished_idx'
+            ),
+            models.Index(fields=['published_at']),
+            models.Index(
+                fields=['dead_lettered_at'],
+                condition=models.Q(dead_lettered_at__isnull=False),
+                name='outbox_dead_letter_idx'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.event_type} - {self.aggregate_id}"
+
+
+class RiskReview(models.Model):
+    """Transaction held back by the risk engine until a reviewer decides on it."""
+    
+    STATUS_CHOICES = [
+        ('OPEN', 'Open'),
+        ('CLEARED', 'Cleared'),
+        ('CONFIRMED_FRAUD', 'Confirmed Fraud'),
+        ('EXPIRED', 'Expired'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    transaction = models.OneToOneField(
+        Transaction,
+        on_delete=models.CASCADE,
+        related_name='risk_review'
+    )
+    user = models.ForeignKey('accounts.User', on_delete=models.CASCADE, related_name='risk_reviews')
+    
+    # Rules of settings.RISK_RULES the transaction tripped
+    rules = models.JSONField(_('rules'), default=list)
+    status = models.CharField(_('status'), max_length=20, choices=STATUS_CHOICES, default='OPEN')
+    
+    # Decision
+    reviewed_by = models.ForeignKey(
+        'accounts.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='risk_decisions'
+    )
+    reviewed_at = models.DateTimeField(_('reviewed at'), null=True, blank=True)
+    
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = _('risk review')
+        verbose_name_plural = _('risk reviews')
+        ordering = ['created_at']
+        indexes = [
+            models.Index(
+                fields=['created_at'],
+                condition=models.Q(status='OPEN'),
+                name='risk_review_open_idx'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.transaction_id} - {self.status}"
@@ -0,0 +1,133 @@
+"""
+Transactional outbox - side effects recorded with the DB change, published after commit.
+
+Services call record_event() inside their atomic block; the event row commits
+or rolls back together with the money movement. The relay then publishes
+pending events to Celery in batches, outside of any business transaction, so
+no network I/O happens while wallet rows are locked.
+
+An event whose publish fails is retried with exponential backoff and
+dead-lettered after OUTBOX_MAX_ATTEMPTS attempts, so a poison event never
+keeps the relay busy; requeue_dead_letters() puts such events back once
+the cause is fixed.
+"""
+from datetime import timedelta
+from celery import current_app
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.db.models import Q
+from django.utils import timezone
+from transactions.models import OutboxEvent
+
+
+DEFAULT_EVENT_TASK = 'transactions.tasks.handle_transaction_event'
+
+
+def record_event(event_type, payload, aggregate_id='', task_name=DEFAULT_EVENT_TASK):
+    """
+    Add an event to the outbox.
+
+    Args:
+        event_type: Event name, e.g. 'transaction.completed'
+        payload: JSON-serializable dict passed to the task
+        aggregate_id: ID of the object the event is about
+        task_name: Celery task the relay publishes the event to
+
+    Returns:
+        OutboxEvent object
+    """
+    return OutboxEvent.objects.create(
+        event_type=event_type,
+        aggregate_id=str(aggregate_id),
+        payload=payload,
+        task_name=task_name,
+    )
+
+
+def record_events(events):
+    """Add several events to the outbox with a single INSERT."""
+    return OutboxEvent.objects.bulk_create(events)
+
+
+def retry_delay(attempts):
+    """Backoff before the next publish of an event that failed `attempts` times."""
+    seconds = settings.OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+    return timedelta(seconds=min(seconds, settings.OUTBOX_RETRY_MAX_SECONDS))
+
+
+def relay_pending_events(batch_size=500):
+    """
+    Publish one batch of pending events to Celery.
+
+    Rows are claimed with SKIP LOCKED so several relays can run side by side,
+    and all messages in the batch go through a single broker connection.
+    Events waiting for their retry time or dead-lettered are skipped.
+
+    Returns:
+        Number of events published
+    """
+    with db_transaction.atomic():
+        now = timezone.now()
+        events = list(
+            OutboxEvent.objects
+            .select_for_update(skip_locked=True)
+            .filter(published_at__isnull=True, dead_lettered_at__isnull=True)
+            .filter(Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now))
+            .order_by('created_at')[:batch_size]
+        )
+        if not events:
+            return 0
+
+        published = 0
+        with current_app.producer_or_acquire() as producer:
+            for event in events:
+                event.attempts += 1
+                try:
+                    current_app.send_task(
+                        event.task_name,
+                        kwargs={
+                            'event_id': str(event.id),
+                            'event_type': event.event_type,
+                            'payload': event.payload,
+                        },
+                        producer=producer,
+                    )
+                except Exception as exc:
+                    event.last_error = str(exc)
+                    if event.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+                        event.dead_lettered_at = now
+                    else:
+                        event.next_attempt_at = now + retry_delay(event.attempts)
+                    continue
+                event.published_at = now
+                published += 1
+
+        OutboxEvent.objects.bulk_update(
+            events,
+            ['published_at', 'attempts', 'last_error', 'next_attempt_at', 'dead_lettered_at']
+        )
+    return published
+
+
+def requeue_dead_letters(queryset=None):
+    """
+    Give dead-lettered events a fresh set of attempts.
+
+    Args:
+        queryset: OutboxEvent queryset to requeue (default: all dead letters)
+
+    Returns:
+        Number of events requeued
+    """
+    queryset = OutboxEvent.objects.all() if queryset is None else queryset
+    return queryset.filter(dead_lettered_at__isnull=False).update(
+        dead_lettered_at=None,
+        next_attempt_at=None,
+        attempts=0
+    )
+
+
+def purge_published_events(before):
+    """Delete events published before the given datetime."""
+    deleted, _ = OutboxEvent.objects.filter(published_at__lt=before).delete()
+    return deleted
@@ -0,0 +1,28 @@
+"""
+Payout providers - the clients that send bulk payout items out of MoneyBridge.
+
+settings.PAYOUT_PROVIDERS maps a payout method (BANK, WAVE, ...) to a
+function taking the item's BankTransfer or MobileMoneyTransaction and
+returning the provider's reference for it. The function raises
+PayoutRejected when the provider refused the payout for good; any other
+exception means the outcome is unknown, and the payout is sent again later.
+Providers must therefore be idempotent on a reference of the payout (the
+end-to-end ID of a BankTransfer, the ID of a MobileMoneyTransaction).
+"""
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class PayoutRejected(Exception):
+    """The provider refused the payout; no money left."""
+
+
+_providers = {}
+
+
+def get_payout_provider(method):
+    """Send function configured for a payout method, or None."""
+    if method not in _providers:
+        path = settings.PAYOUT_PROVIDERS.get(method)
+        _providers[method] = import_string(path) if path else None
+    return _providers[method]
@@ -0,0 +1,144 @@
+"""
+Corridor pricing engine.
+
+Active CorridorPrice rows are compiled into a per-process table keyed by
+(origin country, destination country, method), each holding its amount
+tiers in sorted order. A lookup is a handful of dict probes (from the most
+specific key to the full wildcard) plus a bisect over a few tiers. The
+table is recompiled whenever the pricing version moves, i.e. after any
+CorridorPrice change is committed, so prices change without a deploy.
+"""
+from bisect import bisect_right
+from collections import namedtuple
+from decimal import Decimal
+from django.core.cache import cache
+from exchange.services import ExchangeRateService
+from transactions.models import CorridorPrice
+
+
+PRICING_VERSION_KEY = 'transactions:pricing:version'
+
+# Currencies paid out in whole units
+ZERO_DECIMAL_CURRENCIES = {'XOF', 'XAF', 'UGX'}
+
+Price = namedtuple('Price', [
+    'amount',
+    'fee',
+    'total',
+    'currency',
+    'payout_amount',
+    'payout_currency',
+    'rate',
+    'corridor_id',
+])
+
+_table = None
+
+
+def get_pricing_version():
+    version = cache.get(PRICING_VERSION_KEY)
+    if version is None:
+        cache.add(PRICING_VERSION_KEY, 1, None)
+        version = cache.get(PRICING_VERSION_KEY, 1)
+    return version
+
+
+def bump_pricing_version():
+    try:
+        return cache.incr(PRICING_VERSION_KEY)
+    except ValueError:
+        cache.set(PRICING_VERSION_KEY, 2, None)
+        return 2
+
+
+class PricingTable:
+    """Compiled corridor prices."""
+
+    def __init__(self, version):
+        self.version = version
+        self.corridors = {}
+        for price in CorridorPrice.objects.filter(is_active=True).order_by('min_amount'):
+            key = (price.origin_country, price.destination_country, price.method)
+            tiers, prices = self.corridors.setdefault(key, ([], []))
+            tiers.append(price.min_amount)
+            prices.append(price)
+
+    def find(self, origin_country, destination_country, method, amount):
+        """Most specific active price for the corridor and amount, or None."""
+        any_ = CorridorPrice.ANY
+        # Destination and method matter most for the payout, the origin least
+        keys = (
+            (origin_country, destination_country, method),
+            (any_, destination_country, method),
+            (origin_country, destination_country, any_),
+            (any_, destination_country, any_),
+            (origin_country, any_, method),
+            (any_, any_, method),
+            (origin_country, any_, any_),
+            (any_, any_, any_),
+        )
+        for key in keys:
+            corridor = self.corridors.get(key)
+            if corridor is None:
+                continue
+            tiers, prices = corridor
+            position = bisect_right(tiers, amount) - 1
+            if position >= 0:
+                return prices[position]
+        return None
+
+
+def get_pricing_table():
+    global _table
+    version = get_pricing_version()
+    if _table is None or _table.version != version:
+        _table = PricingTable(version)
+    return _table
+
+
+def quote_price(origin_country, destination_country, method, amount, currency='EUR'):
+    """
+    Price a transfer of `amount` (in `currency`) along a corridor.
+
+    Args:
+        origin_country: Sender's country code ('*' if unknown)
+        destination_country: Beneficiary's country code
+        method: Payout method (BANK, WAVE, ORANGE_MONEY, ...)
+        amount: Amount sent, before fees
+        currency: Currency of the sender's wallet
+
+    Returns:
+        Price
+
+    Raises:
+        ValueError: if no price or exchange rate is configured for the corridor
+    """
+    price = get_pricing_table().find(
+        (origin_country or CorridorPrice.ANY).upper(),
+        (destination_country or CorridorPrice.ANY).upper(),
+        (method or CorridorPrice.ANY).upper(),
+        amount
+    )
+    if price is None:
+        raise ValueError(f"No price for {origin_country}->{destination_country} {method}")
+
+    fee = price.calculate_fee(amount)
+    if price.payout_currency == currency:
+        rate = Decimal('1')
+        payout_amount = amount
+    else:
+        rate = ExchangeRateService.get_conversion_rate(currency, price.payout_currency) * (1 - price.fx_margin)
+        rate = rate.quantize(Decimal('0.000001'))
+        places = Decimal('1') if price.payout_currency in ZERO_DECIMAL_CURRENCIES else Decimal('0.01')
+        payout_amount = (amount * rate).quantize(places)
+
+    return Price(
+        amount=amount,
+        fee=fee,
+        total=amount + fee,
+        currency=currency,
+        payout_amount=payout_amount,
+        payout_currency=price.payout_currency,
+        rate=rate,
+        corridor_id=price.id,
+    )
@@ -0,0 +1,73 @@
+"""
+Locked price quotes.
+
+A quote freezes the rate, fee and amounts shown to the customer under a
+random ID in the shared cache for a short time. Executing with the quote ID
+uses exactly those figures, without pricing the transaction again.
+"""
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+
+def _key(quote_id):
+    return f'transactions:quote:{quote_id}'
+
+
+def create_quote(user, kind, **figures):
+    """
+    Store a quote for `user`.
+
+    Args:
+        user: User the quote is reserved for
+        kind: What the quote can be used for ('SEND', 'WITHDRAW', ...)
+        **figures: Amounts, fee and rate as Decimals or strings
+
+    Returns:
+        Dict with quote_id, expires_at and the figures (as strings)
+    """
+    ttl = settings.QUOTE_TTL_SECONDS
+    quote = {key: str(value) for key, value in figures.items()}
+    quote.update({
+        'quote_id': uuid.uuid4().hex,
+        'kind': kind,
+        'user_id': str(user.pk),
+        'expires_at': (timezone.now() + timedelta(seconds=ttl)).isoformat(),
+    })
+    cache.set(_key(quote['quote_id']), quote, ttl)
+    return quote
+
+
+def get_quote(quote_id, user, kind):
+    """
+    Read a quote without claiming it, to validate a request before it runs.
+
+    Returns:
+        The quote dict, or None if it is unknown, expired, already used,
+        or belongs to another user or operation
+    """
+    try:
+        quote_id = uuid.UUID(str(quote_id)).hex
+    except ValueError:
+        return None
+    quote = cache.get(_key(quote_id))
+    if quote is None or quote['user_id'] != str(user.pk) or quote['kind'] != kind:
+        return None
+    return quote
+
+
+def consume_quote(quote_id, user, kind):
+    """
+    Claim a quote for execution; each quote can be used once.
+
+    Returns:
+        The quote dict, or None if it is unknown, expired, already used,
+        or belongs to another user or operation
+    """
+    quote = get_quote(quote_id, user, kind)
+    # Only the request that actually deletes the key may use it
+    if quote is None or not cache.delete(_key(quote['quote_id'])):
+        return None
+    return quote
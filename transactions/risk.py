@@ -0,0 +1,241 @@
+"""
+Velocity checks on outgoing money.
+
+Each rule of settings.RISK_RULES bounds the number or the EUR amount of
+transfers per user, destination phone, destination IBAN or device over a
+sliding window. Windows are approximated with two fixed buckets in the
+shared cache (the previous bucket weighted by how much of it still overlaps
+the window), so a check is one cache round-trip plus arithmetic and a
+transfer adds one pipelined write.
+
+Tripping a REVIEW rule puts the funds on hold and opens a RiskReview
+instead of completing the transfer; tripping a BLOCK rule refuses it. BLOCK
+rules count the transfer up front, so they hold under concurrent requests.
+"""
+import hashlib
+import time
+from collections import namedtuple
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction as db_transaction
+from django.utils import timezone
+from transactions.models import RiskReview, Transaction
+from wallets.services import HoldService
+
+
+DIMENSIONS = ('user', 'phone', 'iban', 'device')
+ACTIONS = ('REVIEW', 'BLOCK')
+
+Rule = namedtuple('Rule', ['name', 'dimension', 'window', 'metric', 'limit', 'action'])
+
+Assessment = namedtuple('Assessment', ['action', 'rules', 'subjects', 'amount', 'reserved'])
+
+_rules = None
+
+
+def get_rules():
+    global _rules
+    if _rules is None:
+        rules = []
+        for options in settings.RISK_RULES:
+            rule = Rule(
+                name=options['name'],
+                dimension=options['dimension'],
+                window=int(options['window']),
+                metric=options.get('metric', 'count'),
+                limit=Decimal(str(options['limit'])),
+                action=options.get('action', 'REVIEW'),
+            )
+            if rule.dimension not in DIMENSIONS or rule.action not in ACTIONS:
+                raise ValueError(f"Invalid risk rule: {options}")
+            rules.append(rule)
+        _rules = rules
+    return _rules
+
+
+def _subject(value):
+    # Phones and IBANs never appear in cache keys in clear
+    return hashlib.blake2b(str(value).encode(), digest_size=8).hexdigest()
+
+
+def _bucket_keys(dimension, subject, window, now):
+    bucket = int(now // window)
+    prefix = f'risk:{dimension}:{subject}:{window}'
+    return f'{prefix}:{bucket}', f'{prefix}:{bucket - 1}'
+
+
+def _increment(key, increment, ttl):
+    """Atomically add `increment` to a counter; returns its new value."""
+    if cache.add(key, increment, ttl):
+        return increment
+    try:
+        return cache.incr(key, increment)
+    except ValueError:
+        # Expired between the two calls
+        cache.set(key, increment, ttl)
+        return increment
+
+
+def assess(user, amount, phone=None, iban=None, device=None):
+    """
+    Evaluate the risk rules for an outgoing transfer.
+
+    REVIEW rules are checked against the counters as they are. BLOCK rules
+    reserve the transfer in their counter first (INCR, then compare), so
+    concurrent requests cannot all pass the last free slot. A blocked
+    transfer gives its reservations back at once; one that does not go
+    ahead for another reason must call release().
+
+    Args:
+        user: Sending user
+        amount: Amount leaving the wallet, in EUR (fees included)
+        phone: Destination phone number (E.164)
+        iban: Destination IBAN
+        device: Device identifier of the client
+
+    Returns:
+        Assessment; action is 'ALLOW', 'REVIEW' or 'BLOCK'
+    """
+    subjects = {'user': user.pk, 'phone': phone, 'iban': iban, 'device': device}
+    subjects = {dimension: _subject(value) for dimension, value in subjects.items() if value}
+    rules = [rule for rule in get_rules() if rule.dimension in subjects]
+    now = time.time()
+    added = Decimal('1') if amount is None else amount
+    cents = int((amount or 0) * 100)
+
+    keys = {}
+    for rule in rules:
+        current, previous = _bucket_keys(rule.dimension, subjects[rule.dimension], rule.window, now)
+        keys[rule] = (f'{current}:{rule.metric}', f'{previous}:{rule.metric}')
+    values = cache.get_many([key for pair in keys.values() for key in pair])
+
+    # Counters of BLOCK rules already include this transfer once reserved
+    reserved = {}
+    for rule in rules:
+        current, _ = keys[rule]
+        if rule.action == 'BLOCK' and current not in reserved:
+            reserved[current] = cents if rule.metric == 'amount' else 1
+            values[current] = _increment(current, reserved[current], rule.window * 2)
+
+    action = 'ALLOW'
+    tripped = []
+    for rule in rules:
+        current, previous = keys[rule]
+        overlap = 1 - (now % rule.window) / rule.window
+        used = Decimal(values.get(current, 0)) + Decimal(values.get(previous, 0)) * Decimal(str(overlap))
+        if rule.metric == 'amount':
+            used /= 100
+            projected = used if current in reserved else used + added
+        else:
+            projected = used if current in reserved else used + 1
+        if projected > rule.limit:
+            tripped.append(rule.name)
+            if rule.action == 'BLOCK' or action == 'ALLOW':
+                action = rule.action
+
+    assessment = Assessment(action=action, rules=tripped, subjects=subjects, amount=amount, reserved=reserved)
+    if action == 'BLOCK':
+        release(assessment)
+    return assessment
+
+
+def release(assessment):
+    """Give back the counter reservations of a transfer that did not go ahead."""
+    for key, increment in assessment.reserved.items():
+        try:
+            cache.decr(key, increment)
+        except ValueError:
+            pass
+
+
+def record(assessment):
+    """Count a transfer that went ahead (completed or sent to review) in every window."""
+    increments = {}
+    now = time.time()
+    windows = {}
+    for rule in get_rules():
+        if rule.dimension in assessment.subjects:
+            windows.setdefault((rule.dimension, rule.window), set()).add(rule.metric)
+    cents = int((assessment.amount or 0) * 100)
+    for (dimension, window), metrics in windows.items():
+        current, _ = _bucket_keys(dimension, assessment.subjects[dimension], window, now)
+        for metric in metrics:
+            key = f'{current}:{metric}'
+            # Counted when assess() reserved it
+            if key not in assessment.reserved:
+                increments[(key, window * 2)] = cents if metric == 'amount' else 1
+
+    if not increments:
+        return
+    if settings.CACHES['default']['BACKEND'] == 'django.core.cache.backends.redis.RedisCache':
+        # One round-trip for every counter
+        pipeline = cache._cache.get_client(write=True).pipeline(transaction=False)
+        for (key, ttl), increment in increments.items():
+            key = cache.make_and_validate_key(key)
+            pipeline.incrby(key, increment)
+            pipeline.expire(key, ttl)
+        pipeline.execute()
+        return
+
+    for (key, ttl), increment in increments.items():
+        _increment(key, increment, ttl)
+
+
+class RiskReviewService:
+    """Hold flagged transfers and resolve their reviews."""
+
+    @staticmethod
+    @db_transaction.atomic
+    def hold_for_review(wallet, total, assessment, **transaction_fields):
+        """
+        Record a flagged transfer as PENDING with its funds on hold, and open its review.
+
+        Returns:
+            Transaction object
+
+        Raises:
+            ValueError: if the wallet cannot cover `total`
+        """
+        txn = Transaction.objects.create(status='PENDING', source_wallet=wallet, **transaction_fields)
+        HoldService.place_hold(wallet, total, 'RISK_REVIEW', txn)
+        RiskReview.objects.create(transaction=txn, user_id=txn.user_id, rules=assessment.rules)
+        return txn
+
+    @staticmethod
+    @db_transaction.atomic
+    def resolve(review, reviewer, fraud):
+        """
+        Complete a held transfer, or cancel it and return the funds.
+
+        Args:
+            review: Open RiskReview
+            reviewer: Staff user
+            fraud: True to cancel the transfer
+
+        Returns:
+            The new review status
+        """
+        review = RiskReview.objects.select_for_update().select_related('transaction').get(pk=review.pk)
+        if review.status != 'OPEN':
+            return review.status
+
+        txn = review.transaction
+        now = timezone.now()
+        # A review left open past the hold TTL finds the transfer already cancelled
+        status = 'EXPIRED'
+        if fraud:
+            if txn.status == 'PENDING' and txn.transition_to('CANCELLED', error_code='RISK_REJECTED'):
+                HoldService.release_transaction_holds(txn)
+                status = 'CONFIRMED_FRAUD'
+        elif txn.status == 'PENDING' and txn.transition_to('COMPLETED', completed_at=now):
+            HoldService.capture_transaction_holds(txn)
+            status = 'CLEARED'
+
+        RiskReview.objects.filter(pk=review.pk).update(
+            status=status,
+            reviewed_by=reviewer,
+            reviewed_at=now,
+            updated_at=now
+        )
+        return status
@@ -1,12 +1,65 @@
 """
 Transaction Service - Core business logic for handling transactions.
 """
+import logging
+from collections import defaultdict
+from datetime import timedelta
 from decimal import Decimal
-from django.db import transaction as db_transaction
+from django.conf import settings
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models import Case, Exists, F, OuterRef, Q, TextField, Value, When
 from django.utils import timezone
-from transactions.models import Transaction, LedgerEntry, TransactionFee
+from transactions.models import Transaction, LedgerEntry, TransactionFee, BulkPayout, OutboxEvent
+from transactions.outbox import DEFAULT_EVENT_TASK, record_event, record_events
+from transactions.payouts import PayoutRejected, get_payout_provider
+from wallets.iban import lookup_bank
 from wallets.models import Wallet
-from exchange.models import ExchangeRate, CurrencyConversion
+from wallets.services import HoldService
+from banking.models import BankTransfer
+from payments.models import MobileMoneyTransaction
+from exchange.models import CurrencyConversion
+from exchange.rate_graph import get_cross_rate
+from exchange.services import ExchangeRateService
+
+logger = logging.getLogger(__name__)
+
+
+def _transaction_payload(txn):
+    return {
+        'transaction_id': str(txn.id),
+        'user_id': str(txn.user_id),
+        'transaction_type': txn.transaction_type,
+        'status': txn.status,
+        'amount': str(txn.amount),
+        'currency': txn.currency,
+    }
+
+
+def _record_transaction_event(event_type, txn):
+    """Queue a transaction event in the outbox, in the caller's DB transaction."""
+    record_event(event_type, _transaction_payload(txn), aggregate_id=txn.id)
+
+
+def record_transaction_events(event_type, transactions):
+    """Queue the same event for several transactions with a single INSERT."""
+    record_events([
+        OutboxEvent(
+            event_type=event_type,
+            aggregate_id=str(txn.id),
+            payload=_transaction_payload(txn),
+            task_name=DEFAULT_EVENT_TASK,
+        )
+        for txn in transactions
+    ])
+
+
+def _unsent_payout():
+    """Condition on transactions whose payout has no provider reference yet."""
+    return ~Exists(
+        BankTransfer.objects.filter(transaction=OuterRef('pk'), provider_transfer_id__isnull=False)
+    ) & ~Exists(
+        MobileMoneyTransaction.objects.filter(transaction=OuterRef('pk'), provider_transaction_id__isnull=False)
+    )
 
 
 class TransactionService:
@@ -33,14 +86,11 @@ class TransactionService:
             currency='EUR'
         )
         
-        # Get exchange rate
-        exchange_rate = ExchangeRate.get_current_rate(currency, 'EUR')
-        if not exchange_rate:
-            raise ValueError(f"Exchange rate not found for {currency}/EUR")
+        # Get exchange rate (direct or triangulated through a pivot currency)
+        rate, rate_path = get_cross_rate(currency, 'EUR')
         
         # Convert amount to EUR
-        eur_amount = exchange_rate.convert(amount, direction='sell')
-        eur_amount = Decimal(str(eur_amount)).quantize(Decimal('0.01'))
+        eur_amount = (amount * rate).quantize(Decimal('0.01'))
         
         # Calculate fee
         fee_config = TransactionFee.objects.filter(
@@ -62,46 +112,52 @@ class TransactionService:
             currency='EUR',
             original_amount=amount,
             original_currency=currency,
-            exchange_rate=exchange_rate.sell_rate,
+            exchange_rate=rate.quantize(Decimal('0.000001')),
             fee_amount=fee_amount,
             fee_currency='EUR',
             destination_wallet=wallet,
             description=f"Received from {source_details.get('provider')}",
-            metadata=source_details
+            metadata={**source_details, 'rate_path': list(rate_path)}
         )
         
         # Create ledger entries (double-entry bookkeeping)
         # Credit user wallet with net amount
-        LedgerEntry.objects.create(
-            transaction=txn,
-            entry_type='CREDIT',
-            account_type='USER_WALLET',
-            amount=net_amount,
-            currency='EUR',
-            wallet=wallet,
-            balance_after=wallet.available_balance + net_amount,
-            description=f"Credit from mobile money - {source_details.get('provider')}"
-        )
-        
-        # If there's a fee, debit it
-        if fee_amount > 0:
-            LedgerEntry.objects.create(
-                transaction=txn,
-                entry_type='DEBIT',
-                account_type='FEES',
-                amount=fee_amount,
-                currency='EUR',
-                description=f"Transaction fee - {source_details.get('provider')}"
-            )
-            
-            LedgerEntry.objects.create(
+        entries = [
+            LedgerEntry(
                 transaction=txn,
                 entry_type='CREDIT',
-                account_type='REVENUE',
-                amount=fee_amount,
+                account_type='USER_WALLET',
+                amount=net_amount,
                 currency='EUR',
-                description=f"Fee revenue from transaction {txn.id}"
-            )
+                wallet=wallet,
+                balance_after=wallet.available_balance + net_amount,
+                description=f"Credit from mobile money - {source_details.get('provider')}"
+            ),
+        ]
+        
+        # If there's a fee, debit it
+        if fee_amount > 0:
+            entries += [
+                LedgerEntry(
+                    transaction=txn,
+                    entry_type='DEBIT',
+                    account_type='FEES',
+                    amount=fee_amount,
+                    currency='EUR',
+                    description=f"Transaction fee - {source_details.get('provider')}"
+                ),
+                LedgerEntry(
+                    transaction=txn,
+                    entry_type='CREDIT',
+                    account_type='REVENUE',
+                    amount=fee_amount,
+                    currency='EUR',
+                    description=f"Fee revenue from transaction {txn.id}"
+                ),
+            ]
+        
+        LedgerEntry.objects.bulk_create(entries)
+        _record_transaction_event('transaction.created', txn)
         
         return txn
     
@@ -113,19 +169,23 @@ class TransactionService:
         
         Args:
             transaction_obj: Transaction object to complete
+        
+        Returns:
+            True if this call completed the transaction, False if it was
+            changed concurrently (e.g. webhook and poller racing)
         """
         if transaction_obj.status != 'PENDING':
             raise ValueError(f"Transaction is not pending: {transaction_obj.status}")
         
-        # Update wallet balance
-        wallet = transaction_obj.destination_wallet
-        wallet.available_balance += transaction_obj.amount
-        wallet.save()
+        # The status change decides who wins; the loser credits nothing
+        if not transaction_obj.transition_to('COMPLETED', completed_at=timezone.now()):
+            return False
         
-        # Update transaction status
-        transaction_obj.status = 'COMPLETED'
-        transaction_obj.completed_at = timezone.now()
-        transaction_obj.save()
+        # Update wallet balance
+        Wallet.objects.filter(pk=transaction_obj.destination_wallet_id).update(
+            available_balance=F('available_balance') + transaction_obj.amount,
+            updated_at=timezone.now()
+        )
         
         # Create currency conversion record if applicable
         if transaction_obj.original_currency and transaction_obj.original_currency != transaction_obj.currency:
@@ -137,6 +197,10 @@ class TransactionService:
                 to_amount=transaction_obj.amount + transaction_obj.fee_amount,
                 rate_applied=transaction_obj.exchange_rate
             )
+        
+        _record_transaction_event('transaction.completed', transaction_obj)
+        
+        return True
     
     @staticmethod
     @db_transaction.atomic
@@ -193,54 +257,57 @@ class TransactionService:
             }
         )
         
-        # Lock the funds in the wallet
-        wallet.available_balance -= total_amount
-        wallet.locked_balance += total_amount
-        wallet.save()
+        # Reserve the funds until the transfer is settled or fails
+        HoldService.place_hold(wallet, total_amount, 'SEND_BANK_TRANSFER', transaction=txn)
         
         # Create ledger entries
-        # Debit user wallet
-        LedgerEntry.objects.create(
-            transaction=txn,
-            entry_type='DEBIT',
-            account_type='USER_WALLET',
-            amount=amount,
-            currency=currency,
-            wallet=wallet,
-            balance_after=wallet.available_balance,
-            description=f"Bank transfer to {bank_account.iban[-4:]}"
-        )
-        
-        # Move to locked account
-        LedgerEntry.objects.create(
-            transaction=txn,
-            entry_type='CREDIT',
-            account_type='LOCKED',
-            amount=amount,
-            currency=currency,
-            description=f"Funds locked for bank transfer {txn.id}"
-        )
-        
-        # Fee handling
-        if fee_amount > 0:
-            LedgerEntry.objects.create(
+        entries = [
+            # Debit user wallet
+            LedgerEntry(
                 transaction=txn,
                 entry_type='DEBIT',
                 account_type='USER_WALLET',
-                amount=fee_amount,
+                amount=amount,
                 currency=currency,
                 wallet=wallet,
-                description=f"Transfer fee for transaction {txn.id}"
-            )
-            
-            LedgerEntry.objects.create(
+                balance_after=wallet.available_balance,
+                description=f"Bank transfer to {bank_account.iban[-4:]}"
+            ),
+            # Move to locked account
+            LedgerEntry(
                 transaction=txn,
                 entry_type='CREDIT',
-                account_type='REVENUE',
-                amount=fee_amount,
+                account_type='LOCKED',
+                amount=amount,
                 currency=currency,
-                description=f"Fee revenue from transaction {txn.id}"
-            )
+                description=f"Funds locked for bank transfer {txn.id}"
+            ),
+        ]
+        
+        # Fee handling
+        if fee_amount > 0:
+            entries += [
+                LedgerEntry(
+                    transaction=txn,
+                    entry_type='DEBIT',
+                    account_type='USER_WALLET',
+                    amount=fee_amount,
+                    currency=currency,
+                    wallet=wallet,
+                    description=f"Transfer fee for transaction {txn.id}"
+                ),
+                LedgerEntry(
+                    transaction=txn,
+                    entry_type='CREDIT',
+                    account_type='REVENUE',
+                    amount=fee_amount,
+                    currency=currency,
+                    description=f"Fee revenue from transaction {txn.id}"
+                ),
+            ]
+        
+        LedgerEntry.objects.bulk_create(entries)
+        _record_transaction_event('transaction.created', txn)
         
         return txn
     
@@ -252,20 +319,24 @@ class TransactionService:
         
         Args:
             transaction_obj: Transaction object to complete
+        
+        Returns:
+            True if this call completed the transaction, False if it was
+            changed concurrently
         """
-        if transaction_obj.status not in ['PENDING', 'PROCESSING']:
+        if not transaction_obj.can_transition_to('COMPLETED'):
             raise ValueError(f"Transaction cannot be completed: {transaction_obj.status}")
         
-        # Unlock and remove from locked balance
-        wallet = transaction_obj.source_wallet
-        total_amount = transaction_obj.amount + transaction_obj.fee_amount
-        wallet.locked_balance -= total_amount
-        wallet.save()
+        if not transaction_obj.transition_to('COMPLETED', completed_at=timezone.now()):
+            return False
         
-        # Update transaction status
-        transaction_obj.status = 'COMPLETED'
-        transaction_obj.completed_at = timezone.now()
-        transaction_obj.save()
+        # Capture the held funds; transactions created before holds existed
+        # only have the amount in locked_balance
+        if HoldService.capture_transaction_holds(transaction_obj) is None:
+            Wallet.objects.filter(pk=transaction_obj.source_wallet_id).update(
+                locked_balance=F('locked_balance') - (transaction_obj.amount + transaction_obj.fee_amount),
+                updated_at=timezone.now()
+            )
         
         # Update ledger - move from locked to final state
         LedgerEntry.objects.create(
@@ -276,7 +347,271 @@ class TransactionService:
             currency=transaction_obj.currency,
             description=f"Funds unlocked - transfer completed {transaction_obj.id}"
         )
+        
+        _record_transaction_event('transaction.completed', transaction_obj)
+        
+        return True
+    
+    @staticmethod
+    @db_transaction.atomic
+    def create_wallet_transfer(sender, recipient, amount, currency='EUR', recipient_currency=None, description=''):
+        """
+        Move money between two MoneyBridge wallets and settle it immediately.
+        
+        Both wallets are locked in primary key order, so concurrent transfers
+        in opposite directions queue up instead of deadlocking.
+        
+        Args:
+            sender: User sending the money
+            recipient: User receiving the money
+            amount: Amount debited from the sender, in `currency`
+            currency: Sender wallet currency (default EUR)
+            recipient_currency: Recipient wallet currency (default: same as sender)
+            description: Optional free text
+        
+        Returns:
+            Transaction object (COMPLETED)
+        
+        Raises:
+            ValueError: if the amount or a currency is invalid, or the transfer
+                cannot be made (same wallet, no wallet, inactive, balance)
+        """
+        recipient_currency = recipient_currency or currency
+        currencies = {code for code, _ in Wallet.CURRENCIES}
+        for code in (currency, recipient_currency):
+            if code not in currencies:
+                raise ValueError(f"Unsupported currency: {code}")
+        if not isinstance(amount, Decimal) or not amount.is_finite() or amount <= 0:
+            raise ValueError("Amount must be a positive number")
+        if amount != amount.quantize(Decimal('0.01')):
+            raise ValueError("Amount cannot have more than 2 decimal places")
+        if sender.pk == recipient.pk and currency == recipient_currency:
+            raise ValueError("Cannot transfer to the same wallet")
+        
+        source_id = Wallet.objects.filter(user=sender, currency=currency).values_list('pk', flat=True).first()
+        if source_id is None:
+            raise ValueError(f"User does not have a {currency} wallet")
+        destination_id = (
+            Wallet.objects
+            .filter(user=recipient, currency=recipient_currency)
+            .values_list('pk', flat=True)
+            .first()
+        )
+        if destination_id is None:
+            try:
+                with db_transaction.atomic():
+                    destination_id = Wallet.objects.create(user=recipient, currency=recipient_currency).pk
+            except IntegrityError:
+                # Same wallet created concurrently: use theirs
+                destination_id = Wallet.objects.get(user=recipient, currency=recipient_currency).pk
+        
+        # Lock both wallets in canonical (primary key) order
+        locked = {
+            wallet.pk: wallet
+            for wallet in Wallet.objects.select_for_update().filter(pk__in=[source_id, destination_id]).order_by('pk')
+        }
+        source = locked[source_id]
+        destination = locked[destination_id]
+        if not source.is_active or not destination.is_active:
+            raise ValueError("Wallet is not active")
+        
+        # Calculate fee
+        fee_config = TransactionFee.objects.filter(
+            transaction_type='WALLET_TO_WALLET',
+            is_active=True
+        ).first()
+        
+        fee_amount = fee_config.calculate_fee(amount) if fee_config else Decimal('0.00')
+        total_amount = amount + fee_amount
+        
+        if source.available_balance < total_amount:
+            raise ValueError("Insufficient balance including fee")
+        
+        # Convert through the cached rates when the wallets differ in currency
+        rate = ExchangeRateService.get_conversion_rate(currency, recipient_currency)
+        credited_amount = (amount * rate).quantize(Decimal('0.01'))
+        
+        now = timezone.now()
+        source.available_balance -= total_amount
+        source.updated_at = now
+        destination.available_balance += credited_amount
+        destination.updated_at = now
+        Wallet.objects.bulk_update([source, destination], ['available_balance', 'updated_at'])
+        
+        converted = currency != recipient_currency
+        txn = Transaction.objects.create(
+            user=sender,
+            transaction_type='WALLET_TO_WALLET',
+            status='COMPLETED',
+            amount=amount,
+            currency=currency,
+            exchange_rate=rate if converted else None,
+            fee_amount=fee_amount,
+            fee_currency=currency,
+            source_wallet=source,
+            destination_wallet=destination,
+            description=description or f"Transfer to {recipient.email}",
+            metadata={
+                'recipient_id': str(recipient.pk),
+                'credited_amount': str(credited_amount),
+                'credited_currency': recipient_currency,
+            },
+            completed_at=now
+        )
+        
+        # Balanced ledger legs, posted in one batch
+        entries = [
+            LedgerEntry(
+                transaction=txn,
+                entry_type='DEBIT',
+                account_type='USER_WALLET',
+                amount=amount,
+                currency=currency,
+                wallet=source,
+                balance_after=source.available_balance + fee_amount,
+                description=f"Wallet transfer to {recipient.email}"
+            ),
+        ]
+        
+        if converted:
+            entries += [
+                LedgerEntry(
+                    transaction=txn,
+                    entry_type='CREDIT',
+                    account_type='FLOAT',
+                    amount=amount,
+                    currency=currency,
+                    description=f"FX {currency}/{recipient_currency} for transaction {txn.id}"
+                ),
+                LedgerEntry(
+                    transaction=txn,
+                    entry_type='DEBIT',
+                    account_type='FLOAT',
+                    amount=credited_amount,
+                    currency=recipient_currency,
+                    description=f"FX {currency}/{recipient_currency} for transaction {txn.id}"
+                ),
+            ]
+        
+        entries.append(
+            LedgerEntry(
+                transaction=txn,
+                entry_type='CREDIT',
+                account_type='USER_WALLET',
+                amount=credited_amount,
+                currency=recipient_currency,
+                wallet=destination,
+                balance_after=destination.available_balance,
+                description=f"Wallet transfer from {sender.email}"
+            )
+        )
+        
+        if fee_amount > 0:
+            entries += [
+                LedgerEntry(
+                    transaction=txn,
+                    entry_type='DEBIT',
+                    account_type='USER_WALLET',
+                    amount=fee_amount,
+                    currency=currency,
+                    wallet=source,
+                    balance_after=source.available_balance,
+                    description=f"Transfer fee for transaction {txn.id}"
+                ),
+                LedgerEntry(
+                    transaction=txn,
+                    entry_type='CREDIT',
+                    account_type='REVENUE',
+                    amount=fee_amount,
+                    currency=currency,
+                    description=f"Fee revenue from transaction {txn.id}"
+                ),
+            ]
+        
+        LedgerEntry.objects.bulk_create(entries)
+        
+        if converted:
+            CurrencyConversion.objects.create(
+                transaction=txn,
+                from_currency=currency,
+                to_currency=recipient_currency,
+                from_amount=amount,
+                to_amount=credited_amount,
+                rate_applied=rate
+            )
+        
+        _record_transaction_event('transaction.completed', txn)
+        
+        return txn
     
+    @staticmethod
+    @db_transaction.atomic
+    def complete_bank_transfer_transactions(transaction_ids):
+        """
+        Complete several bank transfers in bulk.
+
+        The transactions are locked and read once, then their holds are
+        captured and they are completed, posted to the ledger and announced
+        with a fixed number of statements whatever their number. A transaction
+        whose holds were already released or expired is left as it is: its
+        funds went back to the wallet and cannot also leave it.
+
+        Args:
+            transaction_ids: IDs of the transactions to complete
+
+        Returns:
+            (completed, inactive): IDs of the transactions completed by this
+            call, and IDs of those left alone because their holds were closed;
+            the others were in a status COMPLETED cannot be reached from
+        """
+        transactions = list(
+            Transaction.objects
+            .select_for_update()
+            .filter(pk__in=list(transaction_ids), status__in=Transaction.allowed_sources('COMPLETED'))
+            .order_by('pk')
+        )
+        if not transactions:
+            return set(), set()
+
+        captured, inactive = HoldService.capture_holds_of_transactions([txn.pk for txn in transactions])
+        transactions = [txn for txn in transactions if txn.pk not in inactive]
+        if not transactions:
+            return set(), inactive
+
+        ids = [txn.pk for txn in transactions]
+        now = timezone.now()
+        Transaction.objects.filter(pk__in=ids).transition('COMPLETED', completed_at=now)
+
+        # Transactions created before holds existed only have the amount in locked_balance
+        legacy = defaultdict(Decimal)
+        for txn in transactions:
+            if txn.pk not in captured:
+                legacy[txn.source_wallet_id] += txn.amount + txn.fee_amount
+        for wallet_id in sorted(legacy):
+            Wallet.objects.filter(pk=wallet_id).update(
+                locked_balance=F('locked_balance') - legacy[wallet_id],
+                updated_at=now
+            )
+
+        LedgerEntry.objects.bulk_create([
+            LedgerEntry(
+                transaction=txn,
+                entry_type='DEBIT',
+                account_type='LOCKED',
+                amount=txn.amount,
+                currency=txn.currency,
+                description=f"Funds unlocked - transfer completed {txn.id}"
+            )
+            for txn in transactions
+        ])
+
+        for txn in transactions:
+            txn.status = 'COMPLETED'
+            txn.completed_at = now
+        record_transaction_events('transaction.completed', transactions)
+
+        return set(ids), inactive
+
     @staticmethod
     @db_transaction.atomic
     def fail_bank_transfer_transaction(transaction_obj, error_message):
@@ -286,39 +621,460 @@ class TransactionService:
         Args:
             transaction_obj: Transaction object to fail
             error_message: Error message explaining the failure
+        
+        Returns:
+            True if this call failed the transaction, False if it was
+            changed concurrently
         """
-        if transaction_obj.status not in ['PENDING', 'PROCESSING']:
+        if not transaction_obj.can_transition_to('FAILED'):
             raise ValueError(f"Transaction cannot be failed: {transaction_obj.status}")
         
-        # Refund locked funds to available balance
-        wallet = transaction_obj.source_wallet
-        total_amount = transaction_obj.amount + transaction_obj.fee_amount
-        wallet.locked_balance -= total_amount
-        wallet.available_balance += total_amount
-        wallet.save()
+        if not transaction_obj.transition_to('FAILED', error_message=error_message):
+            return False
         
-        # Update transaction status
-        transaction_obj.status = 'FAILED'
-        transaction_obj.error_message = error_message
-        transaction_obj.save()
+        # Release the held funds back to available balance
+        total_amount = transaction_obj.amount + transaction_obj.fee_amount
+        if HoldService.release_transaction_holds(transaction_obj) is None:
+            Wallet.objects.filter(pk=transaction_obj.source_wallet_id).update(
+                available_balance=F('available_balance') + total_amount,
+                locked_balance=F('locked_balance') - total_amount,
+                updated_at=timezone.now()
+            )
+        wallet = Wallet.objects.get(pk=transaction_obj.source_wallet_id)
         
         # Create refund ledger entries
-        LedgerEntry.objects.create(
-            transaction=transaction_obj,
-            entry_type='DEBIT',
-            account_type='LOCKED',
-            amount=total_amount,
-            currency=transaction_obj.currency,
-            description=f"Unlock failed transfer funds {transaction_obj.id}"
+        LedgerEntry.objects.bulk_create([
+            LedgerEntry(
+                transaction=transaction_obj,
+                entry_type='DEBIT',
+                account_type='LOCKED',
+                amount=total_amount,
+                currency=transaction_obj.currency,
+                description=f"Unlock failed transfer funds {transaction_obj.id}"
+            ),
+            LedgerEntry(
+                transaction=transaction_obj,
+                entry_type='CREDIT',
+                account_type='USER_WALLET',
+                amount=total_amount,
+                currency=transaction_obj.currency,
+                wallet=wallet,
+                balance_after=wallet.available_balance,
+                description=f"Refund for failed transfer {transaction_obj.id}"
+            ),
+        ])
+        
+        _record_transaction_event('transaction.failed', transaction_obj)
+        
+        return True
+    
+    @staticmethod
+    @db_transaction.atomic
+    def fail_bank_transfer_transactions(failures):
+        """
+        Fail several bank transfers and refund their users in bulk.
+        
+        The transactions are locked and read once, then failed, released,
+        posted to the ledger and announced with a fixed number of statements
+        whatever their number. Wallet balances are only ever changed with
+        F() updates, so several transfers of one wallet cannot overwrite each
+        other's refunds.
+        
+        Args:
+            failures: Dict of transaction ID -> error message
+        
+        Returns:
+            Set of IDs of the transactions failed by this call; the others
+            were already in a status FAILED cannot be reached from
+        """
+        transactions = list(
+            Transaction.objects
+            .select_for_update()
+            .filter(pk__in=list(failures), status__in=Transaction.allowed_sources('FAILED'))
+            .order_by('pk')
         )
+        if not transactions:
+            return set()
         
-        LedgerEntry.objects.create(
-            transaction=transaction_obj,
-            entry_type='CREDIT',
-            account_type='USER_WALLET',
-            amount=total_amount,
-            currency=transaction_obj.currency,
+        ids = [txn.pk for txn in transactions]
+        Transaction.objects.filter(pk__in=ids).transition(
+            'FAILED',
+            error_message=Case(
+                *[When(pk=txn.pk, then=Value(failures[txn.pk])) for txn in transactions],
+                output_field=TextField()
+            )
+        )
+        
+        released, already_closed = HoldService.release_holds_of_transactions(ids)
+        
+        # Transactions created before holds existed only have the amount in locked_balance
+        legacy = defaultdict(Decimal)
+        for txn in transactions:
+            if txn.pk not in released and txn.pk not in already_closed:
+                legacy[txn.source_wallet_id] += txn.amount + txn.fee_amount
+        now = timezone.now()
+        for wallet_id in sorted(legacy):
+            Wallet.objects.filter(pk=wallet_id).update(
+                available_balance=F('available_balance') + legacy[wallet_id],
+                locked_balance=F('locked_balance') - legacy[wallet_id],
+                updated_at=now
+            )
+        
+        # Funds of holds that had already expired went back to the wallet then
+        refunded = [txn for txn in transactions if txn.pk not in already_closed]
+        wallets = Wallet.objects.in_bulk({txn.source_wallet_id for txn in refunded})
+        entries = []
+        for txn in refunded:
+            total_amount = txn.amount + txn.fee_amount
+            wallet = wallets.get(txn.source_wallet_id)
+            entries += [
+                LedgerEntry(
+                    transaction=txn,
+                    entry_type='DEBIT',
+                    account_type='LOCKED',
+                    amount=total_amount,
+                    currency=txn.currency,
+                    description=f"Unlock failed transfer funds {txn.id}"
+                ),
+                LedgerEntry(
+                    transaction=txn,
+                    entry_type='CREDIT',
+                    account_type='USER_WALLET',
+                    amount=total_amount,
+                    currency=txn.currency,
+                    wallet=wallet,
+                    balance_after=wallet.available_balance if wallet else None,
+                    description=f"Refund for failed transfer {txn.id}"
+                ),
+            ]
+        LedgerEntry.objects.bulk_create(entries)
+        
+        for txn in transactions:
+            txn.status = 'FAILED'
+            txn.error_message = failures[txn.pk]
+        record_transaction_events('transaction.failed', transactions)
+        
+        return set(ids)
+
+    
+    @staticmethod
+    @db_transaction.atomic
+    def create_bulk_payout(user, items, currency='EUR', source_format='JSON', reference=''):
+        """
+        Reserve funds for a validated list of payouts and create all their rows.
+        
+        The wallet is locked and reserved once for the whole batch (one hold per
+        payout, so each can be captured or released on its own); transactions,
+        bank transfers, mobile money transfers and ledger legs are inserted with
+        bulk_create. Dispatch to providers happens asynchronously through the
+        outbox (see dispatch_bulk_payout).
+        
+        Args:
+            user: User paying the batch
+            items: List of PayoutItem (see transactions.bulk_payouts)
+            currency: Wallet currency (default EUR)
+            source_format: 'CSV' or 'JSON'
+            reference: Optional batch reference
+        
+        Returns:
+            BulkPayout object
+        """
+        try:
+            wallet = Wallet.objects.select_for_update().get(user=user, currency=currency)
+        except Wallet.DoesNotExist:
+            raise ValueError(f"User does not have a {currency} wallet")
+        
+        # One fee configuration lookup per payout type for the whole batch
+        fee_configs = {
+            config.transaction_type: config
+            for config in TransactionFee.objects.filter(
+                transaction_type__in=['SEND_BANK_TRANSFER', 'SEND_MOBILE_MONEY'],
+                is_active=True
+            )
+        }
+        
+        def fee_for(transaction_type, amount):
+            config = fee_configs.get(transaction_type)
+            return config.calculate_fee(amount) if config else Decimal('0.00')
+        
+        priced = []
+        for item in items:
+            transaction_type = 'SEND_BANK_TRANSFER' if item.method == 'BANK' else 'SEND_MOBILE_MONEY'
+            priced.append((item, transaction_type, fee_for(transaction_type, item.amount)))
+        
+        total_amount = sum((item.amount for item, _, _ in priced), Decimal('0.00'))
+        total_fee = sum((fee for _, _, fee in priced), Decimal('0.00'))
+        
+        if wallet.available_balance < total_amount + total_fee:
+            raise ValueError("Insufficient balance including fee")
+        
+        batch = BulkPayout.objects.create(
+            user=user,
             wallet=wallet,
-            balance_after=wallet.available_balance,
-            description=f"Refund for failed transfer {transaction_obj.id}"
+            source_format=source_format,
+            reference=reference,
+            currency=currency,
+            total_amount=total_amount,
+            total_fee=total_fee,
+            item_count=len(items)
+        )
+        
+        transactions = []
+        bank_transfers = []
+        mobile_transfers = []
+        entries = []
+        
+        for item, transaction_type, fee_amount in priced:
+            txn = Transaction(
+                user=user,
+                transaction_type=transaction_type,
+                status='PENDING',
+                amount=item.amount,
+                currency=currency,
+                fee_amount=fee_amount,
+                fee_currency=currency,
+                source_wallet=wallet,
+                bulk_payout=batch,
+                description=f"Payout to {item.beneficiary_name}",
+                metadata={'reference': item.reference} if item.reference else {}
+            )
+            transactions.append(txn)
+            
+            if item.method == 'BANK':
+                # Beneficiaries are third parties: their details stay on the
+                # transfer, never in a BankAccount owned by the payer
+                bank = lookup_bank(item.iban)
+                transfer = BankTransfer(
+                    transaction=txn,
+                    amount=item.amount,
+                    currency=currency,
+                    beneficiary_name=item.beneficiary_name,
+                    beneficiary_iban=item.iban,
+                    beneficiary_bic=bank.bic if bank else '',
+                    reference=item.reference
+                )
+                # bulk_create skips save(), so set the end-to-end reference here
+                transfer.end_to_end_id = transfer.id.hex
+                bank_transfers.append(transfer)
+            else:
+                mobile_transfers.append(MobileMoneyTransaction(
+                    transaction=txn,
+                    provider=item.method,
+                    # Counterparty fields: for payouts this is the beneficiary
+                    sender_phone_number=item.phone_number,
+                    sender_phone_e164=item.phone_number,
+                    sender_name=item.beneficiary_name,
+                    sender_country=item.country,
+                    amount=item.amount,
+                    currency=currency,
+                    metadata={'direction': 'PAYOUT'}
+                ))
+            
+            entries += [
+                LedgerEntry(
+                    transaction=txn,
+                    entry_type='DEBIT',
+                    account_type='USER_WALLET',
+                    amount=item.amount,
+                    currency=currency,
+                    wallet=wallet,
+                    description=f"Bulk payout to {item.beneficiary_name}"
+                ),
+                LedgerEntry(
+                    transaction=txn,
+                    entry_type='CREDIT',
+                    account_type='LOCKED',
+                    amount=item.amount,
+                    currency=currency,
+                    description=f"Funds locked for payout {txn.id}"
+                ),
+            ]
+            if fee_amount > 0:
+                entries += [
+                    LedgerEntry(
+                        transaction=txn,
+                        entry_type='DEBIT',
+                        account_type='USER_WALLET',
+                        amount=fee_amount,
+                        currency=currency,
+                        wallet=wallet,
+                        description=f"Payout fee for transaction {txn.id}"
+                    ),
+                    LedgerEntry(
+                        transaction=txn,
+                        entry_type='CREDIT',
+                        account_type='REVENUE',
+                        amount=fee_amount,
+                        currency=currency,
+                        description=f"Fee revenue from transaction {txn.id}"
+                    ),
+                ]
+        
+        Transaction.objects.bulk_create(transactions, batch_size=500)
+        
+        # One hold per payout, reserved with a single wallet update
+        HoldService.place_holds(wallet, [
+            (txn.amount + txn.fee_amount, 'BULK_PAYOUT', txn)
+            for txn in transactions
+        ])
+        
+        BankTransfer.objects.bulk_create(bank_transfers, batch_size=500)
+        MobileMoneyTransaction.objects.bulk_create(mobile_transfers, batch_size=500)
+        LedgerEntry.objects.bulk_create(entries, batch_size=1000)
+        
+        record_event(
+            'bulk_payout.created',
+            {'bulk_payout_id': str(batch.id)},
+            aggregate_id=batch.id,
+            task_name='transactions.tasks.dispatch_bulk_payout',
+        )
+        
+        return batch
+    
+    @staticmethod
+    def dispatch_bulk_payout(batch, chunk_size=200):
+        """
+        Hand the payouts of a batch over to the providers, chunk by chunk.
+        
+        A chunk is claimed (moved to PROCESSING) in one short DB transaction,
+        sent through the providers of settings.PAYOUT_PROVIDERS with no DB
+        transaction open, and its outcome recorded in another short one, so
+        clients polling the batch see progress while the dispatch is running.
+        
+        Payouts claimed more than BULK_PAYOUT_CLAIM_TIMEOUT_SECONDS ago and
+        still without a provider reference (no answer from the provider, or
+        a worker that died after the claim) are claimed and sent again.
+        Providers are idempotent on the payout's reference, so a payout that
+        did go out the first time is not sent twice. The batch only becomes
+        DISPATCHED once every payout has a definite answer.
+        
+        Args:
+            batch: BulkPayout object
+            chunk_size: Number of payouts dispatched per DB transaction
+        """
+        BulkPayout.objects.filter(pk=batch.pk, status='PENDING').update(status='DISPATCHING', updated_at=timezone.now())
+        claim_expiry = timezone.now() - timedelta(seconds=settings.BULK_PAYOUT_CLAIM_TIMEOUT_SECONDS)
+        
+        while True:
+            with db_transaction.atomic():
+                ids = list(
+                    Transaction.objects
+                    .select_for_update(skip_locked=True)
+                    .filter(bulk_payout=batch)
+                    .filter(Q(status='PENDING') | (Q(status='PROCESSING', updated_at__lt=claim_expiry) & _unsent_payout()))
+                    .values_list('pk', flat=True)[:chunk_size]
+                )
+                if not ids:
+                    break
+                claimed = Transaction.objects.filter(pk__in=ids)
+                claimed.transition('PROCESSING')
+                # Renew the expired claims taken over from an earlier dispatch
+                claimed.filter(status='PROCESSING').update(updated_at=timezone.now())
+            
+            payouts = [
+                *BankTransfer.objects.filter(transaction_id__in=ids),
+                *MobileMoneyTransaction.objects.filter(transaction_id__in=ids),
+            ]
+            sent = {}
+            rejected = {}
+            unconfirmed = {}
+            for payout in payouts:
+                method = 'BANK' if isinstance(payout, BankTransfer) else payout.provider
+                send = get_payout_provider(method)
+                if send is None:
+                    rejected[payout.transaction_id] = f"No payout provider for {method}"
+                    continue
+                try:
+                    sent[payout.transaction_id] = send(payout)
+                except PayoutRejected as exc:
+                    rejected[payout.transaction_id] = str(exc) or f"Payout refused by {method}"
+                except Exception as exc:
+                    logger.exception("Payout %s sent to %s without a definite answer", payout.transaction_id, method)
+                    unconfirmed[payout.transaction_id] = str(exc)
+            
+            TransactionService._record_dispatch(batch, sent, rejected, unconfirmed)
+        
+        unsent = Transaction.objects.filter(bulk_payout=batch, status='PROCESSING').filter(_unsent_payout())
+        if unsent.exists():
+            # Left DISPATCHING: redispatch_stalled_bulk_payouts sends them again
+            return
+        
+        now = timezone.now()
+        BulkPayout.objects.filter(pk=batch.pk, status='DISPATCHING').update(
+            status='DISPATCHED',
+            dispatched_at=now,
+            updated_at=now
+        )
+    
+    @staticmethod
+    def redispatch_stalled_bulk_payouts():
+        """
+        Dispatch again the batches whose dispatch stopped before every payout was sent.
+        
+        Returns:
+            Number of batches dispatched
+        """
+        claim_expiry = timezone.now() - timedelta(seconds=settings.BULK_PAYOUT_CLAIM_TIMEOUT_SECONDS)
+        batches = list(BulkPayout.objects.filter(status__in=['PENDING', 'DISPATCHING'], updated_at__lt=claim_expiry))
+        for batch in batches:
+            TransactionService.dispatch_bulk_payout(batch)
+        return len(batches)
+    
+    @staticmethod
+    @db_transaction.atomic
+    def _record_dispatch(batch, sent, rejected, unconfirmed):
+        """
+        Record what the providers answered for one dispatched chunk.
+        
+        Sent payouts keep their provider reference for reconciliation.
+        Refused ones are failed and refunded. Payouts whose provider call
+        ended without an answer (timeout, network error) stay PROCESSING
+        with the error noted: the provider may have sent the money, so they
+        are not refunded but sent again, with the same idempotency key, once
+        their claim expires (see dispatch_bulk_payout).
+        
+        Args:
+            batch: BulkPayout object
+            sent: Transaction ID -> provider reference
+            rejected: Transaction ID -> refusal reason
+            unconfirmed: Transaction ID -> error of the provider call
+        """
+        now = timezone.now()
+        failed = TransactionService.fail_bank_transfer_transactions(rejected)
+        
+        ids = [*sent, *rejected, *unconfirmed]
+        for model, reference_field in (
+            (BankTransfer, 'provider_transfer_id'),
+            (MobileMoneyTransaction, 'provider_transaction_id'),
+        ):
+            # Locked: webhooks and reconcilers may already be updating them
+            payouts = list(model.objects.select_for_update().filter(transaction_id__in=ids).order_by('pk'))
+            for payout in payouts:
+                txn_id = payout.transaction_id
+                if txn_id in sent:
+                    setattr(payout, reference_field, sent[txn_id])
+                    payout.error_code = ''
+                    payout.error_message = ''
+                    status = 'PROCESSING'
+                elif txn_id in rejected:
+                    payout.error_code = 'PAYOUT_REJECTED'
+                    payout.error_message = rejected[txn_id]
+                    status = 'FAILED' if txn_id in failed else None
+                else:
+                    payout.error_code = 'PAYOUT_UNCONFIRMED'
+                    payout.error_message = unconfirmed[txn_id]
+                    status = 'PENDING'
+                if status and payout.can_transition_to(status):
+                    payout.status = status
+                    payout.version += 1
+                payout.updated_at = now
+            model.objects.bulk_update(
+                payouts,
+                ['status', 'version', reference_field, 'error_code', 'error_message', 'updated_at']
+            )
+        
+        BulkPayout.objects.filter(pk=batch.pk).update(
+            dispatched_count=F('dispatched_count') + len(sent),
+            failed_count=F('failed_count') + len(failed),
+            updated_at=now
         )
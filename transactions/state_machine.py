@@ -0,0 +1,104 @@
+"""
+Declarative status transitions with optimistic concurrency.
+
+Models declare TRANSITIONS as {target status: allowed source statuses}.
+A transition is a single conditional UPDATE:
+
+    UPDATE ... SET status = target, version = version + 1
+    WHERE id = ... AND status IN (sources) AND version = n
+
+so concurrent writers (webhooks, pollers, reconcilers) never need row locks:
+exactly one of them wins, the others are told they lost.
+"""
+from django.db import models
+from django.db.models import F
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+
+class InvalidTransition(ValueError):
+    """The requested status cannot be reached from the current one."""
+
+
+class StatefulQuerySet(models.QuerySet):
+
+    def transition(self, status, **changes):
+        """
+        Move every row of the queryset that allows it to `status`.
+
+        Rows whose current status is not an allowed source are left untouched.
+
+        Returns:
+            Number of rows moved
+        """
+        sources = self.model.allowed_sources(status)
+        return self.filter(status__in=sources).update(
+            status=status,
+            version=F('version') + 1,
+            updated_at=timezone.now(),
+            **changes
+        )
+
+
+class StatefulModel(models.Model):
+    """Abstract base for models whose status follows a state machine."""
+
+    TRANSITIONS = {}
+
+    version = models.PositiveIntegerField(_('version'), default=0, editable=False)
+
+    objects = StatefulQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def allowed_sources(cls, status):
+        try:
+            return cls.TRANSITIONS[status]
+        except KeyError:
+            raise InvalidTransition(f"{cls.__name__} has no transition to {status}")
+
+    def can_transition_to(self, status):
+        return self.status in self.TRANSITIONS.get(status, ())
+
+    def transition_to(self, status, **changes):
+        """
+        Apply a status transition if nobody changed the row since it was read.
+
+        Args:
+            status: Target status
+            **changes: Other fields written in the same UPDATE
+
+        Returns:
+            True if the transition was applied, False if the row was changed
+            concurrently (the in-memory object is then stale)
+
+        Raises:
+            InvalidTransition: if the target is not reachable from the current status
+        """
+        if not self.can_transition_to(status):
+            raise InvalidTransition(
+                f"{type(self).__name__} cannot go from {self.status} to {status}"
+            )
+
+        now = timezone.now()
+        updated = type(self).objects.filter(
+            pk=self.pk,
+            status__in=self.TRANSITIONS[status],
+            version=self.version
+        ).update(
+            status=status,
+            version=F('version') + 1,
+            updated_at=now,
+            **changes
+        )
+        if not updated:
+            return False
+
+        self.status = status
+        self.version += 1
+        self.updated_at = now
+        for field, value in changes.items():
+            setattr(self, field, value)
+        return True
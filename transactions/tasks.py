@@ -0,0 +1,54 @@
+"""
+Celery tasks for the transactions app.
+"""
+import logging
+from datetime import timedelta
+from celery import shared_task
+from django.utils import timezone
+from transactions.models import BulkPayout
+from transactions.outbox import relay_pending_events, purge_published_events
+from transactions.services import TransactionService
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(ignore_result=True)
+def relay_outbox_events(batch_size=500, max_batches=20):
+    """Drain the outbox, publishing events batch by batch."""
+    total = 0
+    for _ in range(max_batches):
+        published = relay_pending_events(batch_size)
+        total += published
+        if published < batch_size:
+            break
+    return total
+
+
+@shared_task(ignore_result=True)
+def purge_outbox_events(days=7):
+    """Remove outbox events that were published more than `days` days ago."""
+    return purge_published_events(timezone.now() - timedelta(days=days))
+
+
+@shared_task(ignore_result=True)
+def handle_transaction_event(event_id, event_type, payload):
+    """
+    Default consumer for transaction events.
+
+    Notifications and provider calls hook in here, after the transaction
+    that produced the event has committed.
+    """
+    logger.info("Transaction event %s (%s): %s", event_type, event_id, payload)
+
+
+@shared_task(ignore_result=True)
+def dispatch_bulk_payout(event_id, event_type, payload):
+    """Dispatch the payouts of a batch once its creation has committed."""
+    batch = BulkPayout.objects.get(pk=payload['bulk_payout_id'])
+    TransactionService.dispatch_bulk_payout(batch)
+
+
+@shared_task(ignore_result=True)
+def redispatch_bulk_payouts():
+    """Send again the payouts of batches whose dispatch never got an answer or died."""
+    return TransactionService.redispatch_stalled_bulk_payouts()
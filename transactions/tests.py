@@ -0,0 +1,432 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from django.utils import timezone
+from accounts.models import User
+from banking.models import BankTransfer
+from payments.models import MobileMoneyTransaction
+from transactions import risk
+from transactions.bulk_payouts import validate_items
+from transactions.models import BulkPayout, CorridorPrice, OutboxEvent, Transaction, TransactionFee
+from transactions.outbox import record_event, relay_pending_events, requeue_dead_letters
+from transactions.payouts import PayoutRejected
+from transactions.quotes import create_quote, get_quote
+from transactions.services import TransactionService
+from transactions.state_machine import InvalidTransition
+from wallets.models import BankAccount, Wallet
+
+
+def make_user(name, phone, balance=None, **fields):
+    user = User.objects.create_user(
+        username=name, email=f'{name}@example.com', password='x', phone_number=phone, **fields
+    )
+    if balance is not None:
+        Wallet.objects.create(user=user, currency='EUR', available_balance=Decimal(balance))
+    return user
+
+
+@override_settings(OUTBOX_MAX_ATTEMPTS=3, OUTBOX_RETRY_BASE_SECONDS=5, OUTBOX_RETRY_MAX_SECONDS=3600)
+class OutboxRelayTests(TestCase):
+
+    def relay(self, broker_error=None):
+        with mock.patch('transactions.outbox.current_app') as app:
+            app.send_task.side_effect = broker_error
+            return relay_pending_events(), app.send_task
+
+    def test_published_events_are_not_sent_again(self):
+        record_event('transaction.created', {'transaction_id': '1'}, aggregate_id='1')
+
+        published, send_task = self.relay()
+        self.assertEqual(published, 1)
+        self.assertEqual(send_task.call_count, 1)
+
+        published, send_task = self.relay()
+        self.assertEqual(published, 0)
+        self.assertFalse(send_task.called)
+
+    def test_failed_event_backs_off_then_is_dead_lettered(self):
+        event = record_event('transaction.created', {'transaction_id': '1'}, aggregate_id='1')
+
+        self.relay(broker_error=ConnectionError('broker down'))
+        event.refresh_from_db()
+        self.assertEqual(event.attempts, 1)
+        self.assertEqual(event.last_error, 'broker down')
+        self.assertGreater(event.next_attempt_at, timezone.now())
+
+        # Not retried before its backoff is over
+        _, send_task = self.relay(broker_error=ConnectionError('broker down'))
+        self.assertFalse(send_task.called)
+
+        for attempt in (2, 3):
+            OutboxEvent.objects.filter(pk=event.pk).update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+            self.relay(broker_error=ConnectionError('broker down'))
+        event.refresh_from_db()
+        self.assertEqual(event.attempts, 3)
+        self.assertIsNotNone(event.dead_lettered_at)
+
+        OutboxEvent.objects.filter(pk=event.pk).update(next_attempt_at=None)
+        _, send_task = self.relay()
+        self.assertFalse(send_task.called)
+
+        self.assertEqual(requeue_dead_letters(), 1)
+        published, _ = self.relay()
+        self.assertEqual(published, 1)
+
+
+class WalletTransferTests(TestCase):
+
+    def setUp(self):
+        self.sender = make_user('sender', '+33612345678', balance='50.00')
+        self.recipient = make_user('recipient', '+221771234567')
+
+    def test_transfer_creates_the_recipient_wallet(self):
+        txn = TransactionService.create_wallet_transfer(self.sender, self.recipient, Decimal('20.00'))
+
+        self.assertEqual(txn.status, 'COMPLETED')
+        self.assertEqual(Wallet.objects.get(user=self.sender).available_balance, Decimal('30.00'))
+        self.assertEqual(Wallet.objects.get(user=self.recipient).available_balance, Decimal('20.00'))
+
+    def test_invalid_input_is_refused_before_touching_wallets(self):
+        for amount, currency in [
+            (Decimal('0'), 'EUR'),
+            (Decimal('-5'), 'EUR'),
+            (Decimal('NaN'), 'EUR'),
+            (Decimal('1.001'), 'EUR'),
+            (Decimal('10'), 'USD'),
+        ]:
+            with self.subTest(amount=amount, currency=currency):
+                with self.assertRaises(ValueError):
+                    TransactionService.create_wallet_transfer(self.sender, self.recipient, amount, currency=currency)
+        self.assertFalse(Wallet.objects.filter(user=self.recipient).exists())
+        self.assertEqual(Wallet.objects.get(user=self.sender).available_balance, Decimal('50.00'))
+
+    def test_insufficient_balance(self):
+        with self.assertRaises(ValueError):
+            TransactionService.create_wallet_transfer(self.sender, self.recipient, Decimal('50.01'))
+
+    def test_phone_shared_by_two_accounts_is_refused(self):
+        # Same number, stored in national and international form
+        make_user('homonym', '771234567', country_of_residence='SN')
+        User.objects.filter(pk=self.sender.pk).update(kyc_status='APPROVED')
+        client = APIClient()
+        client.force_authenticate(User.objects.get(pk=self.sender.pk))
+
+        with mock.patch('transactions.views.log_activity'):
+            ambiguous = client.post('/api/transactions/transfer/', {'recipient': '+221 77 123 45 67', 'amount': '5'}, format='json')
+            by_email = client.post('/api/transactions/transfer/', {'recipient': 'recipient@example.com', 'amount': '5'}, format='json')
+
+        self.assertEqual(ambiguous.status_code, 400)
+        self.assertEqual(by_email.status_code, 200, by_email.data)
+        self.assertEqual(Wallet.objects.get(user=self.sender).available_balance, Decimal('45.00'))
+
+
+IBAN = 'FR7630006000011234567890189'
+
+
+def accept_payout(payout):
+    return f'po_{payout.transaction_id.hex[:8]}'
+
+
+def reject_payout(payout):
+    raise PayoutRejected('Beneficiary account closed')
+
+
+def time_out_payout(payout):
+    raise TimeoutError('read timed out')
+
+
+class BulkPayoutTests(TestCase):
+
+    def setUp(self):
+        self.payer = make_user('payer', '+33612345678', balance='1000.00')
+        self.wallet = Wallet.objects.get(user=self.payer)
+
+    def test_oversized_fields_are_row_errors(self):
+        items, errors = validate_items([
+            {'method': 'BANK', 'amount': '10', 'beneficiary_name': 'x' * 256, 'iban': IBAN},
+            {'method': 'WAVE', 'amount': '10', 'beneficiary_name': 'Awa', 'phone_number': '7' * 40, 'country': 'SN'},
+            {'method': 'WAVE', 'amount': '10', 'beneficiary_name': 'Awa', 'phone_number': '771234567', 'country': 'SENEGAL'},
+            {'method': 'BANK', 'amount': '1e20', 'beneficiary_name': 'Awa', 'iban': IBAN},
+            {'method': 'WAVE', 'amount': '10', 'beneficiary_name': 'Awa', 'phone_number': '771234567', 'country': 'SN'},
+        ])
+
+        self.assertEqual([error['row'] for error in errors], [1, 2, 3, 4])
+        self.assertEqual(items[0].phone_number, '+221771234567')
+
+    def test_beneficiary_iban_is_not_taken_over_by_the_payer(self):
+        owner = make_user('owner', '+33698765432')
+        BankAccount.objects.create(user=owner, iban=IBAN, account_holder_name='Owner')
+        items, _ = validate_items([{'method': 'BANK', 'amount': '10', 'beneficiary_name': 'Owner', 'iban': IBAN}])
+
+        batch = TransactionService.create_bulk_payout(self.payer, items)
+
+        transfer = BankTransfer.objects.get(transaction__bulk_payout=batch)
+        self.assertIsNone(transfer.bank_account)
+        self.assertEqual(transfer.beneficiary_iban, IBAN)
+        self.assertFalse(BankAccount.objects.filter(user=self.payer).exists())
+
+    def create_batch(self):
+        items, errors = validate_items([
+            {'method': 'BANK', 'amount': '100', 'beneficiary_name': 'Ada', 'iban': IBAN},
+            {'method': 'WAVE', 'amount': '50', 'beneficiary_name': 'Awa', 'phone_number': '771234567', 'country': 'SN'},
+        ])
+        self.assertEqual(errors, [])
+        return TransactionService.create_bulk_payout(self.payer, items)
+
+    def dispatch(self, batch, providers):
+        with mock.patch.dict('transactions.payouts._providers', providers, clear=True):
+            TransactionService.dispatch_bulk_payout(batch)
+        batch.refresh_from_db()
+        self.wallet.refresh_from_db()
+
+    def test_dispatch_sends_and_refunds_refused_payouts(self):
+        batch = self.create_batch()
+
+        self.dispatch(batch, {'BANK': accept_payout, 'WAVE': reject_payout})
+
+        self.assertEqual((batch.status, batch.dispatched_count, batch.failed_count), ('DISPATCHED', 1, 1))
+        transfer = BankTransfer.objects.get(transaction__bulk_payout=batch)
+        self.assertEqual(transfer.status, 'PROCESSING')
+        self.assertTrue(transfer.provider_transfer_id.startswith('po_'))
+        self.assertEqual(transfer.transaction.status, 'PROCESSING')
+        mobile = MobileMoneyTransaction.objects.get(transaction__bulk_payout=batch)
+        self.assertEqual(mobile.status, 'FAILED')
+        self.assertEqual(mobile.transaction.status, 'FAILED')
+        self.assertEqual(self.wallet.available_balance, Decimal('900.00'))
+        self.assertEqual(self.wallet.locked_balance, Decimal('100.00'))
+
+    def test_method_without_provider_is_refused(self):
+        batch = self.create_batch()
+
+        self.dispatch(batch, {'BANK': accept_payout, 'WAVE': None})
+
+        self.assertEqual(batch.failed_count, 1)
+        self.assertEqual(
+            MobileMoneyTransaction.objects.get(transaction__bulk_payout=batch).error_message,
+            'No payout provider for WAVE'
+        )
+
+    def expire_claims(self, batch):
+        past = timezone.now() - timedelta(hours=1)
+        Transaction.objects.filter(bulk_payout=batch).update(updated_at=past)
+        BulkPayout.objects.filter(pk=batch.pk).update(updated_at=past)
+
+    def test_unanswered_payout_is_sent_again_not_refunded(self):
+        batch = self.create_batch()
+
+        with self.assertLogs('transactions.services', 'ERROR'):
+            self.dispatch(batch, {'BANK': time_out_payout, 'WAVE': accept_payout})
+
+        self.assertEqual((batch.status, batch.dispatched_count, batch.failed_count), ('DISPATCHING', 1, 0))
+        transfer = BankTransfer.objects.get(transaction__bulk_payout=batch)
+        self.assertEqual(transfer.error_code, 'PAYOUT_UNCONFIRMED')
+        self.assertEqual(transfer.transaction.status, 'PROCESSING')
+        self.assertEqual(self.wallet.locked_balance, Decimal('150.00'))
+
+        # Claims are only taken over once they expire
+        with mock.patch.dict('transactions.payouts._providers', {'BANK': accept_payout}, clear=True):
+            self.assertEqual(TransactionService.redispatch_stalled_bulk_payouts(), 0)
+            self.expire_claims(batch)
+            self.assertEqual(TransactionService.redispatch_stalled_bulk_payouts(), 1)
+
+        batch.refresh_from_db()
+        transfer.refresh_from_db()
+        self.assertEqual((batch.status, batch.dispatched_count), ('DISPATCHED', 2))
+        self.assertEqual(transfer.provider_transfer_id, accept_payout(transfer))
+        self.assertEqual(transfer.error_code, '')
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.locked_balance, Decimal('150.00'))
+
+    def test_payouts_claimed_by_a_dead_worker_are_sent(self):
+        batch = self.create_batch()
+        BulkPayout.objects.filter(pk=batch.pk).update(status='DISPATCHING')
+        Transaction.objects.filter(bulk_payout=batch).transition('PROCESSING')
+        self.expire_claims(batch)
+        sent = []
+
+        def send(payout):
+            sent.append(payout.transaction_id)
+            return accept_payout(payout)
+
+        with mock.patch.dict('transactions.payouts._providers', {'BANK': send, 'WAVE': send}, clear=True):
+            self.assertEqual(TransactionService.redispatch_stalled_bulk_payouts(), 1)
+            # Payouts with a provider reference are never sent twice
+            self.expire_claims(batch)
+            TransactionService.dispatch_bulk_payout(batch)
+
+        batch.refresh_from_db()
+        self.assertEqual(len(sent), 2)
+        self.assertEqual((batch.status, batch.dispatched_count), ('DISPATCHED', 2))
+
+    def test_unreadable_csv_is_refused(self):
+        User.objects.filter(pk=self.payer.pk).update(kyc_status='APPROVED')
+        client = APIClient()
+        client.force_authenticate(User.objects.get(pk=self.payer.pk))
+        header = b'method,amount,beneficiary_name,iban\n'
+        for content in (b'\xff\xfe' + header, header + b'BANK,10,"' + b'x' * 200000 + b'",' + IBAN.encode()):
+            with self.subTest(content=content[:20]):
+                upload = SimpleUploadedFile('payouts.csv', content, content_type='text/csv')
+                with mock.patch('transactions.views.log_activity'):
+                    response = client.post('/api/transactions/bulk-payouts/', {'file': upload}, format='multipart')
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.data['rows'][0]['row'], 0)
+        self.assertFalse(BulkPayout.objects.exists())
+
+
+class QuoteExecutionTests(TestCase):
+
+    def setUp(self):
+        self.user = make_user('sender', '+33612345678', balance='100.00')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        # The activity log is written by a background thread
+        patcher = mock.patch('transactions.views.log_activity')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.quote = create_quote(
+            self.user, 'SEND', method='WAVE', country='SN',
+            amount='20.00', fee='1.00', total='21.00',
+            payout_amount='13119.14', payout_currency='XOF', rate='655.957'
+        )
+
+    def send(self, phone):
+        return self.client.post('/api/transactions/create/', {
+            'quote_id': self.quote['quote_id'],
+            'recipient_name': 'Awa',
+            'recipient_phone': phone,
+        }, format='json')
+
+    def test_invalid_request_does_not_burn_the_quote(self):
+        response = self.send('not a phone')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIsNotNone(get_quote(self.quote['quote_id'], self.user, 'SEND'))
+
+        response = self.send('771234567')
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['total'], '21.00')
+        self.assertIsNone(get_quote(self.quote['quote_id'], self.user, 'SEND'))
+        self.assertEqual(self.send('771234567').status_code, 400)
+
+
+class BankWithdrawalPricingTests(TestCase):
+
+    def setUp(self):
+        self.user = make_user('sender', '+33612345678', balance='100.00')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        patcher = mock.patch('transactions.views.log_activity')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        CorridorPrice.objects.create(destination_country='DE', method='BANK', fixed_fee=Decimal('2.00'))
+
+    def quote(self, iban):
+        response = self.client.post('/api/transactions/fee/', {'method': 'bank', 'amount': '10', 'iban': iban}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def withdraw(self, iban, quote=None):
+        data = {'amount': '10', 'iban': iban, 'owner_name': 'Ada'}
+        if quote:
+            data['quote_id'] = quote['quote_id']
+        return self.client.post('/api/transactions/withdraw/', data, format='json')
+
+    def test_quote_and_withdrawal_use_the_iban_country(self):
+        german = 'DE89370400440532013000'
+        self.assertEqual(self.quote(IBAN)['fee'], '0.00')
+        self.assertEqual(self.quote(german)['fee'], '2.00')
+
+        self.assertEqual(self.withdraw(german).data['fee'], '2.00')
+        self.assertEqual(self.withdraw(IBAN, quote=self.quote(german)).status_code, 400)
+        self.assertEqual(self.client.post('/api/transactions/fee/', {'method': 'bank', 'amount': '10'}).status_code, 400)
+
+    def test_fee_schedules_compute_alike(self):
+        schedule = dict(fixed_fee=Decimal('0.50'), percentage_fee=Decimal('1.5'), min_fee=Decimal('1.00'), max_fee=Decimal('5.00'))
+        for amount in (Decimal('10'), Decimal('100'), Decimal('1000')):
+            with self.subTest(amount=amount):
+                self.assertEqual(
+                    CorridorPrice(**schedule).calculate_fee(amount),
+                    TransactionFee(transaction_type='SEND', **schedule).calculate_fee(amount)
+                )
+        self.assertEqual(CorridorPrice(**schedule).calculate_fee(Decimal('100')), Decimal('2.00'))
+
+
+RISK_RULES = [
+    {'name': 'burst', 'dimension': 'user', 'window': 60, 'metric': 'count', 'limit': 2, 'action': 'BLOCK'},
+    {'name': 'hourly', 'dimension': 'user', 'window': 3600, 'metric': 'count', 'limit': 1, 'action': 'REVIEW'},
+]
+
+
+@override_settings(RISK_RULES=RISK_RULES)
+class RiskRuleTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        risk._rules = None
+        self.addCleanup(setattr, risk, '_rules', None)
+        self.user = make_user('sender', '+33612345678')
+
+    def test_block_rule_reserves_before_comparing(self):
+        # Two assessments in flight at once: neither has been recorded yet
+        first = risk.assess(self.user, Decimal('10'))
+        second = risk.assess(self.user, Decimal('10'))
+        third = risk.assess(self.user, Decimal('10'))
+
+        self.assertEqual((first.action, second.action, third.action), ('ALLOW', 'ALLOW', 'BLOCK'))
+        self.assertEqual(third.rules, ['burst'])
+
+        # A transfer that does not go ahead frees its slot
+        risk.release(second)
+        self.assertNotEqual(risk.assess(self.user, Decimal('10')).action, 'BLOCK')
+
+    def test_record_does_not_count_reserved_windows_twice(self):
+        risk.record(risk.assess(self.user, Decimal('10')))
+
+        second = risk.assess(self.user, Decimal('10'))
+        self.assertEqual(second.action, 'REVIEW')
+        risk.record(second)
+        self.assertEqual(risk.assess(self.user, Decimal('10')).action, 'BLOCK')
+
+
+class StateMachineTests(TestCase):
+
+    def setUp(self):
+        user = make_user('sender', '+33612345678', balance='100.00')
+        self.wallet = Wallet.objects.get(user=user)
+        self.txn = Transaction.objects.create(
+            user=user, transaction_type='SEND_MOBILE_MONEY', amount=Decimal('10.00'),
+            currency='EUR', status='PENDING', source_wallet=self.wallet
+        )
+
+    def test_unreachable_status_is_refused(self):
+        self.assertTrue(self.txn.transition_to('COMPLETED'))
+
+        with self.assertRaises(InvalidTransition):
+            self.txn.transition_to('CANCELLED')
+        with self.assertRaises(InvalidTransition):
+            Transaction.allowed_sources('UNKNOWN')
+
+    def test_concurrent_writer_loses(self):
+        stale = Transaction.objects.get(pk=self.txn.pk)
+        self.assertTrue(self.txn.transition_to('PROCESSING'))
+
+        self.assertFalse(stale.transition_to('FAILED', error_message='late'))
+        self.txn.refresh_from_db()
+        self.assertEqual((self.txn.status, self.txn.version, self.txn.error_message), ('PROCESSING', 1, ''))
+
+    def test_queryset_transition_skips_disallowed_rows(self):
+        done = Transaction.objects.create(
+            user=self.txn.user, transaction_type='SEND_MOBILE_MONEY', amount=Decimal('5.00'),
+            currency='EUR', status='COMPLETED', source_wallet=self.wallet
+        )
+
+        moved = Transaction.objects.filter(pk__in=[self.txn.pk, done.pk]).transition('CANCELLED')
+
+        self.assertEqual(moved, 1)
+        self.assertEqual(Transaction.objects.get(pk=done.pk).status, 'COMPLETED')
+        self.assertEqual(Transaction.objects.get(pk=self.txn.pk).version, 1)
@@ -7,4 +7,7 @@ urlpatterns = [
     path('receive/', views.receive_money, name='receive_money'),
     path('withdraw/', views.withdraw_to_bank, name='withdraw'),
     path('fee/', views.calculate_fee, name='calculate_fee'),
+    path('transfer/', views.transfer_to_wallet, name='transfer_to_wallet'),
+    path('bulk-payouts/', views.create_bulk_payout, name='create_bulk_payout'),
+    path('bulk-payouts/<uuid:payout_id>/', views.bulk_payout_status, name='bulk_payout_status'),
 ]
@@ -1,19 +1,103 @@
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from .models import Transaction
+from django.contrib.auth import get_user_model
+from django.db import transaction as db_transaction
+from django.db.models import F, Q, Count
+from django.utils import timezone
+from .models import Transaction, BulkPayout
+from .services import TransactionService
+from .bulk_payouts import parse_csv, validate_items
+from .pricing import quote_price
+from .quotes import create_quote, consume_quote, get_quote
+from .risk import RiskReviewService, assess as assess_risk, record as record_risk, release as release_risk
 from wallets.models import Wallet
+from wallets.iban import normalize_iban, is_valid_iban
 from decimal import Decimal
+from moneybridge.ratelimit import rate_limit
+from accounts.activity import log_activity
+from accounts.phone import to_e164
 
-FIXED_FEE = Decimal('1.00')
-EXCHANGE_MARGIN = Decimal('0.008')
+User = get_user_model()
 
-RATES = {
-    'EUR_XOF': Decimal('655.957') * (1 - EXCHANGE_MARGIN),
-    'XOF_EUR': (1 / Decimal('655.957')) * (1 - EXCHANGE_MARGIN),
-    'EUR_GHS': Decimal('16.5') * (1 - EXCHANGE_MARGIN),
-    'GHS_EUR': (1 / Decimal('16.5')) * (1 - EXCHANGE_MARGIN),
-}
+
+def _price_figures(price):
+    """Quote/response fields of a pricing.Price (payout_* plus the legacy XOF keys)."""
+    figures = {
+        'amount': price.amount,
+        'fee': price.fee,
+        'total': price.total,
+        'payout_amount': price.payout_amount,
+        'payout_currency': price.payout_currency,
+        'rate': price.rate,
+    }
+    if price.payout_currency == 'XOF':
+        figures['xof_amount'] = price.payout_amount
+        figures['rate_eur_xof'] = price.rate
+    return figures
+
+
+def _bank_country(iban):
+    """Destination country of a bank withdrawal: the IBAN's country code."""
+    return normalize_iban(str(iban or ''))[:2]
+
+
+def _debit_wallet(user, total):
+    """Take `total` from the user's EUR wallet; returns the wallet or None if funds are short."""
+    wallet = Wallet.objects.filter(user=user, currency='EUR').first()
+    if wallet is None:
+        raise Wallet.DoesNotExist
+    debited = Wallet.objects.filter(pk=wallet.pk, available_balance__gte=total).update(
+        available_balance=F('available_balance') - total,
+        updated_at=timezone.now()
+    )
+    if not debited:
+        return None
+    wallet.refresh_from_db(fields=['available_balance'])
+    return wallet
+
+
+def _execute_debit(user, total, assessment, **fields):
+    """
+    Take `total` from the user's EUR wallet and record the transaction:
+    completed, or pending with the funds on hold if the risk engine asked
+    for a review.
+
+    Returns:
+        (transaction, wallet), or (None, None) if funds are short
+
+    Raises:
+        Wallet.DoesNotExist: if the user has no EUR wallet
+    """
+    try:
+        if assessment.action == 'REVIEW':
+            wallet = Wallet.objects.filter(user=user, currency='EUR').first()
+            if wallet is None:
+                raise Wallet.DoesNotExist
+            try:
+                tx = RiskReviewService.hold_for_review(wallet, total, assessment, user=user, **fields)
+            except ValueError:
+                tx = None
+        else:
+            with db_transaction.atomic():
+                wallet = _debit_wallet(user, total)
+                tx = None
+                if wallet is not None:
+                    tx = Transaction.objects.create(
+                        user=user,
+                        status='COMPLETED',
+                        source_wallet=wallet,
+                        completed_at=timezone.now(),
+                        **fields
+                    )
+    except Wallet.DoesNotExist:
+        release_risk(assessment)
+        raise
+    if tx is None:
+        release_risk(assessment)
+        return None, None
+    record_risk(assessment)
+    return tx, wallet
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
@@ -33,6 +117,7 @@ def list_transactions(request):
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@rate_limit("quote")
 def calculate_fee(request):
     try:
         amount = Decimal(str(request.data.get('amount', 0)))
@@ -40,29 +125,50 @@ def calculate_fee(request):
         return Response({'error': 'Montant invalide'}, status=400)
     if amount <= 0:
         return Response({'error': 'Montant invalide'}, status=400)
-    fee = FIXED_FEE
-    total = amount + fee
-    xof_amount = round(amount * RATES['EUR_XOF'], 0)
+
+    # Bank withdrawals are quoted for withdraw_to_bank, other methods for send_money
+    method = str(request.data.get('method', 'wave')).upper()
+    if method == 'BANK':
+        # Same corridor key as withdraw_to_bank: the country of the IBAN
+        country = _bank_country(request.data.get('iban')) or str(request.data.get('country', '')).upper()
+        if not country:
+            return Response({'error': 'IBAN ou pays requis'}, status=400)
+    else:
+        country = str(request.data.get('country', 'SN')).upper()
+    try:
+        price = quote_price(request.user.country_of_residence, country, method, amount)
+    except ValueError:
+        return Response({'error': 'Tarif indisponible pour ce corridor'}, status=400)
+
+    quote = create_quote(
+        request.user, 'WITHDRAW' if method == 'BANK' else 'SEND',
+        method=method, country=country, **_price_figures(price)
+    )
     return Response({
-        'amount': str(amount),
-        'fee': str(fee),
-        'total': str(total),
-        'xof_amount': str(xof_amount),
-        'rate_eur_xof': str(round(RATES['EUR_XOF'], 2)),
+        key: value for key, value in quote.items()
+        if key not in ('kind', 'user_id', 'method', 'country')
     })
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@rate_limit("money_movement")
 def send_money(request):
+    # A quote from calculate_fee locks amount, fee and rate
+    quote = None
+    if request.data.get('quote_id'):
+        quote = get_quote(request.data['quote_id'], request.user, 'SEND')
+        if quote is None:
+            return Response({'error': 'Devis expire ou invalide'}, status=400)
+
     try:
-        amount = Decimal(str(request.data.get('amount', 0)))
+        amount = Decimal(quote['amount'] if quote else str(request.data.get('amount', 0)))
     except:
         return Response({'error': 'Montant invalide'}, status=400)
 
-    method = request.data.get('method', 'wave')
+    method = quote['method'] if quote else str(request.data.get('method', 'wave')).upper()
+    country = quote['country'] if quote else str(request.data.get('country', 'SN')).upper()
     recipient_name = request.data.get('recipient_name', '')
     recipient_phone = request.data.get('recipient_phone', '')
-    country = request.data.get('country', 'SN')
 
     if amount <= 0:
         return Response({'error': 'Montant invalide'}, status=400)
@@ -70,44 +176,86 @@ def send_money(request):
         return Response({'error': 'Nom du beneficiaire requis'}, status=400)
     if not recipient_phone:
         return Response({'error': 'Telephone requis'}, status=400)
+    recipient_phone = to_e164(recipient_phone, country)
+    if recipient_phone is None:
+        return Response({'error': 'Telephone invalide'}, status=400)
 
-    fee = FIXED_FEE
-    total = amount + fee
-    xof_amount = round(amount * RATES['EUR_XOF'], 0)
+    if quote:
+        figures = quote
+    else:
+        try:
+            price = quote_price(request.user.country_of_residence, country, method, amount)
+        except ValueError:
+            return Response({'error': 'Tarif indisponible pour ce corridor'}, status=400)
+        figures = {key: str(value) for key, value in _price_figures(price).items()}
+
+    fee = Decimal(figures['fee'])
+    total = Decimal(figures['total'])
+    payout = f"{figures['payout_amount']} {figures['payout_currency']}"
+
+    assessment = assess_risk(
+        request.user, total,
+        phone=recipient_phone,
+        device=request.META.get('HTTP_X_DEVICE_ID')
+    )
+    if assessment.action == 'BLOCK':
+        return Response({'error': 'Operation refusee par le controle de securite'}, status=403)
+
+    # Claim the quote only once the request is known to be executable
+    if quote and consume_quote(quote['quote_id'], request.user, quote['kind']) is None:
+        release_risk(assessment)
+        return Response({'error': 'Devis expire ou invalide'}, status=400)
 
     try:
-        wallet = Wallet.objects.get(user=request.user)
-        if Decimal(str(wallet.balance)) < total:
-            return Response({'error': 'Solde insuffisant'}, status=400)
-        wallet.balance = Decimal(str(wallet.balance)) - total
-        wallet.save()
+        tx, wallet = _execute_debit(
+            request.user, total, assessment,
+            transaction_type='SEND_MOBILE_MONEY',
+            amount=amount,
+            currency='EUR',
+            exchange_rate=Decimal(figures['rate']),
+            fee_amount=fee,
+            fee_currency='EUR',
+            description=f'Envoi {payout} a {recipient_name} via {method} ({country})',
+            metadata={
+                'recipient_phone': recipient_phone,
+                'payout_amount': figures['payout_amount'],
+                'payout_currency': figures['payout_currency'],
+            }
+        )
     except Wallet.DoesNotExist:
         return Response({'error': 'Portefeuille introuvable'}, status=400)
+    if tx is None:
+        return Response({'error': 'Solde insuffisant'}, status=400)
+    under_review = tx.status == 'PENDING'
 
-    tx = Transaction.objects.create(
-        user=request.user,
-        amount=amount,
-        status='completed',
-        transaction_type='send',
-        description=f'Envoi {xof_amount} XOF a {recipient_name} via {method.upper()} ({country})',
+    log_activity(
+        request.user, 'SEND_MONEY', f'Envoi de {total} EUR via {method}',
+        request=request, transaction_id=str(tx.id)
     )
-
-    return Response({
+    response = {
         'success': True,
         'transaction_id': str(tx.id),
         'amount': str(amount),
         'fee': str(fee),
         'total': str(total),
-        'xof_amount': str(xof_amount),
+        'payout_amount': figures['payout_amount'],
+        'payout_currency': figures['payout_currency'],
         'recipient': recipient_name,
-        'method': method,
-        'status': 'completed',
-        'message': f'{xof_amount} XOF envoyes a {recipient_name} via {method.upper()}',
-        'new_balance': str(wallet.balance),
-    })
+        'method': method.lower(),
+        'status': 'pending_review' if under_review else 'completed',
+        'message': (
+            f'Envoi de {payout} a {recipient_name} en cours de verification' if under_review
+            else f'{payout} envoyes a {recipient_name} via {method}'
+        ),
+        'new_balance': str(wallet.available_balance),
+    }
+    if 'xof_amount' in figures:
+        response['xof_amount'] = figures['xof_amount']
+    return Response(response)
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@rate_limit("money_movement")
 def receive_money(request):
     amount = Decimal(str(request.data.get('amount', 50)))
     method = request.data.get('method', 'wave')
@@ -138,51 +286,227 @@ def receive_money(request):
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@rate_limit("money_movement")
 def withdraw_to_bank(request):
+    quote = None
+    if request.data.get('quote_id'):
+        quote = get_quote(request.data['quote_id'], request.user, 'WITHDRAW')
+        if quote is None:
+            return Response({'error': 'Devis expire ou invalide'}, status=400)
+
     try:
-        amount = Decimal(str(request.data.get('amount', 0)))
+        amount = Decimal(quote['amount'] if quote else str(request.data.get('amount', 0)))
     except:
         return Response({'error': 'Montant invalide'}, status=400)
 
-    iban = request.data.get('iban', '')
+    iban = normalize_iban(request.data.get('iban', ''))
     owner_name = request.data.get('owner_name', '')
 
     if amount <= 0:
         return Response({'error': 'Montant invalide'}, status=400)
     if not iban:
         return Response({'error': 'IBAN requis'}, status=400)
+    if not is_valid_iban(iban):
+        return Response({'error': 'IBAN invalide'}, status=400)
     if not owner_name:
         return Response({'error': 'Nom du titulaire requis'}, status=400)
+    country = _bank_country(iban)
+    if quote and quote['country'] != country:
+        return Response({'error': 'Devis emis pour un autre pays'}, status=400)
 
-    fee = Decimal('0.00')
-    total = amount
+    if quote:
+        fee = Decimal(quote['fee'])
+        total = Decimal(quote['total'])
+    else:
+        try:
+            price = quote_price(request.user.country_of_residence, country, 'BANK', amount)
+        except ValueError:
+            return Response({'error': 'Tarif indisponible pour ce corridor'}, status=400)
+        fee = price.fee
+        total = price.total
+
+    assessment = assess_risk(
+        request.user, total,
+        iban=iban,
+        device=request.META.get('HTTP_X_DEVICE_ID')
+    )
+    if assessment.action == 'BLOCK':
+        return Response({'error': 'Operation refusee par le controle de securite'}, status=403)
+
+    # Claim the quote only once the request is known to be executable
+    if quote and consume_quote(quote['quote_id'], request.user, quote['kind']) is None:
+        release_risk(assessment)
+        return Response({'error': 'Devis expire ou invalide'}, status=400)
 
     try:
-        wallet = Wallet.objects.get(user=request.user)
-        if Decimal(str(wallet.balance)) < total:
-            return Response({'error': 'Solde insuffisant'}, status=400)
-        wallet.balance = Decimal(str(wallet.balance)) - total
-        wallet.save()
+        tx, wallet = _execute_debit(
+            request.user, total, assessment,
+            transaction_type='SEND_BANK_TRANSFER',
+            amount=amount,
+            currency='EUR',
+            fee_amount=fee,
+            fee_currency='EUR',
+            description=f'Virement vers {owner_name} - {iban[:8]}...',
+            metadata={'iban': iban[-4:]}
+        )
     except Wallet.DoesNotExist:
         return Response({'error': 'Portefeuille introuvable'}, status=400)
+    if tx is None:
+        return Response({'error': 'Solde insuffisant'}, status=400)
+    under_review = tx.status == 'PENDING'
 
-    tx = Transaction.objects.create(
-        user=request.user,
-        amount=amount,
-        status='completed',
-        transaction_type='withdrawal',
-        description=f'Virement vers {owner_name} - {iban[:8]}...',
+    log_activity(
+        request.user, 'WITHDRAW_TO_BANK', f'Virement de {total} EUR vers {iban[:8]}...',
+        request=request, transaction_id=str(tx.id)
     )
-
     return Response({
         'success': True,
         'transaction_id': str(tx.id),
         'amount': str(amount),
-        'fee': '0.00',
+        'fee': str(fee),
         'total': str(total),
         'iban': iban,
-        'status': 'completed',
-        'message': f'Virement de {amount} EUR vers votre compte bancaire effectue instantanement',
-        'new_balance': str(wallet.balance),
-        'delay': 'Instantane',
+        'status': 'pending_review' if under_review else 'completed',
+        'message': (
+            f'Virement de {amount} EUR en cours de verification' if under_review
+            else f'Virement de {amount} EUR vers votre compte bancaire effectue instantanement'
+        ),
+        'new_balance': str(wallet.available_balance),
+        'delay': 'Sous 24h' if under_review else 'Instantane',
+    })
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+@rate_limit("money_movement")
+def transfer_to_wallet(request):
+    try:
+        amount = Decimal(str(request.data.get('amount', 0)))
+    except:
+        return Response({'error': 'Montant invalide'}, status=400)
+
+    recipient_ref = str(request.data.get('recipient', '')).strip()
+    currency = request.data.get('currency', 'EUR')
+    recipient_currency = request.data.get('recipient_currency') or currency
+
+    if not amount.is_finite() or amount <= 0:
+        return Response({'error': 'Montant invalide'}, status=400)
+    if not recipient_ref:
+        return Response({'error': 'Beneficiaire requis'}, status=400)
+    if not request.user.can_transact:
+        return Response({'error': 'Verification KYC requise'}, status=403)
+
+    match = Q(email__iexact=recipient_ref)
+    recipient_phone = to_e164(recipient_ref, request.user.country_of_residence)
+    if recipient_phone:
+        match |= Q(phone_e164=recipient_phone)
+    # phone_e164 is not unique: never guess between several accounts
+    recipients = list(User.objects.filter(match, is_active=True)[:2])
+    if not recipients:
+        return Response({'error': 'Beneficiaire introuvable'}, status=404)
+    if len(recipients) > 1:
+        return Response({'error': 'Plusieurs comptes correspondent, indiquez l\'email du beneficiaire'}, status=400)
+    recipient = recipients[0]
+
+    try:
+        tx = TransactionService.create_wallet_transfer(
+            request.user, recipient, amount,
+            currency=currency,
+            recipient_currency=recipient_currency,
+            description=request.data.get('description', ''),
+        )
+    except ValueError as e:
+        return Response({'error': str(e)}, status=400)
+
+    return Response({
+        'success': True,
+        'transaction_id': str(tx.id),
+        'amount': str(tx.amount),
+        'fee': str(tx.fee_amount),
+        'currency': tx.currency,
+        'credited_amount': tx.metadata['credited_amount'],
+        'credited_currency': tx.metadata['credited_currency'],
+        'recipient': recipient.email,
+        'status': tx.status,
+        'new_balance': str(tx.source_wallet.available_balance),
+    })
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+@rate_limit("money_movement")
+def create_bulk_payout(request):
+    if not request.user.can_transact:
+        return Response({'error': 'Verification KYC requise'}, status=403)
+
+    upload = request.FILES.get('file')
+    if upload is not None:
+        source_format = 'CSV'
+        try:
+            rows = parse_csv(upload.read())
+        except ValueError as e:
+            return Response({'error': 'Fichier invalide', 'rows': [{'row': 0, 'errors': [str(e)]}]}, status=400)
+        currency = request.data.get('currency', 'EUR')
+        reference = request.data.get('reference', '')
+    elif isinstance(request.data, list):
+        source_format = 'JSON'
+        rows = request.data
+        currency = 'EUR'
+        reference = ''
+    else:
+        source_format = 'JSON'
+        rows = request.data.get('items', [])
+        currency = request.data.get('currency', 'EUR')
+        reference = request.data.get('reference', '')
+
+    items, errors = validate_items(rows)
+    if errors:
+        return Response({'error': 'Lot invalide', 'rows': errors}, status=400)
+
+    try:
+        batch = TransactionService.create_bulk_payout(
+            request.user, items,
+            currency=currency,
+            source_format=source_format,
+            reference=reference,
+        )
+    except ValueError as e:
+        return Response({'error': str(e)}, status=400)
+
+    return Response({
+        'success': True,
+        'bulk_payout_id': str(batch.id),
+        'item_count': batch.item_count,
+        'total_amount': str(batch.total_amount),
+        'total_fee': str(batch.total_fee),
+        'currency': batch.currency,
+        'status': batch.status,
+        'progress_url': f'/api/transactions/bulk-payouts/{batch.id}/',
+    }, status=202)
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def bulk_payout_status(request, payout_id):
+    try:
+        batch = BulkPayout.objects.get(pk=payout_id, user=request.user)
+    except BulkPayout.DoesNotExist:
+        return Response({'error': 'Lot introuvable'}, status=404)
+
+    by_status = dict(
+        Transaction.objects.filter(bulk_payout=batch)
+        .values_list('status')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+
+    return Response({
+        'bulk_payout_id': str(batch.id),
+        'status': batch.status,
+        'item_count': batch.item_count,
+        'dispatched_count': batch.dispatched_count,
+        'failed_count': batch.failed_count,
+        'transactions_by_status': by_status,
+        'total_amount': str(batch.total_amount),
+        'total_fee': str(batch.total_fee),
+        'currency': batch.currency,
+        'created_at': batch.created_at,
+        'dispatched_at': batch.dispatched_at,
     })
@@ -0,0 +1,29 @@
+# Generated by Django 6.0.2 on 2026-10-19 03:52
+
+import wallets.iban
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='bankaccount',
+            name='bank_name',
+            field=models.CharField(blank=True, max_length=255, verbose_name='bank name'),
+        ),
+        migrations.AlterField(
+            model_name='bankaccount',
+            name='bic_swift',
+            field=models.CharField(blank=True, max_length=11, validators=[wallets.iban.validate_bic], verbose_name='BIC/SWIFT'),
+        ),
+        migrations.AlterField(
+            model_name='bankaccount',
+            name='iban',
+            field=models.CharField(max_length=34, unique=True, validators=[wallets.iban.validate_iban], verbose_name='IBAN'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 6.0.2 on 2026-10-19 03:52
+
+import django.core.validators
+import django.db.models.deletion
+import uuid
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0003_bulk_payout'),
+        ('wallets', '0002_bank_account_iban_validators'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='wallet',
+            name='locked_balance',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text='Total of active holds (see WalletHold), maintained by HoldService', max_digits=15, validators=[django.core.validators.MinValueValidator(Decimal('0.00'))], verbose_name='locked balance'),
+        ),
+        migrations.CreateModel(
+            name='WalletHold',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=15, validators=[django.core.validators.MinValueValidator(Decimal('0.01'))], verbose_name='amount')),
+                ('reason', models.CharField(max_length=100, verbose_name='reason')),
+                ('status', models.CharField(choices=[('ACTIVE', 'Active'), ('CAPTURED', 'Captured'), ('RELEASED', 'Released'), ('EXPIRED', 'Expired')], default='ACTIVE', max_length=20, verbose_name='status')),
+                ('expires_at', models.DateTimeField(verbose_name='expires at')),
+                ('captured_at', models.DateTimeField(blank=True, null=True, verbose_name='captured at')),
+                ('released_at', models.DateTimeField(blank=True, null=True, verbose_name='released at')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('transaction', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='holds', to='transactions.transaction')),
+                ('wallet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holds', to='wallets.wallet')),
+            ],
+            options={
+                'verbose_name': 'wallet hold',
+                'verbose_name_plural': 'wallet holds',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(condition=models.Q(('status', 'ACTIVE')), fields=['expires_at'], name='wallet_hold_active_expiry_idx'), models.Index(fields=['wallet', 'status'], name='wallets_wal_wallet__664921_idx')],
+            },
+        ),
+    ]
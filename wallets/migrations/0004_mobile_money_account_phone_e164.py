@@ -0,0 +1,35 @@
+# Generated by Django 6.0.2 on 2026-10-19 03:52
+
+from django.db import migrations, models
+from accounts.phone import to_e164
+
+
+def backfill_phone_e164(apps, schema_editor):
+    """Fill phone_e164 from phone_number on existing rows."""
+    MobileMoneyAccount = apps.get_model('wallets', 'MobileMoneyAccount')
+    rows = MobileMoneyAccount.objects.only('id', 'phone_number', 'country', 'phone_e164').iterator(chunk_size=2000)
+    batch = []
+    for row in rows:
+        row.phone_e164 = to_e164(row.phone_number, row.country) or ''
+        batch.append(row)
+        if len(batch) >= 2000:
+            MobileMoneyAccount.objects.bulk_update(batch, ['phone_e164'])
+            batch = []
+    if batch:
+        MobileMoneyAccount.objects.bulk_update(batch, ['phone_e164'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0003_wallet_hold'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mobilemoneyaccount',
+            name='phone_e164',
+            field=models.CharField(blank=True, db_index=True, max_length=16, verbose_name='phone number (E.164)'),
+        ),
+        migrations.RunPython(backfill_phone_e164, migrations.RunPython.noop),
+    ]
@@ -6,6 +6,8 @@ from django.utils.translation import gettext_lazy as _
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 import uuid
+from accounts.phone import to_e164
+from wallets.iban import normalize_iban, validate_iban, validate_bic, lookup_bank
 
 
 class Wallet(models.Model):
@@ -49,7 +51,7 @@ class Wallet(models.Model):
         decimal_places=2,
         default=Decimal('0.00'),
         validators=[MinValueValidator(Decimal('0.00'))],
-        help_text='Balance locked for processing transactions'
+        help_text='Total of active holds (see WalletHold), maintained by HoldService'
     )
     
     # Status
@@ -74,6 +76,62 @@ class Wallet(models.Model):
         return self.available_balance + self.pending_balance + self.locked_balance
 
 
+class WalletHold(models.Model):
+    """Funds reserved on a wallet until they are captured, released or expire."""
+    
+    STATUS_CHOICES = [
+        ('ACTIVE', 'Active'),
+        ('CAPTURED', 'Captured'),
+        ('RELEASED', 'Released'),
+        ('EXPIRED', 'Expired'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='holds')
+    transaction = models.ForeignKey(
+        'transactions.Transaction',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='holds'
+    )
+    
+    # Hold details
+    amount = models.DecimalField(
+        _('amount'),
+        max_digits=15,
+        decimal_places=2,
+        validators=[MinValueValidator(Decimal('0.01'))]
+    )
+    reason = models.CharField(_('reason'), max_length=100)
+    status = models.CharField(_('status'), max_length=20, choices=STATUS_CHOICES, default='ACTIVE')
+    
+    # Lifecycle
+    expires_at = models.DateTimeField(_('expires at'))
+    captured_at = models.DateTimeField(_('captured at'), null=True, blank=True)
+    released_at = models.DateTimeField(_('released at'), null=True, blank=True)
+    
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = _('wallet hold')
+        verbose_name_plural = _('wallet holds')
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['expires_at'],
+                condition=models.Q(status='ACTIVE'),
+                name='wallet_hold_active_expiry_idx'
+            ),
+            models.Index(fields=['wallet', 'status']),
+        ]
+    
+    def __str__(self):
+        return f"Hold {self.amount} {self.wallet.currency} - {self.reason} ({self.status})"
+
+
 class BankAccount(models.Model):
     """User's linked bank accounts for SEPA transfers."""
     
@@ -86,10 +144,10 @@ class BankAccount(models.Model):
     user = models.ForeignKey('accounts.User', on_delete=models.CASCADE, related_name='bank_accounts')
     
     # Bank details
-    bank_name = models.CharField(_('bank name'), max_length=255)
+    bank_name = models.CharField(_('bank name'), max_length=255, blank=True)
     account_holder_name = models.CharField(_('account holder name'), max_length=255)
-    iban = models.CharField(_('IBAN'), max_length=34, unique=True)
-    bic_swift = models.CharField(_('BIC/SWIFT'), max_length=11, blank=True)
+    iban = models.CharField(_('IBAN'), max_length=34, unique=True, validators=[validate_iban])
+    bic_swift = models.CharField(_('BIC/SWIFT'), max_length=11, blank=True, validators=[validate_bic])
     account_type = models.CharField(_('account type'), max_length=20, choices=ACCOUNT_TYPES, default='CHECKING')
     
     # Verification
@@ -112,7 +170,22 @@ class BankAccount(models.Model):
     def __str__(self):
         return f"{self.account_holder_name} - {self.iban[-4:]}"
     
+    def fill_bank_details(self):
+        """Normalize the IBAN and fill BIC/bank name from the bundled directory."""
+        self.iban = normalize_iban(self.iban)
+        self.bic_swift = self.bic_swift.upper()
+        if not self.bic_swift or not self.bank_name:
+            bank = lookup_bank(self.iban)
+            if bank:
+                self.bic_swift = self.bic_swift or bank.bic
+                self.bank_name = self.bank_name or bank.bank_name
+    
     def save(self, *args, **kwargs):
+        self.fill_bank_details()
+        # Validators only run in full_clean(): never store a malformed IBAN/BIC
+        validate_iban(self.iban)
+        validate_bic(self.bic_swift)
+        
         # Ensure only one default account per user
         if self.is_default:
             BankAccount.objects.filter(user=self.user, is_default=True).exclude(pk=self.pk).update(is_default=False)
@@ -136,6 +209,7 @@ class MobileMoneyAccount(models.Model):
     # Mobile money details
     provider = models.CharField(_('provider'), max_length=50, choices=PROVIDERS)
     phone_number = models.CharField(_('phone number'), max_length=20)
+    phone_e164 = models.CharField(_('phone number (E.164)'), max_length=16, blank=True, db_index=True)
     account_name = models.CharField(_('account name'), max_length=255)
     country = models.CharField(_('country'), max_length=3)  # ISO 3166-1 alpha-3
     
@@ -158,3 +232,7 @@ class MobileMoneyAccount(models.Model):
     
     def __str__(self):
         return f"{self.provider} - {self.phone_number}"
+    
+    def save(self, *args, **kwargs):
+        self.phone_e164 = to_e164(self.phone_number, self.country) or ''
+        super().save(*args, **kwargs)
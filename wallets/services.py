@@ -0,0 +1,294 @@
+"""
+Hold Service - reservation of wallet funds with automatic expiry.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from wallets.models import Wallet, WalletHold
+
+
+class HoldNotActive(ValueError):
+    """The holds of a transaction were already captured, released or expired."""
+
+
+class HoldService:
+    """
+    Service for placing, capturing and releasing holds on wallet funds.
+
+    Wallet.locked_balance is the running total of ACTIVE holds, so available
+    balance never requires scanning holds. Every hold state change moves the
+    amount between available_balance and locked_balance in the same DB
+    transaction, with a single conditional UPDATE on the wallet row.
+    """
+
+    @staticmethod
+    def _default_expiry():
+        return timezone.now() + timedelta(hours=settings.WALLET_HOLD_TTL_HOURS)
+
+    @staticmethod
+    @db_transaction.atomic
+    def place_holds(wallet, holds, expires_at=None):
+        """
+        Reserve several amounts on one wallet at once.
+
+        Args:
+            wallet: Wallet object (its in-memory balances are updated too)
+            holds: List of (amount, reason, transaction) tuples; transaction may be None
+            expires_at: Expiry of the holds (default: now + WALLET_HOLD_TTL_HOURS)
+
+        Returns:
+            List of WalletHold objects
+        """
+        total = sum((amount for amount, _, _ in holds), Decimal('0.00'))
+        now = timezone.now()
+
+        # Check and reserve in one statement; fails if funds went away concurrently
+        reserved = Wallet.objects.filter(pk=wallet.pk, available_balance__gte=total).update(
+            available_balance=F('available_balance') - total,
+            locked_balance=F('locked_balance') + total,
+            updated_at=now
+        )
+        if not reserved:
+            raise ValueError("Insufficient balance")
+
+        wallet.available_balance -= total
+        wallet.locked_balance += total
+
+        expires_at = expires_at or HoldService._default_expiry()
+        return WalletHold.objects.bulk_create([
+            WalletHold(
+                wallet=wallet,
+                transaction=txn,
+                amount=amount,
+                reason=reason,
+                expires_at=expires_at
+            )
+            for amount, reason, txn in holds
+        ])
+
+    @staticmethod
+    def place_hold(wallet, amount, reason, transaction=None, expires_at=None):
+        """Reserve one amount on a wallet. See place_holds."""
+        return HoldService.place_holds(wallet, [(amount, reason, transaction)], expires_at=expires_at)[0]
+
+    @staticmethod
+    @db_transaction.atomic
+    def _close_holds(transaction_ids, status):
+        """
+        Capture or release every active hold of several transactions.
+
+        Returns:
+            (closed, inactive): amount closed per transaction ID, and the IDs
+            of transactions whose holds were all already closed. Transactions
+            that never had holds appear in neither.
+        """
+        holds = list(
+            WalletHold.objects
+            .select_for_update()
+            .filter(transaction_id__in=transaction_ids)
+            .order_by('pk')
+        )
+        active = [hold for hold in holds if hold.status == 'ACTIVE']
+        closed = defaultdict(Decimal)
+        for hold in active:
+            closed[hold.transaction_id] += hold.amount
+        inactive = {hold.transaction_id for hold in holds} - set(closed)
+        if not active:
+            return dict(closed), inactive
+
+        now = timezone.now()
+        timestamp_field = 'captured_at' if status == 'CAPTURED' else 'released_at'
+        WalletHold.objects.filter(pk__in=[hold.pk for hold in active]).update(
+            status=status,
+            updated_at=now,
+            **{timestamp_field: now}
+        )
+
+        totals = defaultdict(Decimal)
+        for hold in active:
+            totals[hold.wallet_id] += hold.amount
+
+        for wallet_id in sorted(totals):
+            if status == 'CAPTURED':
+                Wallet.objects.filter(pk=wallet_id).update(
+                    locked_balance=F('locked_balance') - totals[wallet_id],
+                    updated_at=now
+                )
+            else:
+                Wallet.objects.filter(pk=wallet_id).update(
+                    available_balance=F('available_balance') + totals[wallet_id],
+                    locked_balance=F('locked_balance') - totals[wallet_id],
+                    updated_at=now
+                )
+
+        return dict(closed), inactive
+
+    @staticmethod
+    def _close_transaction_holds(transaction_obj, status):
+        """Capture or release every active hold of one transaction."""
+        closed, inactive = HoldService._close_holds([transaction_obj.pk], status)
+        if transaction_obj.pk in inactive:
+            raise HoldNotActive(f"Transaction {transaction_obj.id} has no active hold")
+        return closed.get(transaction_obj.pk)
+
+    @staticmethod
+    def capture_transaction_holds(transaction_obj):
+        """
+        Capture the held funds of a transaction (the money leaves the wallet).
+
+        Returns:
+            Captured amount, or None if the transaction never had holds
+
+        Raises:
+            HoldNotActive: if the holds were already captured, released or expired
+        """
+        return HoldService._close_transaction_holds(transaction_obj, 'CAPTURED')
+
+    @staticmethod
+    def release_transaction_holds(transaction_obj):
+        """
+        Give the held funds of a transaction back to the wallet.
+
+        Returns:
+            Released amount, or None if the transaction never had holds
+
+        Raises:
+            HoldNotActive: if the holds were already captured, released or expired
+        """
+        return HoldService._close_transaction_holds(transaction_obj, 'RELEASED')
+
+    @staticmethod
+    def capture_holds_of_transactions(transaction_ids):
+        """
+        Capture the held funds of several transactions, with one UPDATE per wallet.
+
+        Returns:
+            (captured, inactive): amount captured per transaction ID, and the
+            IDs of transactions whose holds were already closed
+        """
+        return HoldService._close_holds(transaction_ids, 'CAPTURED')
+
+    @staticmethod
+    def release_holds_of_transactions(transaction_ids):
+        """
+        Give the held funds of several transactions back, with one UPDATE per wallet.
+
+        Returns:
+            (released, inactive): amount released per transaction ID, and the
+            IDs of transactions whose holds were already closed
+        """
+        return HoldService._close_holds(transaction_ids, 'RELEASED')
+
+    @staticmethod
+    def release_expired_holds(batch_size=500):
+        """
+        Release holds past their expiry, one batch per DB transaction.
+
+        A hold tied to a transaction only expires together with it: the
+        transaction rows are locked too, and only holds whose transaction
+        moves from PENDING to CANCELLED in the same DB transaction are
+        released, with reversing ledger entries and a 'transaction.cancelled'
+        outbox event. Transactions already handed to a provider (PROCESSING,
+        or carrying a provider reference) or locked by a dispatcher keep
+        their holds.
+
+        Returns:
+            Number of holds released
+        """
+        from transactions.models import LedgerEntry, Transaction
+        from transactions.services import record_transaction_events
+
+        released = 0
+        skipped = set()
+        while True:
+            with db_transaction.atomic():
+                now = timezone.now()
+                holds = list(
+                    WalletHold.objects
+                    .select_for_update(skip_locked=True, of=('self',))
+                    .filter(status='ACTIVE', expires_at__lte=now)
+                    .filter(Q(transaction__isnull=True) | Q(transaction__status='PENDING'))
+                    .exclude(pk__in=skipped)
+                    .order_by('expires_at', 'pk')[:batch_size]
+                )
+                if not holds:
+                    return released
+
+                cancelled = list(
+                    Transaction.objects
+                    .select_for_update(skip_locked=True)
+                    .filter(pk__in={hold.transaction_id for hold in holds if hold.transaction_id}, status='PENDING')
+                    .exclude(bank_transfer__provider_transfer_id__isnull=False)
+                    .exclude(mobile_money_transaction__provider_transaction_id__isnull=False)
+                    .order_by('pk')
+                )
+                cancelled_ids = {txn.pk for txn in cancelled}
+                # Locked and PENDING: every one of them moves
+                Transaction.objects.filter(pk__in=cancelled_ids).transition(
+                    'CANCELLED',
+                    error_code='HOLD_EXPIRED',
+                    error_message='Reserved funds expired before the transaction was processed'
+                )
+
+                expired = [hold for hold in holds if hold.transaction_id is None or hold.transaction_id in cancelled_ids]
+                skipped.update(hold.pk for hold in holds if hold.transaction_id not in cancelled_ids and hold.transaction_id)
+                WalletHold.objects.filter(pk__in=[hold.pk for hold in expired]).update(
+                    status='EXPIRED',
+                    released_at=now,
+                    updated_at=now
+                )
+
+                totals = defaultdict(Decimal)
+                for hold in expired:
+                    totals[hold.wallet_id] += hold.amount
+                for wallet_id in sorted(totals):
+                    Wallet.objects.filter(pk=wallet_id).update(
+                        available_balance=F('available_balance') + totals[wallet_id],
+                        locked_balance=F('locked_balance') - totals[wallet_id],
+                        updated_at=now
+                    )
+
+                # Reverse the lock legs of the transactions that posted them
+                locked_ids = set(
+                    LedgerEntry.objects
+                    .filter(transaction_id__in=cancelled_ids, account_type='LOCKED', entry_type='CREDIT')
+                    .values_list('transaction_id', flat=True)
+                )
+                wallets = Wallet.objects.in_bulk(list(totals))
+                entries = []
+                for hold in expired:
+                    if hold.transaction_id not in locked_ids:
+                        continue
+                    entries += [
+                        LedgerEntry(
+                            transaction_id=hold.transaction_id,
+                            entry_type='DEBIT',
+                            account_type='LOCKED',
+                            amount=hold.amount,
+                            currency=wallets[hold.wallet_id].currency,
+                            description=f"Unlock expired hold {hold.pk}"
+                        ),
+                        LedgerEntry(
+                            transaction_id=hold.transaction_id,
+                            entry_type='CREDIT',
+                            account_type='USER_WALLET',
+                            amount=hold.amount,
+                            currency=wallets[hold.wallet_id].currency,
+                            wallet=wallets[hold.wallet_id],
+                            balance_after=wallets[hold.wallet_id].available_balance,
+                            description=f"Refund of cancelled transaction {hold.transaction_id}"
+                        ),
+                    ]
+                LedgerEntry.objects.bulk_create(entries)
+
+                for txn in cancelled:
+                    txn.status = 'CANCELLED'
+                record_transaction_events('transaction.cancelled', cancelled)
+
+                released += len(expired)
+                if len(holds) < batch_size:
+                    return released
@@ -0,0 +1,11 @@
+"""
+Celery tasks for the wallets app.
+"""
+from celery import shared_task
+from wallets.services import HoldService
+
+
+@shared_task(ignore_result=True)
+def release_expired_holds(batch_size=500):
+    """Return the funds of expired holds to their wallets."""
+    return HoldService.release_expired_holds(batch_size)
@@ -0,0 +1,145 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.core.exceptions import ValidationError
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from accounts.models import User
+from banking.models import BankTransfer
+from transactions.models import LedgerEntry, OutboxEvent
+from transactions.services import TransactionService
+from wallets.iban import is_valid_iban, lookup_bank, normalize_iban, validate_bic, validate_iban
+from wallets.models import BankAccount, Wallet, WalletHold
+from wallets.services import HoldNotActive, HoldService
+
+
+class HoldExpiryTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='payer', email='payer@example.com', password='x', phone_number='+33612345678'
+        )
+        self.wallet = Wallet.objects.create(user=self.user, currency='EUR', available_balance=Decimal('100.00'))
+        self.account = BankAccount.objects.create(
+            user=self.user, iban='FR7630006000011234567890189', account_holder_name='Payer'
+        )
+
+    def send(self, amount):
+        txn = TransactionService.create_bank_transfer_transaction(self.user, self.account, Decimal(amount))
+        WalletHold.objects.filter(transaction=txn).update(expires_at=timezone.now() - timedelta(minutes=1))
+        return txn
+
+    def test_expired_pending_transaction_is_cancelled_and_refunded(self):
+        txn = self.send('30.00')
+
+        self.assertEqual(HoldService.release_expired_holds(), 1)
+
+        txn.refresh_from_db()
+        self.wallet.refresh_from_db()
+        self.assertEqual(txn.status, 'CANCELLED')
+        self.assertEqual(txn.error_code, 'HOLD_EXPIRED')
+        self.assertEqual(WalletHold.objects.get(transaction=txn).status, 'EXPIRED')
+        self.assertEqual(self.wallet.available_balance, Decimal('100.00'))
+        self.assertEqual(self.wallet.locked_balance, Decimal('0.00'))
+        self.assertTrue(LedgerEntry.objects.filter(
+            transaction=txn, account_type='USER_WALLET', entry_type='CREDIT', balance_after=Decimal('100.00')
+        ).exists())
+        self.assertTrue(OutboxEvent.objects.filter(event_type='transaction.cancelled', aggregate_id=str(txn.pk)).exists())
+
+    def test_transactions_out_with_a_provider_keep_their_holds(self):
+        processing = self.send('10.00')
+        processing.transition_to('PROCESSING')
+        referenced = self.send('20.00')
+        BankTransfer.objects.create(
+            transaction=referenced,
+            bank_account=self.account,
+            amount=referenced.amount,
+            beneficiary_name='Payer',
+            beneficiary_iban=self.account.iban,
+            provider_transfer_id='po_out',
+        )
+
+        self.assertEqual(HoldService.release_expired_holds(), 0)
+
+        referenced.refresh_from_db()
+        self.assertEqual(referenced.status, 'PENDING')
+        self.assertEqual(WalletHold.objects.filter(status='ACTIVE').count(), 2)
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.locked_balance, Decimal('30.00'))
+
+        # Settling later still finds the hold to capture
+        TransactionService.complete_bank_transfer_transaction(referenced)
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.locked_balance, Decimal('10.00'))
+
+    def test_standalone_hold_expires(self):
+        HoldService.place_hold(self.wallet, Decimal('15.00'), 'MANUAL', expires_at=timezone.now() - timedelta(minutes=1))
+
+        self.assertEqual(HoldService.release_expired_holds(batch_size=1), 1)
+
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.available_balance, Decimal('100.00'))
+        self.assertEqual(self.wallet.locked_balance, Decimal('0.00'))
+
+    def test_closed_hold_cannot_be_captured(self):
+        txn = self.send('10.00')
+        HoldService.release_transaction_holds(txn)
+
+        with self.assertRaises(HoldNotActive):
+            HoldService.capture_transaction_holds(txn)
+
+
+class IbanTests(SimpleTestCase):
+
+    def test_normalization(self):
+        self.assertEqual(normalize_iban(' fr76 3000-4000 0312 3456 7890 143 '), 'FR7630004000031234567890143')
+
+    def test_checksum_and_country_length(self):
+        for iban in ('FR7630004000031234567890143', 'DE89370400440532013000', 'GB29 NWBK 6016 1331 9268 19'):
+            with self.subTest(iban=iban):
+                self.assertTrue(is_valid_iban(iban))
+                validate_iban(iban)
+        for iban in (
+            'FR7630004000031234567890144',   # checksum
+            'FR76300040000312345678901',     # too short for FR
+            'DE8937040044053201300000',      # too long for DE
+            'ZZ89370400440532013000',        # unknown country
+            'DEAB370400440532013000',        # check digits not numeric
+            'DE89 3704 0044 0532 0130 0!',   # not alphanumeric
+        ):
+            with self.subTest(iban=iban):
+                self.assertFalse(is_valid_iban(iban))
+                with self.assertRaises(ValidationError):
+                    validate_iban(iban)
+
+    def test_bic(self):
+        validate_bic('BNPAFRPP')
+        validate_bic('bnpafrppxxx')
+        with self.assertRaises(ValidationError):
+            validate_bic('BNP')
+
+    def test_directory_lookup(self):
+        bank = lookup_bank('FR7630004000031234567890143')
+        self.assertEqual((bank.bic, bank.bank_name), ('BNPAFRPPXXX', 'BNP Paribas'))
+        self.assertIsNone(lookup_bank('FR7699999000031234567890143'))
+        self.assertIsNone(lookup_bank('NO9386011117947'))
+
+
+class BankAccountTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='ada', email='ada@example.com', password='x')
+
+    def test_save_normalizes_and_fills_the_bank(self):
+        account = BankAccount.objects.create(
+            user=self.user, iban='fr76 3000 4000 0312 3456 7890 143', account_holder_name='Ada'
+        )
+
+        self.assertEqual(account.iban, 'FR7630004000031234567890143')
+        self.assertEqual((account.bic_swift, account.bank_name), ('BNPAFRPPXXX', 'BNP Paribas'))
+
+    def test_invalid_iban_is_never_stored(self):
+        for iban in ('garbage', 'FR7630004000031234567890144'):
+            with self.subTest(iban=iban):
+                with self.assertRaises(ValidationError):
+                    BankAccount.objects.create(user=self.user, iban=iban, account_holder_name='Ada')
+        self.assertFalse(BankAccount.objects.exists())